@@ -1,11 +1,11 @@
 import grpc
 import json
+import asyncio
 from threading import Thread
 import logging
 import os
 import uuid
 import time
-import copy
 from flask import Flask, request, Response, jsonify
 
 from concurrent import futures
@@ -15,6 +15,9 @@ from . import service_pb2_grpc
 
 from .discovery import SearchSessionsCache, DiscoveryCache, GraphCache
 from .redis_cache import RedisConnectionCache
+from .reply_demux import ReplyDemultiplexer, is_partial
+from .request_templates import RequestTemplateCache
+from .logs_writer import get_logs_writer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -78,7 +81,38 @@ class BlockInferenceServiceServicer(service_pb2_grpc.BlockInferenceServiceServic
         self.op_connection = self.connection_cache.get(
             self.redis_host_local_ref, 6379, "")
 
+        self.reply_timeout = float(os.getenv("INFERENCE_REPLY_TIMEOUT", 600))
+        self.reply_queue = f"{self.queue_name_prefix}replies"
+        self.replies = ReplyDemultiplexer(
+            self.op_connection, self.reply_queue, default_timeout=self.reply_timeout)
+        self.replies.start()
+
+        self.templates = RequestTemplateCache(
+            self.discovery_cache, self.graph_cache, resolve_graph,
+            self.output_connection, self.output_connection_internal, self.reply_queue)
+
+        self.logs_writer = None
+        if os.getenv("ENABLE_INFERENCE_LOGS", "false") == "true":
+            self.logs_writer = get_logs_writer()
+
     def process_request(self, request: service_pb2.BlockInferencePacket, extra_dict=None):
+        try:
+            future = self.submit_request(request, extra_dict)
+            return self.replies.wait(request.session_id, request.seq_no, future)
+        except Exception as e:
+            raise e
+
+    async def process_request_async(self, request: service_pb2.BlockInferencePacket, extra_dict=None):
+        # submission is short, the wait for the reply holds no thread
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, self.submit_request, request, extra_dict)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.reply_timeout)
+        except BaseException:
+            self.replies.cancel(request.session_id, request.seq_no)
+            raise
+
+    def submit_request(self, request: service_pb2.BlockInferencePacket, extra_dict=None, stream_loop=None):
         try:
 
             block_id = None
@@ -91,97 +125,37 @@ class BlockInferenceServiceServicer(service_pb2_grpc.BlockInferenceServiceServic
             else:
                 block_id = request.block_id
 
-            # get data from discovery cache:
-            url, port = self.discovery_cache.discover(request.block_id)
-
-            logger.info("block_id:{}, url={}, port={}".format(
-                request.block_id, url, port))
-
-            connection = self.connection_cache.get(url, port, request.block_id)
+            template = self.templates.get(block_id, request.output_ptr)
 
-            if request.output_ptr == "":
-                q_n = f"{self.queue_name_prefix}{request.session_id}__{request.seq_no}"
-                if port != 0:
-                    op_ptr = copy.deepcopy(self.output_connection_internal)
-                    op_ptr['outputs'][0]['queue_name'] = q_n
-                    request.output_ptr = json.dumps(op_ptr)
-                else:
-                    op_ptr = copy.deepcopy(self.output_connection)
-                    op_ptr['outputs'][0]['queue_name'] = q_n
-                    request.output_ptr = json.dumps(op_ptr)
+            connection = self.connection_cache.get(
+                template.url, template.port, block_id)
 
-                request_packet = service_pb2.AIOSPacket(
-                    session_id=request.session_id,
-                    seq_no=request.seq_no,
-                    data=request.data,
-                    ts=request.ts,
-                    output_ptr=request.output_ptr,
-                    files=request.files
-                )
+            logging.info(
+                f"pushing packet={template.output_ptr}, {request.session_id}, {request.seq_no}")
 
-                logging.info(
-                    f"pushing packet={request_packet.output_ptr}, {request.session_id}, {request.seq_no}")
+            serialized_packet = template.serialize(request)
 
-                serialized_packet = request_packet.SerializeToString()
-
-                connection.lpush("EXECUTOR_INPUTS", serialized_packet)
-
-                _, result = self.op_connection.brpop(q_n)
-                packet = service_pb2.AIOSPacket()
-                packet.ParseFromString(result)
-
-                if extra_dict:
-                    extra_dict['model'] = block_id
-
-                return packet
+            if stream_loop is not None:
+                waiter = self.replies.register_stream(
+                    request.session_id, request.seq_no, stream_loop)
             else:
-                q_n = f"{self.queue_name_prefix}{request.session_id}__{request.seq_no}"
-                op_ptr = copy.deepcopy(self.output_connection)
-                op_ptr['outputs'][0]['queue_name'] = q_n
-
-                # check if it's a graph:
-                output_config = json.loads(request.output_ptr)
-                if 'is_graph' in output_config and output_config['is_graph']:
-
-                    # check if the graph is compiled graph:
-                    if 'is_compiled' in output_config and output_config['is_compiled']:
-                        del output_config['is_compiled']
-                        output_config['graph']['final'] = op_ptr
-                    else:
-                        resolved_graph = resolve_graph(
-                            output_config['graph'], self.graph_cache)
-                        output_config['graph'] = resolved_graph
-                        output_config['graph']['final'] = op_ptr
-
-                request_packet = service_pb2.AIOSPacket(
-                    session_id=request.session_id,
-                    seq_no=request.seq_no,
-                    data=request.data,
-                    ts=request.ts,
-                    output_ptr=json.dumps(output_config),
-                    files=request.files
-                )
-
-                logging.info(
-                    f"pushing packet={request_packet.output_ptr}, {request.session_id}, {request.seq_no}")
-
-                serialized_packet = request_packet.SerializeToString()
+                waiter = self.replies.register(request.session_id, request.seq_no)
 
+            try:
                 connection.lpush("EXECUTOR_INPUTS", serialized_packet)
+            except Exception:
+                self.replies.cancel(request.session_id, request.seq_no)
+                # the endpoint may have moved, recompile on the next request
+                self.templates.invalidate(block_id)
+                raise
 
-                op_connection = self.connection_cache.get(
-                    self.redis_host_local_ref, 6379, "")
+            if self.logs_writer:
+                self.logs_writer.log(request)
 
-                _, result = op_connection.brpop(q_n)
-                logger.info(f"received packed from {q_n} data: {result}")
+            if extra_dict:
+                extra_dict['model'] = block_id
 
-                packet = service_pb2.AIOSPacket()
-                packet.ParseFromString(result)
-
-                if extra_dict:
-                    extra_dict['model'] = block_id
-
-                return packet
+            return waiter
 
         except Exception as e:
             raise e
@@ -450,12 +424,12 @@ class BlockInferenceServiceServicer(service_pb2_grpc.BlockInferenceServiceServic
         except Exception as e:
             raise e
 
-    def infer(self, request, context):
+    async def infer(self, request, context):
         try:
             logger.info(
                 f"Received request: session_id={request.session_id}, seq_no={request.seq_no}")
 
-            return self.process_request(request)
+            return await self.process_request_async(request)
 
         except Exception as e:
             # Handle exceptions by returning an error response
@@ -473,9 +447,45 @@ class BlockInferenceServiceServicer(service_pb2_grpc.BlockInferenceServiceServic
 
             return error_response
 
+    async def infer_stream(self, request, context):
+        loop = asyncio.get_running_loop()
+        try:
+            logger.info(
+                f"Received stream request: session_id={request.session_id}, seq_no={request.seq_no}")
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+            stream = await loop.run_in_executor(
+                None, self.submit_request, request, None, loop)
+
+            while True:
+                item = await stream.queue.get()
+                if isinstance(item, Exception):
+                    raise item
+
+                yield item
+                if not is_partial(item):
+                    break
+
+        except Exception as e:
+            error_message = str(e)
+            logger.error(f"Error processing stream inference: {error_message}")
+
+            yield service_pb2.AIOSPacket(
+                session_id=request.session_id,
+                seq_no=request.seq_no,
+                data=json.dumps({"success": False, "message": error_message}),
+                ts=request.ts,
+                output_ptr="{}",
+                files=[]
+            )
+
+        finally:
+            self.replies.cancel(request.session_id, request.seq_no)
+
+
+async def _serve():
+    server = grpc.aio.server(
+        futures.ThreadPoolExecutor(max_workers=int(os.getenv("GRPC_MAX_WORKERS", 10))),
+        maximum_concurrent_rpcs=int(os.getenv("GRPC_MAX_CONCURRENT_RPCS", 10000)))
     servicer = BlockInferenceServiceServicer()
     service_pb2_grpc.add_BlockInferenceServiceServicer_to_server(
         servicer, server)
@@ -484,11 +494,18 @@ def serve():
 
     port = "50052"
     server.add_insecure_port(f"[::]:{port}")
-    server.start()
+    await server.start()
 
     logger.info(f"gRPC Server started on port {port}")
 
     try:
-        server.wait_for_termination()
+        await server.wait_for_termination()
+    finally:
+        servicer.replies.stop()
+
+
+def serve():
+    try:
+        asyncio.run(_serve())
     except KeyboardInterrupt:
         logger.info("Shutting down gRPC Server...")
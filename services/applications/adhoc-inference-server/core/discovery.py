@@ -5,15 +5,17 @@ import json
 import logging
 
 from .search import map_block_to_search
+from .lookup_cache import LookupCache, block_tag, cluster_tag
 
 
 class BlocksDB:
     def __init__(self, base_url):
         self.base_url = base_url
+        self.session = requests.Session()
 
     def create_block(self, data):
         try:
-            response = requests.post(f'{self.base_url}/blocks', json=data)
+            response = self.session.post(f'{self.base_url}/blocks', json=data)
             if response.status_code != 200:
                 raise Exception("API returned non-200 status code")
             return True, response.json()
@@ -22,7 +24,7 @@ class BlocksDB:
 
     def get_all_blocks(self):
         try:
-            response = requests.get(f'{self.base_url}/blocks')
+            response = self.session.get(f'{self.base_url}/blocks')
             if response.status_code != 200:
                 raise Exception("API returned non-200 status code")
             return True, response.json()
@@ -31,7 +33,7 @@ class BlocksDB:
 
     def get_block_by_id(self, block_id):
         try:
-            response = requests.get(f'{self.base_url}/blocks/{block_id}')
+            response = self.session.get(f'{self.base_url}/blocks/{block_id}')
             if response.status_code != 200:
                 raise Exception("API returned non-200 status code")
             return True, response.json()
@@ -40,7 +42,7 @@ class BlocksDB:
 
     def update_block_by_id(self, block_id, data):
         try:
-            response = requests.put(
+            response = self.session.put(
                 f'{self.base_url}/blocks/{block_id}', json=data)
             if response.status_code != 200:
                 raise Exception("API returned non-200 status code")
@@ -50,7 +52,7 @@ class BlocksDB:
 
     def delete_block_by_id(self, block_id):
         try:
-            response = requests.delete(f'{self.base_url}/blocks/{block_id}')
+            response = self.session.delete(f'{self.base_url}/blocks/{block_id}')
             if response.status_code != 200:
                 raise Exception("API returned non-200 status code")
             return True, response.json()
@@ -59,7 +61,7 @@ class BlocksDB:
 
     def query_blocks(self, query_params):
         try:
-            response = requests.post(
+            response = self.session.post(
                 f'{self.base_url}/blocks/query', json=query_params)
             if response.status_code != 200:
                 raise Exception("API returned non-200 status code")
@@ -144,19 +146,42 @@ class ConnectionsCache:
             return new_connection
 
 
+def _cache_size():
+    return int(os.getenv("DISCOVERY_CACHE_SIZE", 10000))
+
+
+def _cache_ttl():
+    return float(os.getenv("DISCOVERY_CACHE_TTL", 60))
+
+
+def _negative_ttl():
+    return float(os.getenv("DISCOVERY_NEGATIVE_TTL", 5))
+
+
+_shared_block_db = None
+
+
+def get_blocks_db():
+    global _shared_block_db
+    if _shared_block_db is None:
+        _shared_block_db = BlocksDB(
+            os.getenv("BLOCKS_DB_URL", "http://localhost:3001"))
+    return _shared_block_db
+
+
 class DiscoveryCache:
 
     def __init__(self) -> None:
-        self.entries = {}
+        self.entries = LookupCache(
+            "discovery", max_size=_cache_size(), ttl=_cache_ttl(), negative_ttl=_negative_ttl())
         self.discovery_mode = os.getenv("DISCOVERY_MODE", "gateway")
         self.cluster_id = os.getenv("CLUSTER_ID", "default-cluster")
+        self.block_db = get_blocks_db()
 
     def __discover(self, block_id):
         try:
 
-            block_db = BlocksDB(
-                os.getenv("BLOCKS_DB_URL", "c"))
-            ret, block = block_db.get_block_by_id(block_id)
+            ret, block = self.block_db.get_block_by_id(block_id)
 
             if not ret:
                 raise Exception(f"{block_id} not found in the DB, err={block}")
@@ -189,6 +214,16 @@ class DiscoveryCache:
         except Exception as e:
             raise e
 
+    def _load(self, block_id):
+        public_url, cluster_id = self.__discover(block_id)
+        tags = (block_tag(block_id), cluster_tag(cluster_id))
+
+        if self.cluster_id == cluster_id:
+            local_url = f"{block_id}-executor-svc.blocks.svc.cluster.local"
+            return (local_url, 6379), tags
+
+        return (public_url, 0), tags
+
     def discover(self, block_id, instance_id=""):
         try:
 
@@ -198,22 +233,8 @@ class DiscoveryCache:
             else:
                 key = block_id
 
-            # discover from the cache:
-            if key in self.entries:
-                access_address, port = self.entries[key]
-                return access_address, port
-
             if self.discovery_mode == "gateway":
-                # discover internally:
-                public_url, cluster_id = self.__discover(block_id)
-
-                if self.cluster_id == cluster_id:
-                    local_url = f"{block_id}-executor-svc.blocks.svc.cluster.local"
-                    self.entries[key] = (local_url, 6379)
-                    return local_url, 6379
-
-                self.entries[key] = (public_url, 0)
-                return public_url, 0
+                return self.entries.get_or_load(key, lambda: self._load(block_id))
             else:
                 if instance_id == "":
                     return os.getenv("QUEUE_DEFAULT_URL", "localhost:50051"), None
@@ -223,50 +244,51 @@ class DiscoveryCache:
         except Exception as e:
             raise e
 
+    def invalidate(self, block_id):
+        self.entries.invalidate_tag(block_tag(block_id))
+
 
 class GraphCache:
 
     def __init__(self) -> None:
-        self.items = {}
-        self.block_db = BlocksDB(
-            os.getenv("BLOCKS_DB_URL", "http://localhost:3001"))
-
-    def get(self, block_id: str):
-        try:
-
-            if block_id in self.items:
-                return self.items[block_id]
-
-            ret, block = self.block_db.get_block_by_id(block_id)
-            if not ret:
-                raise Exception(f"block with ID {block_id} not found")
+        self.items = LookupCache(
+            "graph", max_size=_cache_size(), ttl=_cache_ttl(), negative_ttl=_negative_ttl())
+        self.block_db = get_blocks_db()
 
-            cluster = block['cluster']
-            config = cluster.get('config', {}).get('urlMap', {})
+    def _load(self, block_id: str):
+        ret, block = self.block_db.get_block_by_id(block_id)
+        if not ret:
+            raise Exception(f"block with ID {block_id} not found")
 
-            public_url = config.get('publicGateway', '')
+        cluster = block['cluster']
+        config = cluster.get('config', {}).get('urlMap', {})
 
-            if len(public_url) == 0:
-                raise Exception("Public gateway URL not defined")
+        public_url = config.get('publicGateway', '')
 
-            if type(public_url) == list and len(public_url) > 0:
-                public_url = public_url[0]
-            
+        if len(public_url) == 0:
+            raise Exception("Public gateway URL not defined")
 
-            local_url = f"{block_id}-executor-svc.blocks.svc.cluster.local"
-            item = {
-                "local": local_url,
-                "public": public_url,
-                "clusterId": cluster['id']
-            }
+        if type(public_url) == list and len(public_url) > 0:
+            public_url = public_url[0]
 
-            self.items[block_id] = item
+        local_url = f"{block_id}-executor-svc.blocks.svc.cluster.local"
+        item = {
+            "local": local_url,
+            "public": public_url,
+            "clusterId": cluster['id']
+        }
 
-            return item
+        return item, (block_tag(block_id), cluster_tag(cluster['id']))
 
+    def get(self, block_id: str):
+        try:
+            return self.items.get_or_load(block_id, lambda: self._load(block_id))
         except Exception as e:
             raise e
 
+    def invalidate(self, block_id):
+        self.items.invalidate_tag(block_tag(block_id))
+
     def resolve_outputs(self, parent_block, child_blocks_list):
         try:
 
@@ -298,28 +320,31 @@ class GraphCache:
 class SearchSessionsCache:
 
     def __init__(self) -> None:
-        self.sessions = {}
+        self.sessions = LookupCache(
+            "search_sessions",
+            max_size=int(os.getenv("SEARCH_SESSIONS_CACHE_SIZE", 100000)),
+            ttl=float(os.getenv("SEARCH_SESSIONS_CACHE_TTL", 3600)),
+            negative_ttl=_negative_ttl())
         self.discovery_mode = os.getenv("DISCOVERY_MODE", "gateway")
 
+    def _search(self, search_data: str):
+        search_response = map_block_to_search(search_data)
+        block_id = search_response.get('id', '')
+        if block_id == "":
+            raise Exception(
+                f"invalid similarity search result, {search_response}")
+
+        # a deleted or moved block drops the sessions pinned to it
+        return block_id, (block_tag(block_id),)
+
     def get_block_id(self, session_id: str, search_data: str):
         try:
 
             if self.discovery_mode == "testing":
                 return os.getenv("INSTANCE_BLOCK_DEFAULT_URL", "localhost")
             else:
-                # handle gateway:
-                if session_id in self.sessions:
-                    return self.sessions[session_id]
-
-                # handle new connection:
-                search_response = map_block_to_search(search_data)
-                block_id = search_response.get('id', '')
-                if block_id == "":
-                    raise Exception(
-                        f"invalid similarity search result, {search_response}")
-
-                self.sessions[session_id] = block_id
-                return block_id
+                return self.sessions.get_or_load(
+                    session_id, lambda: self._search(search_data))
 
         except Exception as e:
             raise e
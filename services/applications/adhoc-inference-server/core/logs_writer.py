@@ -0,0 +1,276 @@
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+
+import psycopg2
+import psycopg2.extras
+
+logger = logging.getLogger(__name__)
+
+LOGS_TABLE = "block_inference"
+
+# wakes the writer on close, so it does not sit out the flush interval
+_STOP = object()
+
+COLUMNS = (
+    "request_id", "session_id", "block_id", "seq_no", "ts",
+    "frame_ptr", "data", "query_parameters", "output_ptr"
+)
+
+
+def packet_to_row(packet):
+    return (
+        str(uuid.uuid4()),
+        packet.session_id,
+        packet.block_id or None,
+        packet.seq_no,
+        packet.ts or time.time(),
+        bytes(packet.frame_ptr) if packet.frame_ptr else None,
+        packet.data.encode("utf-8") if packet.data else None,
+        packet.query_parameters.encode("utf-8") if packet.query_parameters else None,
+        packet.output_ptr.encode("utf-8") if packet.output_ptr else None
+    )
+
+
+class MemoryLogSink:
+    # in-memory fake, rows are kept as dicts keyed by column name
+    def __init__(self):
+        self.rows = []
+        self.lock = threading.Lock()
+
+    def write(self, rows):
+        with self.lock:
+            self.rows.extend(dict(zip(COLUMNS, row)) for row in rows)
+
+    def query(self, query, params):
+        raise Exception("MemoryLogSink does not support SQL queries")
+
+    def close(self):
+        pass
+
+
+class PostgresLogSink:
+    def __init__(self):
+        self.db_host = os.getenv("DB_HOST")
+        self.db_name = os.getenv("DB_NAME")
+        self.db_user = os.getenv("DB_USER")
+        self.db_password = os.getenv("DB_PASSWORD")
+        self.db_port = int(os.getenv("DB_PORT", 5432))
+        self.connection = None
+        # queries come from REST threads, keep them off the writer's connection
+        self.query_connection = None
+        self._connect()
+        self.create_table()
+
+    def _new_connection(self):
+        return psycopg2.connect(
+            host=self.db_host,
+            dbname=self.db_name,
+            user=self.db_user,
+            password=self.db_password,
+            port=self.db_port
+        )
+
+    def _connect(self):
+        self.connection = self._new_connection()
+
+    def create_table(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {LOGS_TABLE} (
+                request_id UUID NOT NULL,
+                session_id TEXT,
+                block_id TEXT,
+                seq_no BIGINT,
+                ts TIMESTAMPTZ NOT NULL,
+                frame_ptr BYTEA,
+                data BYTEA,
+                query_parameters BYTEA,
+                output_ptr BYTEA,
+                PRIMARY KEY (request_id, ts)
+            );
+            CREATE INDEX IF NOT EXISTS {LOGS_TABLE}_session_idx ON {LOGS_TABLE} (session_id);
+            CREATE INDEX IF NOT EXISTS {LOGS_TABLE}_block_idx ON {LOGS_TABLE} (block_id);
+            ''')
+        self.connection.commit()
+
+        # hypertable only when timescale is installed
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT create_hypertable('{LOGS_TABLE}', 'ts', if_not_exists => TRUE);")
+            self.connection.commit()
+        except psycopg2.Error as e:
+            self.connection.rollback()
+            logger.warning(f"[PostgresLogSink] create_hypertable skipped: {e}")
+
+    def write(self, rows):
+        try:
+            with self.connection.cursor() as cursor:
+                psycopg2.extras.execute_values(
+                    cursor,
+                    f"INSERT INTO {LOGS_TABLE} ({', '.join(COLUMNS)}) VALUES %s",
+                    rows,
+                    template="(%s, %s, %s, %s, to_timestamp(%s), %s, %s, %s, %s)",
+                    page_size=len(rows)
+                )
+            self.connection.commit()
+        except psycopg2.Error:
+            try:
+                self.connection.rollback()
+            except psycopg2.Error:
+                self._connect()
+            raise
+
+    def query(self, query, params):
+        if self.query_connection is None or self.query_connection.closed:
+            self.query_connection = self._new_connection()
+            self.query_connection.autocommit = True
+
+        with self.query_connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def close(self):
+        self.connection.close()
+        if self.query_connection is not None:
+            self.query_connection.close()
+
+
+class DBLogsWriter(threading.Thread):
+    # request threads only enqueue rows, a background writer flushes them in
+    # multi-row batches on size or time thresholds
+    def __init__(self, sink=None, max_buffer=None, batch_size=None,
+                 flush_interval=None, overflow_policy=None, block_timeout=None):
+        super().__init__(daemon=True)
+        self.sink = sink if sink is not None else PostgresLogSink()
+
+        self.max_buffer = max_buffer or int(os.getenv("LOGS_MAX_BUFFER", 10000))
+        self.batch_size = batch_size or int(os.getenv("LOGS_BATCH_SIZE", 500))
+        self.flush_interval = flush_interval or float(os.getenv("LOGS_FLUSH_INTERVAL", 1))
+        self.overflow_policy = overflow_policy or os.getenv("LOGS_OVERFLOW_POLICY", "drop")
+        self.block_timeout = block_timeout or float(os.getenv("LOGS_BLOCK_TIMEOUT", 1))
+
+        if self.overflow_policy not in ("drop", "block"):
+            raise ValueError(f"invalid overflow policy: {self.overflow_policy}")
+
+        self.log_queue = queue.Queue(maxsize=self.max_buffer)
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+
+        self.metrics = {
+            "rows_written": 0,
+            "dropped_rows": 0,
+            "failed_rows": 0,
+            "flushes": 0,
+            "flush_failures": 0,
+            "last_flush_latency": 0.0,
+            "max_flush_latency": 0.0,
+            "total_flush_latency": 0.0
+        }
+
+    def log(self, packet):
+        try:
+            row = packet_to_row(packet)
+            if self.overflow_policy == "block":
+                self.log_queue.put(row, timeout=self.block_timeout)
+            else:
+                self.log_queue.put_nowait(row)
+        except queue.Full:
+            with self.lock:
+                self.metrics["dropped_rows"] += 1
+        except Exception as e:
+            logger.error(f"[DBLogsWriter] error putting packet in log queue: {e}")
+
+    def _flush(self, rows):
+        start = time.time()
+        try:
+            self.sink.write(rows)
+            ok = True
+        except Exception as e:
+            ok = False
+            logger.error(f"[DBLogsWriter] failed to write {len(rows)} rows: {e}")
+
+        latency = time.time() - start
+        with self.lock:
+            self.metrics["flushes"] += 1
+            self.metrics["last_flush_latency"] = latency
+            self.metrics["max_flush_latency"] = max(self.metrics["max_flush_latency"], latency)
+            self.metrics["total_flush_latency"] += latency
+            if ok:
+                self.metrics["rows_written"] += len(rows)
+            else:
+                self.metrics["flush_failures"] += 1
+                self.metrics["failed_rows"] += len(rows)
+
+    def run(self):
+        while not self.stop_event.is_set() or not self.log_queue.empty():
+            try:
+                row = self.log_queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            rows = [] if row is _STOP else [row]
+
+            deadline = time.time() + self.flush_interval
+            while len(rows) < self.batch_size:
+                try:
+                    if self.stop_event.is_set():
+                        # closing: drain what is buffered without waiting for more
+                        row = self.log_queue.get_nowait()
+                    else:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            break
+                        row = self.log_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is not _STOP:
+                    rows.append(row)
+
+            if rows:
+                self._flush(rows)
+
+    def get_metrics(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+
+        metrics["buffered_rows"] = self.log_queue.qsize()
+        metrics["avg_flush_latency"] = metrics["total_flush_latency"] / \
+            metrics["flushes"] if metrics["flushes"] else 0.0
+        return metrics
+
+    def query(self, query, params):
+        try:
+            return self.sink.query(query, params)
+        except Exception as e:
+            logger.error(f"[DBLogsWriter] error executing query: {e}")
+            return []
+
+    def close(self):
+        self.stop_event.set()
+        try:
+            self.log_queue.put_nowait(_STOP)
+        except queue.Full:
+            # a full queue keeps the writer busy, it sees the stop event anyway
+            pass
+        self.join()
+        try:
+            self.sink.close()
+        except Exception as e:
+            logger.error(f"[DBLogsWriter] error closing sink: {e}")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_logs_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DBLogsWriter()
+            _writer.start()
+        return _writer
@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+_registry = weakref.WeakSet()
+_registry_lock = threading.Lock()
+
+
+class CacheEntry:
+    def __init__(self, value, expires_at, tags=(), error=None):
+        self.value = value
+        self.expires_at = expires_at
+        self.tags = set(tags)
+        self.error = error
+
+
+class LookupCache:
+    # LRU + TTL cache with negative entries for failed lookups and
+    # single-flight loading, so concurrent misses on a key hit the backend once
+    def __init__(self, name, max_size=10000, ttl=300, negative_ttl=5):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self.entries = OrderedDict()
+        self.inflight = {}
+        # bumped on invalidation so a load that raced it is not stored
+        self.generation = 0
+        self.lock = threading.Lock()
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "coalesced": 0
+        }
+
+        with _registry_lock:
+            _registry.add(self)
+
+    def _lookup(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            del self.entries[key]
+            self.stats["expirations"] += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_or_load(self, key, loader):
+        # loader returns (value, tags)
+        with self.lock:
+            entry = self._lookup(key, time.time())
+            if entry is not None:
+                if entry.error is not None:
+                    self.stats["negative_hits"] += 1
+                    raise Exception(entry.error)
+                self.stats["hits"] += 1
+                return entry.value
+
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inflight[key] = future
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+            generation = self.generation
+
+        if not owner:
+            return future.result()
+
+        try:
+            value, tags = loader()
+        except Exception as e:
+            with self.lock:
+                if self.negative_ttl > 0:
+                    self._store(key, CacheEntry(
+                        None, time.time() + self.negative_ttl, error=str(e)))
+                self.inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            if generation == self.generation:
+                self._store(key, CacheEntry(value, time.time() + self.ttl, tags))
+            self.inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def get_tags(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            return set(entry.tags) if entry is not None else set()
+
+    def invalidate(self, key):
+        with self.lock:
+            self.generation += 1
+            if self.entries.pop(key, None) is not None:
+                self.stats["invalidations"] += 1
+
+    def invalidate_tag(self, tag):
+        with self.lock:
+            self.generation += 1
+            keys = [key for key, entry in self.entries.items() if tag in entry.tags]
+            for key in keys:
+                del self.entries[key]
+            self.stats["invalidations"] += len(keys)
+
+        if keys:
+            logger.info(f"[LookupCache] {self.name}: invalidated {len(keys)} entries for {tag}")
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.stats["invalidations"] += len(self.entries)
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self.entries)
+
+        lookups = stats["hits"] + stats["misses"] + stats["negative_hits"] + stats["coalesced"]
+        stats["hit_rate"] = (stats["hits"] + stats["negative_hits"] + stats["coalesced"]) / lookups if lookups else 0.0
+        return stats
+
+
+def block_tag(block_id):
+    return f"block:{block_id}"
+
+
+def cluster_tag(cluster_id):
+    return f"cluster:{cluster_id}"
+
+
+def invalidate_tag(tag):
+    with _registry_lock:
+        caches = list(_registry)
+    for cache in caches:
+        cache.invalidate_tag(tag)
+
+
+def handle_event(event: dict):
+    # {"type": "block" | "cluster", "id": "..."}, anything else flushes everything
+    event_type = event.get("type", "")
+    object_id = event.get("id", "")
+
+    if event_type == "block" and object_id:
+        invalidate_tag(block_tag(object_id))
+    elif event_type == "cluster" and object_id:
+        invalidate_tag(cluster_tag(object_id))
+    else:
+        with _registry_lock:
+            caches = list(_registry)
+        for cache in caches:
+            cache.clear()
+
+
+def get_all_stats():
+    with _registry_lock:
+        caches = list(_registry)
+
+    stats = {}
+    for cache in caches:
+        stats.setdefault(cache.name, []).append(cache.get_stats())
+    return stats
+
+
+class CacheInvalidationListener(threading.Thread):
+    # subscribes to block/cluster change events published on redis
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.host = os.getenv("INFERENCE_REDIS_INTERNAL_URL", "localhost")
+        self.port = int(os.getenv("CACHE_EVENTS_REDIS_PORT", 6379))
+        self.channel = os.getenv("CACHE_EVENTS_CHANNEL", "block_cluster_events")
+
+    def run(self):
+        while True:
+            try:
+                connection = redis.Redis(host=self.host, port=self.port)
+                pubsub = connection.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                logger.info(f"[CacheInvalidationListener] listening on {self.channel}")
+
+                for message in pubsub.listen():
+                    try:
+                        handle_event(json.loads(message["data"]))
+                    except Exception as e:
+                        logger.error(f"[CacheInvalidationListener] bad event {message}: {str(e)}")
+
+            except Exception as e:
+                logger.error(f"[CacheInvalidationListener] subscription failed: {str(e)}")
+                # entries may have changed while disconnected
+                handle_event({})
+                time.sleep(5)
+
+
+_listener = None
+
+
+def start_invalidation_listener():
+    global _listener
+    with _registry_lock:
+        if _listener is not None:
+            return _listener
+        _listener = CacheInvalidationListener()
+    _listener.start()
+    return _listener
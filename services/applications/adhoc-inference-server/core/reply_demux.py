@@ -0,0 +1,195 @@
+import time
+import json
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+
+from . import service_pb2
+
+logger = logging.getLogger(__name__)
+
+
+class PendingReply:
+    def __init__(self, key, deadline):
+        self.key = key
+        self.deadline = deadline
+        self.future = Future()
+
+
+class PendingStream:
+    # replies are handed to an asyncio queue on the caller's loop, the stream
+    # stays registered until a non-partial reply arrives
+    def __init__(self, key, deadline, loop, timeout):
+        self.key = key
+        self.deadline = deadline
+        self.timeout = timeout
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.future = None
+
+    def put(self, item):
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+        except RuntimeError:
+            # the caller's loop is closed, it went away without cancelling
+            logger.warning(f"[ReplyDemultiplexer] stream session_id={self.key[0]}, seq_no={self.key[1]} has no loop")
+
+
+def is_partial(packet):
+    # blocks mark intermediate outputs with {"partial": true} in the data
+    if '"partial"' not in packet.data:
+        return False
+    try:
+        data = json.loads(packet.data)
+        return isinstance(data, dict) and data.get("partial") is True
+    except Exception:
+        return False
+
+
+class ReplyDemultiplexer:
+    # one reply queue per replica, a single consumer completes the waiting
+    # futures keyed by (session_id, seq_no)
+    def __init__(self, connection, queue_name, default_timeout=600, poll_timeout=1):
+        self.connection = connection
+        self.queue_name = queue_name
+        self.default_timeout = default_timeout
+        self.poll_timeout = poll_timeout
+
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.stats = {
+            "completed": 0,
+            "timed_out": 0,
+            "orphans": 0,
+            "parse_errors": 0
+        }
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._consume, daemon=True)
+        self.thread.start()
+        logger.info(f"[ReplyDemultiplexer] consuming replies from {self.queue_name}")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.poll_timeout + 1)
+
+    def register(self, session_id, seq_no, timeout=None):
+        key = (session_id, int(seq_no))
+        deadline = time.time() + (timeout or self.default_timeout)
+        entry = PendingReply(key, deadline)
+
+        with self.lock:
+            if key in self.pending:
+                raise Exception(
+                    f"request session_id={session_id}, seq_no={seq_no} is already in flight")
+            self.pending[key] = entry
+
+        return entry.future
+
+    def register_stream(self, session_id, seq_no, loop, timeout=None):
+        key = (session_id, int(seq_no))
+        timeout = timeout or self.default_timeout
+        entry = PendingStream(key, time.time() + timeout, loop, timeout)
+
+        with self.lock:
+            if key in self.pending:
+                raise Exception(
+                    f"request session_id={session_id}, seq_no={seq_no} is already in flight")
+            self.pending[key] = entry
+
+        return entry
+
+    def cancel(self, session_id, seq_no):
+        with self.lock:
+            entry = self.pending.pop((session_id, int(seq_no)), None)
+        if entry and entry.future:
+            entry.future.cancel()
+
+    def wait(self, session_id, seq_no, future, timeout=None):
+        try:
+            return future.result(timeout=timeout or self.default_timeout)
+        except Exception:
+            self.cancel(session_id, seq_no)
+            raise
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.pending)
+
+    def _complete(self, raw):
+        packet = service_pb2.AIOSPacket()
+        try:
+            packet.ParseFromString(raw)
+        except Exception as e:
+            self.stats["parse_errors"] += 1
+            logger.error(f"[ReplyDemultiplexer] dropping unparsable reply: {str(e)}")
+            return
+
+        key = (packet.session_id, packet.seq_no)
+        partial = is_partial(packet)
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is not None and not partial:
+                del self.pending[key]
+            elif isinstance(entry, PendingStream):
+                # every partial output pushes the idle deadline forward
+                entry.deadline = time.time() + entry.timeout
+
+        if entry is None:
+            # the caller timed out or went away
+            self.stats["orphans"] += 1
+            logger.warning(
+                f"[ReplyDemultiplexer] orphan reply session_id={packet.session_id}, seq_no={packet.seq_no}")
+            return
+
+        if isinstance(entry, PendingStream):
+            entry.put(packet)
+            if not partial:
+                self.stats["completed"] += 1
+            return
+
+        # unary callers only get the final output
+        if partial:
+            return
+
+        if entry.future.set_running_or_notify_cancel():
+            entry.future.set_result(packet)
+            self.stats["completed"] += 1
+
+    def _expire(self):
+        now = time.time()
+        with self.lock:
+            expired = [key for key, entry in self.pending.items()
+                       if entry.deadline <= now]
+            entries = [self.pending.pop(key) for key in expired]
+
+        for entry in entries:
+            self.stats["timed_out"] += 1
+            error = TimeoutError(
+                f"no reply for session_id={entry.key[0]}, seq_no={entry.key[1]}")
+            if isinstance(entry, PendingStream):
+                entry.put(error)
+            elif entry.future.set_running_or_notify_cancel():
+                entry.future.set_exception(error)
+
+    def _consume(self):
+        last_sweep = time.time()
+        while not self.stop_event.is_set():
+            try:
+                item = self.connection.brpop(self.queue_name, timeout=self.poll_timeout)
+                if item:
+                    self._complete(item[1])
+            except Exception as e:
+                logger.error(f"[ReplyDemultiplexer] error reading replies: {str(e)}")
+                time.sleep(self.poll_timeout)
+
+            if time.time() - last_sweep >= self.poll_timeout:
+                self._expire()
+                last_sweep = time.time()
@@ -0,0 +1,91 @@
+import os
+import copy
+import json
+import logging
+
+from . import service_pb2
+from .lookup_cache import LookupCache, block_tag
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTemplate:
+    def __init__(self, block_id, url, port, output_ptr):
+        self.block_id = block_id
+        self.url = url
+        self.port = port
+        self.output_ptr = output_ptr
+        # output_ptr (field 6) pre-encoded and appended to the per-request part of the
+        # packet, protobuf parsers merge fields in any order
+        self.encoded_ptr = service_pb2.AIOSPacket(
+            output_ptr=output_ptr).SerializeToString()
+
+    def serialize(self, request):
+        packet = service_pb2.AIOSPacket(
+            session_id=request.session_id,
+            seq_no=request.seq_no,
+            data=request.data,
+            ts=request.ts,
+            files=request.files
+        )
+        return packet.SerializeToString() + self.encoded_ptr
+
+
+class RequestTemplateCache:
+    # one compiled template per (block, output graph), so discovery, graph
+    # resolution and output_ptr encoding run only when either changes
+    def __init__(self, discovery_cache, graph_cache, resolve_graph,
+                 output_connection, output_connection_internal, reply_queue):
+        self.discovery_cache = discovery_cache
+        self.graph_cache = graph_cache
+        self.resolve_graph = resolve_graph
+        self.reply_queue = reply_queue
+
+        self.final_ptr = copy.deepcopy(output_connection)
+        self.final_ptr['outputs'][0]['queue_name'] = reply_queue
+        self.final_ptr_internal = copy.deepcopy(output_connection_internal)
+        self.final_ptr_internal['outputs'][0]['queue_name'] = reply_queue
+
+        self.templates = LookupCache(
+            "request_templates",
+            max_size=int(os.getenv("REQUEST_TEMPLATE_CACHE_SIZE", 10000)),
+            ttl=float(os.getenv("DISCOVERY_CACHE_TTL", 60)),
+            negative_ttl=0)
+
+    def get(self, block_id, output_ptr=""):
+        return self.templates.get_or_load(
+            (block_id, output_ptr), lambda: self._compile(block_id, output_ptr))
+
+    def invalidate(self, block_id):
+        self.templates.invalidate_tag(block_tag(block_id))
+
+    def _compile(self, block_id, output_ptr):
+        url, port = self.discovery_cache.discover(block_id)
+        tags = set(self.discovery_cache.entries.get_tags(block_id))
+        tags.add(block_tag(block_id))
+
+        if output_ptr == "":
+            final_ptr = self.final_ptr_internal if port != 0 else self.final_ptr
+            compiled_ptr = json.dumps(final_ptr)
+        else:
+            output_config = json.loads(output_ptr)
+            if 'is_graph' in output_config and output_config['is_graph']:
+
+                if 'is_compiled' in output_config and output_config['is_compiled']:
+                    del output_config['is_compiled']
+                else:
+                    output_config['graph'] = self.resolve_graph(
+                        output_config['graph'], self.graph_cache)
+
+                    for graph_block_id, children in json.loads(output_ptr)['graph'].items():
+                        tags.add(block_tag(graph_block_id))
+                        for child_id in children:
+                            tags.add(block_tag(child_id))
+
+                output_config['graph']['final'] = self.final_ptr
+
+            compiled_ptr = json.dumps(output_config)
+
+        logger.info(f"[RequestTemplateCache] compiled template for block_id={block_id}, url={url}, port={port}")
+
+        return RequestTemplate(block_id, url, port, compiled_ptr), tags
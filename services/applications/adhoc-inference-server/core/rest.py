@@ -1,135 +1,26 @@
 import threading
-import queue
-import uuid
-import psycopg2
-import psycopg2.extras
 
 from .search import SearchClient
 from .discovery import DiscoveryCache, GraphCache, Estimator
+from . import lookup_cache
+from .logs_writer import LOGS_TABLE, get_logs_writer
 
 import os
 
 from flask import Flask, jsonify, request
 
 graphs_cache = GraphCache()
+discovery_cache = DiscoveryCache()
 estimator = Estimator()
 
 app = Flask(__name__)
 
 
-class DBLogsWriter(threading.Thread):
-    def __init__(self):
-        super().__init__()
-        self.log_queue = queue.Queue()
-        self.stop_event = threading.Event()
-        self.db_host = os.getenv("DB_HOST")
-        self.db_name = os.getenv("DB_NAME")
-        self.db_user = os.getenv("DB_USER")
-        self.db_password = os.getenv("DB_PASSWORD")
-        self.db_port = int(os.getenv("DB_PORT", 5432))
-        self._initialize_db()
-
-    def _initialize_db(self):
-        try:
-            self.connection = psycopg2.connect(
-                host=self.db_host,
-                dbname=self.db_name,
-                user=self.db_user,
-                password=self.db_password,
-                port=self.db_port
-            )
-            self.cursor = self.connection.cursor()
-            self.create_table()
-        except psycopg2.Error as e:
-            print(f"Error initializing database: {e}")
-
-    def create_table(self):
-        try:
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS block_inference (
-                request_id UUID PRIMARY KEY,
-                session_id TEXT,
-                block_id TEXT,
-                seq_no INTEGER,
-                ts TIMESTAMPTZ,
-                frame_ptr BYTEA,
-                data BYTEA,
-                query_parameters BYTEA,
-                output_ptr BYTEA,
-            );
-
-            SELECT create_hypertable('block_inference', 'ts', if_not_exists => TRUE);
-            ''')
-            self.connection.commit()
-        except psycopg2.Error as e:
-            print(f"Error creating table: {e}")
-
-    def run(self):
-        while not self.stop_event.is_set() or not self.log_queue.empty():
-            try:
-                packet = self.log_queue.get(timeout=1)
-                self._log_to_db(packet)
-            except queue.Empty:
-                continue
-            except Exception as e:
-                print(f"Error processing log queue: {e}")
-
-    def _log_to_db(self, packet):
-        try:
-            request_id = uuid.uuid4()
-            session_id = packet.session_id
-            block_id = packet.block_id if packet.HasField('block_id') else None
-            instance_id = packet.instance_id if packet.HasField(
-                'instance_id') else None
-            seq_no = packet.seq_no
-            query_parameters = packet.query_parameters
-            ts = packet.ts
-            is_frame = packet.is_frame
-            frame_ptr = packet.frame_ptr if is_frame else None
-
-            self.cursor.execute('''
-            INSERT INTO logs (
-                request_id, session_id, block_id, instance_id, seq_no,
-                query_parameters, ts, is_frame, frame_ptr
-            ) VALUES (%s, %s, %s, %s, %s, %s, to_timestamp(%s), %s, %s)
-            ''', (
-                request_id, session_id, block_id, instance_id, seq_no,
-                query_parameters, ts, is_frame, frame_ptr
-            ))
-
-            self.connection.commit()
-            self.log_queue.task_done()
-        except psycopg2.Error as e:
-            print(f"Error logging to database: {e}")
-
-    def log(self, packet):
-        try:
-            self.log_queue.put(packet)
-        except Exception as e:
-            print(f"Error putting packet in log queue: {e}")
-
-    def close(self):
-        self.stop_event.set()
-        self.join()
-        try:
-            self.connection.close()
-        except psycopg2.Error as e:
-            print(f"Error closing database connection: {e}")
-
-    def query(self, query, params):
-        try:
-            self.cursor.execute(query, params)
-            return self.cursor.fetchall()
-        except psycopg2.Error as e:
-            print(f"Error executing query: {e}")
-            return []
-
-
 @app.route('/logs/session/<session_id>', methods=['GET'])
 def get_records_by_session_id(session_id):
     try:
-        query = "SELECT * FROM logs WHERE session_id = %s"
-        records = DBLogsWriter().query(query, (session_id,))
+        query = f"SELECT * FROM {LOGS_TABLE} WHERE session_id = %s"
+        records = get_logs_writer().query(query, (session_id,))
         return jsonify(records), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -138,8 +29,8 @@ def get_records_by_session_id(session_id):
 @app.route('/logs/request/<request_id>', methods=['GET'])
 def get_records_by_request_id(request_id):
     try:
-        query = "SELECT * FROM logs WHERE request_id = %s"
-        records = DBLogsWriter().query(query, (request_id,))
+        query = f"SELECT * FROM {LOGS_TABLE} WHERE request_id = %s"
+        records = get_logs_writer().query(query, (request_id,))
         return jsonify(records), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -148,8 +39,8 @@ def get_records_by_request_id(request_id):
 @app.route('/logs/block/<block_id>', methods=['GET'])
 def get_records_by_block_id(block_id):
     try:
-        query = "SELECT * FROM logs WHERE block_id = %s"
-        records = DBLogsWriter().query(query, (block_id,))
+        query = f"SELECT * FROM {LOGS_TABLE} WHERE block_id = %s"
+        records = get_logs_writer().query(query, (block_id,))
         return jsonify(records), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -160,13 +51,21 @@ def get_records_by_session_id_and_block_id():
     try:
         session_id = request.args.get('session_id')
         block_id = request.args.get('block_id')
-        query = "SELECT * FROM logs WHERE session_id = %s AND block_id = %s"
-        records = DBLogsWriter().query(query, (session_id, block_id))
+        query = f"SELECT * FROM {LOGS_TABLE} WHERE session_id = %s AND block_id = %s"
+        records = get_logs_writer().query(query, (session_id, block_id))
         return jsonify(records), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/logs/metrics', methods=['GET'])
+def get_logs_metrics():
+    try:
+        return jsonify(get_logs_writer().get_metrics()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/discovery/search', methods=['POST'])
 def discover_search():
     try:
@@ -209,8 +108,7 @@ def discover_filter():
 def discover_public_url(block_id):
     try:
 
-        discovery = DiscoveryCache()
-        public_url, port = discovery.discover(block_id, instance_id="")
+        public_url, port = discovery_cache.discover(block_id, instance_id="")
 
         return jsonify({
             "success": True,
@@ -274,7 +172,28 @@ def check_execute():
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+@app.route("/discovery/cache/invalidate", methods=['POST'])
+def invalidate_cache():
+    try:
+        lookup_cache.handle_event(request.json or {})
+        return jsonify({"success": True}), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route("/discovery/cache/stats", methods=['GET'])
+def cache_stats():
+    try:
+        return jsonify({"success": True, "data": lookup_cache.get_all_stats()}), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 def run_app():
+    lookup_cache.start_invalidation_listener()
+
     def run():
         app.run(host='0.0.0.0', port=20000)
 
@@ -6,7 +6,7 @@ from . import service_pb2 as service__pb2
 
 
 class BlockInferenceServiceStub(object):
-    """Define the gRPC service
+    """the inference service
     """
 
     def __init__(self, channel):
@@ -20,10 +20,15 @@ class BlockInferenceServiceStub(object):
                 request_serializer=service__pb2.BlockInferencePacket.SerializeToString,
                 response_deserializer=service__pb2.AIOSPacket.FromString,
                 )
+        self.infer_stream = channel.unary_stream(
+                '/BlockInferenceService/infer_stream',
+                request_serializer=service__pb2.BlockInferencePacket.SerializeToString,
+                response_deserializer=service__pb2.AIOSPacket.FromString,
+                )
 
 
 class BlockInferenceServiceServicer(object):
-    """Define the gRPC service
+    """the inference service
     """
 
     def infer(self, request, context):
@@ -32,6 +37,13 @@ class BlockInferenceServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def infer_stream(self, request, context):
+        """partial outputs of the final block, then the final output
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_BlockInferenceServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -40,6 +52,11 @@ def add_BlockInferenceServiceServicer_to_server(servicer, server):
                     request_deserializer=service__pb2.BlockInferencePacket.FromString,
                     response_serializer=service__pb2.AIOSPacket.SerializeToString,
             ),
+            'infer_stream': grpc.unary_stream_rpc_method_handler(
+                    servicer.infer_stream,
+                    request_deserializer=service__pb2.BlockInferencePacket.FromString,
+                    response_serializer=service__pb2.AIOSPacket.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'BlockInferenceService', rpc_method_handlers)
@@ -48,7 +65,7 @@ def add_BlockInferenceServiceServicer_to_server(servicer, server):
 
  # This class is part of an EXPERIMENTAL API.
 class BlockInferenceService(object):
-    """Define the gRPC service
+    """the inference service
     """
 
     @staticmethod
@@ -67,3 +84,20 @@ class BlockInferenceService(object):
             service__pb2.AIOSPacket.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def infer_stream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/BlockInferenceService/infer_stream',
+            service__pb2.BlockInferencePacket.SerializeToString,
+            service__pb2.AIOSPacket.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -0,0 +1,26 @@
+# python -m tests.bench_request_templates
+# per-request packet construction before and after request templates
+import json
+import time
+
+from tests.test_request_templates import OUTPUT_PTRS, legacy_serialize, make_request, make_templates
+
+
+def measure(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+if __name__ == "__main__":
+    rounds = 20000
+    templates, _ = make_templates(6379)
+    for name, output_ptr in (("default", OUTPUT_PTRS[0]), ("graph", OUTPUT_PTRS[1])):
+        for data_size in (64, 16384):
+            request = make_request(output_ptr, data=json.dumps({"prompt": "x" * data_size}))
+            template = templates.get("b1", output_ptr)
+            legacy = measure(lambda: legacy_serialize(request, 6379), rounds)
+            templated = measure(lambda: template.serialize(request), rounds)
+            print(f"{name:>8} data={data_size:<6} legacy {legacy:7.2f}us  template {templated:7.2f}us  "
+                  f"speedup {legacy / templated:4.1f}x")
@@ -0,0 +1,197 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from core import service_pb2
+from core.logs_writer import COLUMNS, DBLogsWriter, MemoryLogSink, packet_to_row
+
+
+class RecordingSink(MemoryLogSink):
+    def __init__(self, gate=None):
+        super().__init__()
+        self.batches = []
+        self.gate = gate
+
+    def write(self, rows):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.batches.append(len(rows))
+        super().write(rows)
+
+
+class FailingSink(MemoryLogSink):
+    def write(self, rows):
+        raise Exception("database down")
+
+
+def packet(seq_no=1, **kwargs):
+    return service_pb2.BlockInferencePacket(
+        block_id="b1", session_id="s1", seq_no=seq_no, ts=1700000000.5, data='{"x": 1}', **kwargs)
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_packet_to_row():
+    row = dict(zip(COLUMNS, packet_to_row(packet(
+        7, frame_ptr=b"\x01\x02", query_parameters='{"q": 1}', output_ptr='{"o": 1}'))))
+
+    uuid.UUID(row["request_id"])
+    assert row["session_id"] == "s1"
+    assert row["block_id"] == "b1"
+    assert row["seq_no"] == 7
+    assert row["ts"] == 1700000000.5
+    assert row["frame_ptr"] == b"\x01\x02"
+    assert row["data"] == b'{"x": 1}'
+    assert row["query_parameters"] == b'{"q": 1}'
+    assert row["output_ptr"] == b'{"o": 1}'
+
+
+def test_packet_to_row_empty_fields():
+    before = time.time()
+    row = dict(zip(COLUMNS, packet_to_row(service_pb2.BlockInferencePacket())))
+
+    assert row["block_id"] is None
+    assert row["frame_ptr"] is None
+    assert row["data"] is None
+    assert row["query_parameters"] is None
+    assert row["output_ptr"] is None
+    # a packet without ts is logged at the time it was seen
+    assert before <= row["ts"] <= time.time()
+    assert packet_to_row(service_pb2.BlockInferencePacket())[0] != row["request_id"]
+
+
+def test_flush_on_batch_size():
+    sink = RecordingSink()
+    writer = DBLogsWriter(sink=sink, batch_size=10, flush_interval=5)
+    writer.start()
+
+    start = time.time()
+    for i in range(10):
+        writer.log(packet(i))
+
+    assert wait_for(lambda: sink.batches == [10])
+    # a full batch does not wait for the interval
+    assert time.time() - start < 2
+    writer.close()
+    assert [row["seq_no"] for row in sink.rows] == list(range(10))
+
+
+def test_flush_on_interval():
+    sink = RecordingSink()
+    writer = DBLogsWriter(sink=sink, batch_size=1000, flush_interval=0.2)
+    writer.start()
+
+    start = time.time()
+    for i in range(3):
+        writer.log(packet(i))
+
+    assert wait_for(lambda: sink.batches == [3])
+    assert time.time() - start >= 0.15
+    writer.close()
+
+
+def test_close_flushes_buffered_rows():
+    sink = RecordingSink()
+    writer = DBLogsWriter(sink=sink, batch_size=1000, flush_interval=10)
+    writer.start()
+    for i in range(5):
+        writer.log(packet(i))
+
+    writer.close()
+    assert len(sink.rows) == 5
+    assert writer.get_metrics()["rows_written"] == 5
+
+
+def test_drop_overflow_policy_never_blocks():
+    gate = threading.Event()
+    sink = RecordingSink(gate)
+    writer = DBLogsWriter(sink=sink, max_buffer=5, batch_size=1, flush_interval=0.05,
+                          overflow_policy="drop")
+    writer.start()
+
+    writer.log(packet(0))
+    assert wait_for(lambda: writer.log_queue.empty())  # the writer is stuck in the sink
+
+    start = time.time()
+    for i in range(1, 11):
+        writer.log(packet(i))
+    assert time.time() - start < 0.5
+
+    metrics = writer.get_metrics()
+    assert metrics["buffered_rows"] == 5
+    assert metrics["dropped_rows"] == 5
+
+    gate.set()
+    writer.close()
+    assert len(sink.rows) == 6
+
+
+def test_block_overflow_policy_waits_then_drops():
+    gate = threading.Event()
+    sink = RecordingSink(gate)
+    writer = DBLogsWriter(sink=sink, max_buffer=2, batch_size=1, flush_interval=0.05,
+                          overflow_policy="block", block_timeout=0.2)
+    writer.start()
+
+    writer.log(packet(0))
+    assert wait_for(lambda: writer.log_queue.empty())
+    writer.log(packet(1))
+    writer.log(packet(2))
+
+    # the buffer is full and the sink is stuck: the caller waits block_timeout, then drops
+    start = time.time()
+    writer.log(packet(3))
+    assert time.time() - start >= 0.15
+    assert writer.get_metrics()["dropped_rows"] == 1
+
+    # space freed within the timeout lets the caller through
+    threading.Timer(0.05, gate.set).start()
+    writer.log(packet(4))
+    assert writer.get_metrics()["dropped_rows"] == 1
+
+    writer.close()
+    assert sorted(row["seq_no"] for row in sink.rows) == [0, 1, 2, 4]
+
+
+def test_failed_flushes_are_counted():
+    writer = DBLogsWriter(sink=FailingSink(), batch_size=2, flush_interval=0.05)
+    writer.start()
+    for i in range(4):
+        writer.log(packet(i))
+    writer.close()
+
+    metrics = writer.get_metrics()
+    assert metrics["failed_rows"] == 4
+    assert metrics["flush_failures"] >= 2
+    assert metrics["rows_written"] == 0
+
+
+def test_invalid_overflow_policy():
+    with pytest.raises(ValueError):
+        DBLogsWriter(sink=MemoryLogSink(), overflow_policy="spill")
+
+
+def test_close_does_not_wait_for_the_flush_interval():
+    sink = RecordingSink()
+    writer = DBLogsWriter(sink=sink, batch_size=1000, flush_interval=30)
+    writer.start()
+    writer.close()
+
+    writer = DBLogsWriter(sink=sink, batch_size=1000, flush_interval=30)
+    writer.start()
+    writer.log(packet(1))
+    start = time.time()
+    writer.close()
+    assert time.time() - start < 2
+    assert sink.batches == [1]
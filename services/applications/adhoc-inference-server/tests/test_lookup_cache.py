@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from core import lookup_cache
+from core.lookup_cache import LookupCache, CacheInvalidationListener, block_tag, cluster_tag
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_entries_expire_and_failures_are_cached_briefly():
+    cache = LookupCache("t", ttl=0.05, negative_ttl=0.05)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls), [block_tag("b")]
+
+    assert cache.get_or_load("k", loader) == 1
+    assert cache.get_or_load("k", loader) == 1
+    time.sleep(0.1)
+    assert cache.get_or_load("k", loader) == 2
+
+    def failing():
+        calls.append(1)
+        raise Exception("not found")
+
+    for _ in range(3):
+        with pytest.raises(Exception):
+            cache.get_or_load("missing", failing)
+    assert len(calls) == 3
+
+
+def test_concurrent_misses_load_once():
+    cache = LookupCache("t")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return "v", []
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader)))
+               for _ in range(8)]
+    threads[0].start()
+    started.wait(2)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert results == ["v"] * 8
+    assert len(calls) == 1
+
+
+def test_invalidation_during_load_is_not_overwritten():
+    cache = LookupCache("t")
+
+    def loader():
+        cache.invalidate_tag(block_tag("b"))
+        return "old", [block_tag("b")]
+
+    assert cache.get_or_load("k", loader) == "old"
+    assert cache.get_or_load("k", lambda: ("new", [block_tag("b")])) == "new"
+
+
+def test_events_invalidate_by_tag():
+    blocks = LookupCache("blocks")
+    blocks.get_or_load("b1", lambda: ("b1", [block_tag("b1"), cluster_tag("c1")]))
+    blocks.get_or_load("b2", lambda: ("b2", [block_tag("b2"), cluster_tag("c2")]))
+
+    lookup_cache.handle_event({"type": "block", "id": "b1"})
+    assert set(blocks.entries) == {"b2"}
+
+    lookup_cache.handle_event({"type": "cluster", "id": "c2"})
+    assert set(blocks.entries) == set()
+
+    blocks.get_or_load("b1", lambda: ("b1", [block_tag("b1")]))
+    lookup_cache.handle_event({"type": "unknown"})
+    assert set(blocks.entries) == set()
+
+
+def test_listener_applies_published_events(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(lookup_cache.redis, "Redis",
+                        lambda **kwargs: fakeredis.FakeRedis(server=server))
+    publisher = fakeredis.FakeRedis(server=server)
+
+    cache = LookupCache("listener")
+    cache.get_or_load("b1", lambda: ("b1", [block_tag("b1")]))
+    cache.get_or_load("b2", lambda: ("b2", [block_tag("b2")]))
+
+    listener = CacheInvalidationListener()
+    listener.start()
+    assert wait_for(lambda: publisher.pubsub_numsub(listener.channel)[0][1] > 0)
+
+    # what block_transactions publishes when a block record changes
+    publisher.publish(listener.channel, json.dumps({"type": "block", "id": "b1"}))
+    assert wait_for(lambda: "b1" not in cache.entries)
+    assert "b2" in cache.entries
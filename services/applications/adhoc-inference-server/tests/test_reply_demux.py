@@ -0,0 +1,147 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from core import service_pb2
+from core.reply_demux import ReplyDemultiplexer, PendingStream
+
+
+QUEUE = "replies"
+
+
+def reply(session_id, seq_no, data):
+    return service_pb2.AIOSPacket(session_id=session_id, seq_no=seq_no, data=json.dumps(data)).SerializeToString()
+
+
+@pytest.fixture
+def demux():
+    connection = fakeredis.FakeStrictRedis()
+    demux = ReplyDemultiplexer(connection, QUEUE, default_timeout=5, poll_timeout=0.05)
+    demux.start()
+    yield demux
+    demux.stop()
+
+
+def test_out_of_order_replies_reach_their_callers(demux):
+    futures = {seq_no: demux.register("s", seq_no) for seq_no in range(20)}
+    other = demux.register("t", 3)
+
+    # replies arrive in reverse order, interleaved with another session
+    for seq_no in reversed(range(20)):
+        demux.connection.lpush(QUEUE, reply("s", seq_no, {"out": seq_no}))
+    demux.connection.lpush(QUEUE, reply("t", 3, {"out": "t"}))
+
+    for seq_no, future in futures.items():
+        packet = demux.wait("s", seq_no, future, timeout=2)
+        assert json.loads(packet.data) == {"out": seq_no}
+    assert json.loads(demux.wait("t", 3, other, timeout=2).data) == {"out": "t"}
+
+    assert demux.in_flight() == 0
+    assert demux.stats["completed"] == 21
+
+
+def test_unary_callers_skip_partial_outputs(demux):
+    future = demux.register("s", 1)
+    demux.connection.lpush(QUEUE, reply("s", 1, {"partial": True, "token": "a"}))
+    demux.connection.lpush(QUEUE, reply("s", 1, {"token": "done"}))
+
+    assert json.loads(demux.wait("s", 1, future, timeout=2).data) == {"token": "done"}
+
+
+def test_timed_out_reply_is_cleaned_up(demux):
+    future = demux.register("s", 1, timeout=0.1)
+
+    with pytest.raises(TimeoutError):
+        future.result(timeout=2)
+    assert demux.in_flight() == 0
+    assert demux.stats["timed_out"] == 1
+
+    # a late reply is counted as an orphan, not delivered
+    demux.connection.lpush(QUEUE, reply("s", 1, {"late": True}))
+    deadline = time.time() + 2
+    while demux.stats["orphans"] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert demux.stats["orphans"] == 1
+
+
+def test_caller_timeout_cancels_registration(demux):
+    future = demux.register("s", 1)
+    with pytest.raises(Exception):
+        demux.wait("s", 1, future, timeout=0.05)
+    assert demux.in_flight() == 0
+
+    # the same request can be registered again
+    demux.register("s", 1)
+    with pytest.raises(Exception):
+        demux.register("s", 1)
+
+
+def collect_stream(demux, session_id, seq_no, timeout, replies):
+    async def run():
+        loop = asyncio.get_running_loop()
+        stream = demux.register_stream(session_id, seq_no, loop, timeout=timeout)
+        for raw in replies:
+            demux.connection.lpush(QUEUE, raw)
+
+        items = []
+        while True:
+            item = await asyncio.wait_for(stream.queue.get(), 2)
+            items.append(item)
+            if isinstance(item, Exception) or '"partial"' not in item.data:
+                return items
+
+    return asyncio.run(run())
+
+
+def test_stream_ends_on_final_packet(demux):
+    items = collect_stream(demux, "s", 1, 5, [
+        reply("s", 1, {"partial": True, "i": 0}),
+        reply("s", 1, {"partial": True, "i": 1}),
+        reply("s", 1, {"i": 2}),
+    ])
+
+    assert [json.loads(p.data)["i"] for p in items] == [0, 1, 2]
+    assert demux.in_flight() == 0
+    assert demux.stats["completed"] == 1
+
+
+def test_stream_stays_registered_while_partials_arrive(demux):
+    async def run():
+        loop = asyncio.get_running_loop()
+        stream = demux.register_stream("s", 1, loop, timeout=0.3)
+        assert isinstance(demux.pending[("s", 1)], PendingStream)
+
+        # partials keep pushing the idle deadline past the original timeout
+        for i in range(6):
+            demux.connection.lpush(QUEUE, reply("s", 1, {"partial": True, "i": i}))
+            item = await asyncio.wait_for(stream.queue.get(), 2)
+            assert json.loads(item.data)["i"] == i
+            await asyncio.sleep(0.1)
+        assert demux.in_flight() == 1
+
+        # then it goes idle and expires
+        item = await asyncio.wait_for(stream.queue.get(), 2)
+        return item
+
+    item = asyncio.run(run())
+    assert isinstance(item, TimeoutError)
+    assert demux.in_flight() == 0
+    assert demux.stats["timed_out"] == 1
+
+
+def test_stream_of_a_closed_loop_does_not_stop_the_consumer(demux):
+    loop = asyncio.new_event_loop()
+    demux.register_stream("gone", 1, loop, timeout=0.1)
+    loop.close()
+
+    time.sleep(0.3)
+    assert demux.in_flight() == 0
+    assert demux.thread.is_alive()
+
+    future = demux.register("s", 1)
+    demux.connection.lpush(QUEUE, reply("s", 1, {"ok": True}))
+    assert json.loads(demux.wait("s", 1, future, timeout=2).data) == {"ok": True}
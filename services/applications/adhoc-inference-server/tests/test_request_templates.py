@@ -0,0 +1,138 @@
+import copy
+import json
+
+from core import service_pb2
+from core.request_templates import RequestTemplateCache
+
+
+OUTPUT_CONNECTION = {"outputs": [{"host": "35.0.0.1", "port": 31502, "queue_name": "OUTPUTS"}]}
+OUTPUT_CONNECTION_INTERNAL = {"outputs": [{"host": "inference-server.svc", "port": 6379, "queue_name": "OUTPUTS"}]}
+REPLY_QUEUE = "instance-1_replies"
+
+
+class Tags:
+    def get_tags(self, block_id):
+        return {f"cluster:c-{block_id}"}
+
+
+class Discovery:
+    def __init__(self, port):
+        self.port = port
+        self.entries = Tags()
+        self.calls = 0
+
+    def discover(self, block_id):
+        self.calls += 1
+        return f"{block_id}-executor.svc", self.port
+
+
+def resolve_graph(graph, graph_cache):
+    return {block_id: [{"block_id": child, "queue": f"{child}_inputs"} for child in children]
+            for block_id, children in graph.items()}
+
+
+def legacy_serialize(request, port):
+    # the per-request construction the templates replaced, kept as the reference
+    output_connection = OUTPUT_CONNECTION
+    if request.output_ptr == "":
+        op_ptr = copy.deepcopy(OUTPUT_CONNECTION_INTERNAL if port != 0 else output_connection)
+        op_ptr['outputs'][0]['queue_name'] = REPLY_QUEUE
+        output_ptr = json.dumps(op_ptr)
+    else:
+        op_ptr = copy.deepcopy(output_connection)
+        op_ptr['outputs'][0]['queue_name'] = REPLY_QUEUE
+        output_config = json.loads(request.output_ptr)
+        if 'is_graph' in output_config and output_config['is_graph']:
+            if 'is_compiled' in output_config and output_config['is_compiled']:
+                del output_config['is_compiled']
+                output_config['graph']['final'] = op_ptr
+            else:
+                output_config['graph'] = resolve_graph(output_config['graph'], None)
+                output_config['graph']['final'] = op_ptr
+        output_ptr = json.dumps(output_config)
+
+    return service_pb2.AIOSPacket(
+        session_id=request.session_id,
+        seq_no=request.seq_no,
+        data=request.data,
+        ts=request.ts,
+        output_ptr=output_ptr,
+        files=request.files
+    ).SerializeToString()
+
+
+def make_templates(port):
+    discovery = Discovery(port)
+    templates = RequestTemplateCache(
+        discovery, None, resolve_graph, OUTPUT_CONNECTION, OUTPUT_CONNECTION_INTERNAL, REPLY_QUEUE)
+    return templates, discovery
+
+
+def make_request(output_ptr="", **kwargs):
+    request = service_pb2.BlockInferencePacket(
+        block_id="b1", session_id="session-✓", seq_no=2 ** 40 + 3, data='{"prompt": "hi"}',
+        ts=1700000000.25, output_ptr=output_ptr)
+    request.files.add(metadata='{"name": "a.png"}', file_data=b"\x00\x01" * 100)
+    request.files.add(metadata="{}", file_data=b"")
+    for key, value in kwargs.items():
+        setattr(request, key, value)
+    return request
+
+
+OUTPUT_PTRS = [
+    "",
+    json.dumps({"is_graph": True, "graph": {"b1": ["b2", "b3"], "b2": []}}),
+    json.dumps({"is_graph": True, "is_compiled": True, "graph": {"b1": [{"queue": "x"}]}}),
+    json.dumps({"outputs": [{"host": "h", "port": 1, "queue_name": "custom"}]}),
+]
+
+
+def parse(raw):
+    packet = service_pb2.AIOSPacket()
+    packet.ParseFromString(raw)
+    return packet
+
+
+def test_template_bytes_parse_to_the_legacy_packet():
+    for port in (0, 6379):
+        templates, _ = make_templates(port)
+        for output_ptr in OUTPUT_PTRS:
+            request = make_request(output_ptr)
+            template = templates.get("b1", output_ptr)
+
+            new = parse(template.serialize(request))
+            old = parse(legacy_serialize(request, port))
+            assert new == old
+            assert json.loads(new.output_ptr) == json.loads(old.output_ptr)
+            assert len(new.files) == 2
+
+
+def test_pre_encoded_output_ptr_is_a_single_field():
+    templates, _ = make_templates(0)
+    template = templates.get("b1", "")
+
+    ptr_only = parse(template.encoded_ptr)
+    assert ptr_only == service_pb2.AIOSPacket(output_ptr=template.output_ptr)
+
+    # the per-request part carries no output_ptr, so nothing is merged twice
+    request = make_request()
+    raw = template.serialize(request)
+    assert parse(raw[:-len(template.encoded_ptr)]).output_ptr == ""
+
+
+def test_empty_request_fields_match():
+    templates, _ = make_templates(0)
+    request = service_pb2.BlockInferencePacket(block_id="b1")
+    assert parse(templates.get("b1").serialize(request)) == parse(legacy_serialize(request, 0))
+
+
+def test_templates_are_compiled_once_per_block_and_output():
+    templates, discovery = make_templates(0)
+    for _ in range(10):
+        for output_ptr in OUTPUT_PTRS:
+            templates.get("b1", output_ptr)
+    assert discovery.calls == len(OUTPUT_PTRS)
+
+    templates.invalidate("b1")
+    templates.get("b1", "")
+    assert discovery.calls == len(OUTPUT_PTRS) + 1
@@ -1,2 +1,2 @@
 from .main import Block, PreProcessResult, Context, OnDataResult
-from .utils import AssetsRegistry, StateDict, StateDictV2
\ No newline at end of file
+from .utils import AssetsRegistry, StateDict, StateDictV2, StateDictV3
\ No newline at end of file
@@ -14,10 +14,12 @@ from .ws import WebsocketStreamingManager
 from .policy_sandbox import LocalPolicyEvaluator
 from .metrics import AIOSMetrics
 from .aios_packet_pb2 import AIOSPacket
-from .tools import Muxer
+from .tools import Muxer, TimeBasedBatcher
 from .vdag_process import vDAGProcessor
 from .side_cars import BlockSideCars
 from .events import BlockEvents
+from .routing import RoutingPlanCache
+from .startup import StartupOrchestrator, BootStatusServer
 
 from .default_policies import DefaultPostprocessingPolicy, DefaultPreprocessingPolicy
 
@@ -166,7 +168,15 @@ class Block:
             logging.info(
                 f"booting block_id={block_id}, instance_id={instance_id}")
 
-            ret, block_data_full = load_block_data()
+            # /ready and /health answer 503 with the phase timings from the very start of
+            # the boot, forked here while the instance has no threads yet
+            self.boot_server = BootStatusServer(int(os.getenv("MGMT_PORT", 18001)))
+            self.startup = StartupOrchestrator(on_update=self.boot_server.publish)
+            self.boot_server.start(self.startup.report())
+            self.block_module = None
+            self.parameters_server_started = False
+
+            ret, block_data_full = self.startup.run_step("load_block_data", load_block_data)
             if not ret:
                 raise Exception(block_data_full)
 
@@ -196,7 +206,6 @@ class Block:
             self.processors = vDAGProcessor(self.block_id, block_data_full)
 
             self.metrics = AIOSMetrics()
-            self.metrics.start_http_server()
 
             # extra init data:
             extra_init_data = os.getenv("CUSTOM_INIT_DATA", None)
@@ -218,17 +227,28 @@ class Block:
                 side_cars=self.block_side_cars
             )
 
-            self.ws_server = WebsocketStreamingManager(self.listen_for_jobs_now)
+            self.ws_server = WebsocketStreamingManager(
+                self.listen_for_jobs_now,
+                num_workers=self.block_init_data.get("ws_workers", 4),
+                max_inflight_per_session=self.block_init_data.get("ws_max_inflight_per_session", 32)
+            )
             self.context.write_ws = self.ws_server.write_data
 
-            self.block_module = block_class(self.context)
-
+            self.block_class = block_class
             self.redis_client = None
-            self.reconnect_redis_client()
 
-            self.listen_parameter_updates_thread = threading.Thread(
-                target=self.listen_parameter_updates, daemon=True)
-            self.listen_parameter_updates_thread.start()
+            # initialize block pre/post policies:
+            self.post_processor = None
+            self.preprocessor = None
+
+            # independent and expensive: policy download/install, redis and the block class itself
+            results = self.startup.run_parallel({
+                "pre_processing_policy": self._load_pre_policy_rule,
+                "post_processing_policy": self._load_post_policy_rule,
+                "redis": self.reconnect_redis_client,
+                "block_class": lambda: block_class(self.context)
+            })
+            self.block_module = results["block_class"]
 
             self.block_output = redis.Redis(
                 host=f'{self.block_id}-executor.blocks.svc.cluster.local', port=6379, db=0)
@@ -256,23 +276,17 @@ class Block:
                 "end_to_end_fps", "frames per second for end-to-end processing")
             self.counter = 0
             self.redis_cache = RedisConnectionCache()
-
-            # start queue length thread:
-            flask_thread = threading.Thread(
-                target=self.update_queue_length, daemon=True)
-            flask_thread.start()
+            self.routing_cache = RoutingPlanCache(
+                self.block_id,
+                self.redis_cache,
+                metrics=self.metrics,
+                max_size=self.block_init_data.get("routing_plan_cache_size", 1024)
+            )
 
             executor_type = self.block_init_data.get(
                 "thread_pool_mode", "thread")
             enable_pool = self.block_init_data.get("enable_thread_pool", False)
 
-            # initialize block pre/post policies:
-            self.post_processor = None
-            self.preprocessor = None
-
-            self._load_pre_policy_rule()
-            self._load_post_policy_rule()
-
             if enable_pool:
                 # wherever you put these
                 from .muti_workers import ThreadJobExecutor, ProcessJobExecutor
@@ -282,21 +296,84 @@ class Block:
                     "max_queue_size", 100)
                 sticky = self.block_init_data.get("sticky_sessions", False)
 
-                ExecutorClass = ThreadJobExecutor if executor_type == "thread" else ProcessJobExecutor
-
-                self.job_executor = ExecutorClass(
-                    worker_fn=self.listen_for_jobs_now,
-                    max_threads=max_threads,
-                    max_queue_size=max_queue_size,
-                    sticky_sessions=sticky
-                )
+                if executor_type == "thread":
+                    self.job_executor = ThreadJobExecutor(
+                        worker_fn=self.listen_for_jobs_now,
+                        max_threads=max_threads,
+                        max_queue_size=max_queue_size,
+                        sticky_sessions=sticky,
+                        scheduler=self.block_init_data.get("scheduler", "random"),
+                        max_sessions=self.block_init_data.get("max_sticky_sessions", 10000),
+                        session_ttl=self.block_init_data.get("sticky_session_ttl", 600),
+                        backpressure=self.block_init_data.get("backpressure", False),
+                        metrics=self.metrics
+                    )
+                else:
+                    self.job_executor = ProcessJobExecutor(
+                        worker_fn=self.listen_for_jobs_now,
+                        max_threads=max_threads,
+                        max_queue_size=max_queue_size,
+                        sticky_sessions=sticky,
+                        worker_init=self._init_process_worker,
+                        metrics=self.metrics,
+                        slot_size=self.block_init_data.get("shm_slot_size", 256 * 1024),
+                        max_sessions=self.block_init_data.get("max_sticky_sessions", 10000),
+                        session_ttl=self.block_init_data.get("sticky_session_ttl", 600)
+                    )
             else:
                 self.job_executor = None
 
+            # seconds the input loop waits before expiring muxer groups when idle,
+            # whole seconds because BRPOP on Redis < 6 only takes integer timeouts
+            self.muxer_sweep_interval = max(1, int(self.block_init_data.get("muxer_sweep_interval", 1)))
+
+            # batch mode: drain up to max_batch_size packets per round trip and call on_data_batch
+            self.batch_mode = self.block_init_data.get("enable_batching", False)
+            self.max_batch_size = self.block_init_data.get("max_batch_size", 8)
+            self.max_batch_wait = self.block_init_data.get("max_batch_wait", 0.01)
+            self.batch_lock = threading.Lock()
+            # RPOP with a count needs Redis >= 6.2, detected on the first drain
+            self.rpop_count_supported = None
+            # jobs that fail after being popped are kept here instead of being dropped
+            self.dead_letter_queue = self.block_init_data.get(
+                "dead_letter_queue", f"{self.input_queue_name}_dead_letter")
+
+            if self.batch_mode:
+                self.metrics.register_gauge(
+                    "on_data_batch_size", "number of entries passed to on_data_batch")
+
+            # the management server (/ready, /health, /mgmt) runs Flask threads, start it
+            # only once the process workers are forked so they do not inherit them
+            self.start_parameters_server()
+
+            # not needed to serve the first frame, started after the critical path
+            # (and after process workers are forked)
+            self.startup.defer({
+                "metrics_server": self.metrics.start_http_server,
+                "parameter_listener": lambda: threading.Thread(
+                    target=self.listen_parameter_updates, daemon=True).start(),
+                "queue_length_reporter": lambda: threading.Thread(
+                    target=self.update_queue_length, daemon=True).start()
+            })
+
         except Exception as e:
             raise e
 
     
+    def _init_process_worker(self, metrics_proxy):
+        # runs once in each worker process: the block module is inherited from the
+        # parent, metrics are routed to the parent and connections are rebuilt
+        metrics_proxy.install(self.metrics)
+
+        self.redis_cache = RedisConnectionCache()
+        self.routing_cache = RoutingPlanCache(
+            self.block_id,
+            self.redis_cache,
+            metrics=self.metrics,
+            max_size=self.block_init_data.get("routing_plan_cache_size", 1024)
+        )
+        logging.info(f"[Block] Worker process pid={os.getpid()} ready")
+
     def _load_pre_policy_rule(self, name="pre_processing"):
         try:
             logging.info("Loading policy rule")
@@ -409,8 +486,15 @@ class Block:
 
         while True:
             try:
-                # Blocking wait on input queue
-                _, job_data = self.redis_client.brpop(self.input_queue_name)
+                if self.job_executor and hasattr(self.job_executor, "wait_for_capacity"):
+                    self.job_executor.wait_for_capacity()
+
+                # Blocking wait on input queue, woken up periodically to expire muxer groups
+                popped = self.redis_client.brpop(self.input_queue_name, timeout=self._idle_timeout())
+                if popped is None:
+                    self._sweep_muxer()
+                    continue
+                _, job_data = popped
 
                 if self.job_executor:
                     # Extract session_id only
@@ -434,64 +518,264 @@ class Block:
                 self.reconnect_redis_client()
 
 
-    def listen_for_jobs_now(self, job_tuple, session_id=None, serialized=False, is_ws=False):
-        try:
+    def listen_for_jobs_batched(self):
+        logging.info(
+            f"[Block] Listening for jobs in batch mode, max_batch_size={self.max_batch_size}, max_batch_wait={self.max_batch_wait}")
 
-            job_data_proto = None
-            job_start_time = 0
+        batcher = TimeBasedBatcher(
+            self.max_batch_size, self.max_batch_wait, flush_callback=self.process_batch)
 
-            if not serialized:
-                job_data_bytes, job_start_time = job_tuple
+        while True:
+            try:
+                # Blocking wait for the first packet, then drain the rest of the batch in the same round trip
+                popped = self.redis_client.brpop(self.input_queue_name, timeout=self._idle_timeout())
+                if popped is None:
+                    self._sweep_muxer()
+                    continue
+                _, job_data = popped
+                job_start_time = time.time()
+                jobs = [job_data]
+                if self.max_batch_size > 1:
+                    try:
+                        jobs.extend(self._drain_jobs(self.max_batch_size - 1))
+                    except Exception as e:
+                        # the packet already popped is still processed
+                        logging.error(f"[Block] Error draining the input queue: {str(e)}")
 
-                job_data_proto = AIOSPacket()
-                job_data_proto.ParseFromString(job_data_bytes)
-            else:
-                job_data_proto, job_start_time = job_tuple
+                for job in jobs:
+                    batch = batcher.add_to_batch((job, job_start_time))
+                    if batch:
+                        self.process_batch(batch)
 
+            except Exception as e:
+                logging.error(f"[Block] Error in listen_for_jobs_batched: {str(e)}")
+                logging.warning("[Block] Attempting to re-establish Redis connection...")
 
-            # check pre-processing:
-            is_vdag, uri = self.check_is_vdag_packet(
-                job_data_proto.session_id)
-            if is_vdag:
-                job_data_proto = self.processors.execute_pre_process_policy_rule_if_present(uri, job_data_proto)
+                self.reconnect_redis_client()
 
-            muxer: Muxer = self.block_module.get_muxer()
-            if muxer:
-                op = muxer.process_packet(job_data)
-                if not op:
+    def _idle_timeout(self):
+        muxer = self.block_module.get_muxer()
+        if muxer and getattr(muxer, "needs_sweep", False):
+            return self.muxer_sweep_interval
+        return 0
+
+    def _sweep_muxer(self):
+        # expired groups are handed back to this loop instead of a background thread,
+        # so block code never runs on an SDK thread created before the workers fork
+        muxer = self.block_module.get_muxer()
+        if not muxer:
+            return
+        muxer.sweep()
+        for partial in muxer.pop_partials():
+            self.listen_for_jobs_now((partial, time.time()), serialized=True, muxed=True)
+
+    def _drain_jobs(self, count):
+        if self.rpop_count_supported is not False:
+            try:
+                jobs = self.redis_client.rpop(self.input_queue_name, count) or []
+                self.rpop_count_supported = True
+                return jobs
+            except redis.exceptions.ResponseError as e:
+                if self.rpop_count_supported:
+                    raise
+                logging.warning(f"[Block] RPOP with count is not supported by this Redis server (< 6.2), using pipelined RPOP: {e}")
+                self.rpop_count_supported = False
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for _ in range(count):
+            pipe.rpop(self.input_queue_name)
+        return [job for job in pipe.execute() if job is not None]
+
+    def _dead_letter(self, batch, error):
+        raws = [job for job, _ in batch if isinstance(job, (bytes, bytearray))]
+        try:
+            if raws:
+                self.redis_client.lpush(self.dead_letter_queue, *raws)
+            logging.error(f"[Block] Moved {len(raws)} jobs to {self.dead_letter_queue}: {error}")
+        except Exception as e:
+            logging.error(f"[Block] Failed to dead-letter {len(raws)} jobs ({error}): {e}")
+
+    def process_batch(self, batch):
+        with self.batch_lock:
+            try:
+                if not hasattr(self.block_module, "on_data_batch"):
+                    for job_tuple in batch:
+                        self.listen_for_jobs_now(job_tuple)
                     return
-                job_data = op
 
-            preprocess_start = time.time()
+                entries = []
+                start_times = []
+                sources = []
+                for job_tuple in batch:
+                    _, job_start_time = job_tuple
+                    try:
+                        data = self._preprocess_job(job_tuple)
+                    except Exception as e:
+                        self._dead_letter([job_tuple], e)
+                        continue
+                    if not data:
+                        continue
+                    entries.extend(data)
+                    start_times.extend([job_start_time] * len(data))
+                    sources.append(job_tuple)
+
+                if not entries:
+                    return
 
-            # run block specific pre-processing
-            if self.preprocessor:
-                response =  self.preprocessor.execute_policy_rule({
-                    "packet": job_data_proto,
-                    "block_data": self.block_data_full
-                })
+                metrics = self.metrics.local()
 
-                job_data_proto = response['packet']
+                on_data_start = time.time()
+                try:
+                    ret, results = self.block_module.on_data_batch(entries)
+                except Exception as e:
+                    self._dead_letter(sources, e)
+                    return
+                on_data_end = time.time()
 
-            ret, data = self.block_module.on_preprocess(job_data_proto)
-            preprocess_end = time.time()
+                if not ret:
+                    logging.error(f"Error in on_data_batch: {results}")
+                    return
 
-            if not ret:
-                logging.error(f"Error in on_preprocess: {data}")
+                if len(results) != len(entries):
+                    logging.error(
+                        f"on_data_batch returned {len(results)} results for {len(entries)} entries")
+                    return
+
+                for entry, on_data_result in zip(entries, results):
+                    if on_data_result is None:
+                        continue
+                    self._emit_output(entry, on_data_result)
+
+                metrics.set("on_data_batch_size", len(entries))
+                on_data_latency = on_data_end - on_data_start
+                metrics.set("on_data_latency", on_data_latency)
+                metrics.set(
+                    "on_data_fps", len(entries) / on_data_latency if on_data_latency > 0 else 0)
+
+                metrics.inc("on_data_count", len(entries))
+                job_end_time = time.time()
+                for job_start_time in start_times:
+                    self._record_end_to_end(job_end_time - job_start_time)
+
+            except Exception as e:
+                logging.error(f"Error when executing batch: {str(e)}")
                 return
 
+    def _preprocess_job(self, job_tuple, serialized=False, muxed=False):
+        job_data_proto = None
+
+        if not serialized:
+            job_data_bytes, _ = job_tuple
+
+            job_data_proto = AIOSPacket()
+            job_data_proto.ParseFromString(job_data_bytes)
+        else:
+            job_data_proto, _ = job_tuple
+
+        # check pre-processing, already done for packets merged by the muxer:
+        is_vdag, uri = self.check_is_vdag_packet(
+            job_data_proto.session_id)
+        if is_vdag and not muxed:
+            job_data_proto = self.processors.execute_pre_process_policy_rule_if_present(uri, job_data_proto)
+
+        muxer: Muxer = self.block_module.get_muxer()
+        if muxer and not muxed:
+            op = muxer.process_packet(job_data_proto)
+
+            # groups evicted with the "partial" policy continue as their own jobs
+            for partial in muxer.pop_partials():
+                self.listen_for_jobs_now((partial, time.time()), serialized=True, muxed=True)
+
+            if not op:
+                return None
+            job_data_proto = op
+
+        preprocess_start = time.time()
+
+        # run block specific pre-processing
+        if self.preprocessor:
+            response =  self.preprocessor.execute_policy_rule({
+                "packet": job_data_proto,
+                "block_data": self.block_data_full
+            })
+
+            job_data_proto = response['packet']
+
+        ret, data = self.block_module.on_preprocess(job_data_proto)
+        preprocess_end = time.time()
+
+        if not ret:
+            logging.error(f"Error in on_preprocess: {data}")
+            return None
+
+        if not data:
+            return None
+
+        if type(data) != list:
+            data = [data]
+
+        metrics = self.metrics.local()
+        metrics.inc("on_preprocess_count")
+        preprocess_latency = preprocess_end - preprocess_start
+        metrics.set(
+            "on_preprocess_latency", preprocess_latency)
+        metrics.set(
+            "on_preprocess_fps", 1 / preprocess_latency if preprocess_latency > 0 else 0)
+
+        return data
+
+    def _emit_output(self, entry, on_data_result):
+        output = on_data_result.output
+
+        proto = entry.packet
+        proto.data = json.dumps(output)
+
+        if self.post_processor:
+            response =  self.post_processor.execute_policy_rule({
+                "packet": proto,
+                "block_data": self.block_data_full
+            })
+
+            proto = response['packet']
+
+        is_vdag, uri = self.check_is_vdag_packet(proto.session_id)
+        if is_vdag:
+            proto = self.processors.execute_post_process_policy_rule_if_present(
+                uri, proto)
+
+        output_bytes = proto.SerializeToString()
+
+        if proto.output_ptr and proto.output_ptr != "":
+            try:
+                self.routing_cache.push(proto.output_ptr, output_bytes)
+            except json.JSONDecodeError as e:
+                logging.error(f"Invalid output_ptr JSON: {str(e)}")
+        else:
+            self.block_output.lpush("OUTPUT", output_bytes)
+
+    def _record_end_to_end(self, end_to_end_latency):
+        metrics = self.metrics.local()
+
+        # Prometheus
+        metrics.set("end_to_end_latency", end_to_end_latency)
+        metrics.inc("end_to_end_count")
+        metrics.set("end_to_end_fps", 1 / end_to_end_latency if end_to_end_latency > 0 else 0)
+
+        # Rolling
+        metrics.observe_rolling("latency", end_to_end_latency)
+        metrics.observe_rolling("fps", 1 / end_to_end_latency if end_to_end_latency > 0 else 0)
+        metrics.observe_rolling("tasks_processed", 1)
+
+    def listen_for_jobs_now(self, job_tuple, session_id=None, serialized=False, is_ws=False, muxed=False):
+        try:
+
+            _, job_start_time = job_tuple
+
+            data = self._preprocess_job(job_tuple, serialized=serialized, muxed=muxed)
             if not data:
                 return
 
-            if type(data) != list:
-                data = [data]
-
-            self.metrics.increment_counter("on_preprocess_count")
-            preprocess_latency = preprocess_end - preprocess_start
-            self.metrics.set_gauge(
-                "on_preprocess_latency", preprocess_latency)
-            self.metrics.set_gauge(
-                "on_preprocess_fps", 1 / preprocess_latency if preprocess_latency > 0 else 0)
+            metrics = self.metrics.local()
 
             for entry in data:
                 on_data_start = time.time()
@@ -505,79 +789,16 @@ class Block:
                     logging.error(f"Error in on_data: {on_data_result}")
                     continue
 
-                output = on_data_result.output
-
-                proto = entry.packet
-                proto.data = json.dumps(output)
-
-                if self.post_processor:
-                    response =  self.post_processor.execute_policy_rule({
-                        "packet": proto,
-                        "block_data": self.block_data_full
-                    })
-
-                    proto = response['packet']
-
-                is_vdag, uri = self.check_is_vdag_packet(proto.session_id)
-                if is_vdag:
-                    proto = self.processors.execute_post_process_policy_rule_if_present(
-                        uri, proto)
+                self._emit_output(entry, on_data_result)
 
-                output_bytes = proto.SerializeToString()
-
-                if proto.output_ptr and proto.output_ptr != "":
-                    try:
-                        output_config = json.loads(proto.output_ptr)
-                        if 'is_graph' in output_config and output_config['is_graph']:
-                            g = output_config['graph']
-                            output_config = g.get(
-                                self.block_id, {"outputs": []})
-
-                            if len(output_config['outputs']) == 0:
-                                output_config = g['final']
-
-                        if "outputs" in output_config:
-                            for output in output_config["outputs"]:
-                                host = output.get("host", "localhost")
-                                port = output.get("port", 6379)
-                                block_id = output.get('block_id', '')
-                                queue_name = output.get("queue_name", "OUTPUT")
-
-                                redis_conn = self.redis_cache.get(
-                                    block_id, host, port)
-
-                                logging.info(
-                                    f"pushing output to {redis_conn}: {queue_name} -> {host}:{port}")
-                                if redis_conn:
-                                    logging.info(
-                                        f"pushing output now: {proto.session_id}:{proto.seq_no}")
-                                    redis_conn.lpush(
-                                        queue_name, output_bytes)
-
-                    except json.JSONDecodeError as e:
-                        logging.error(f"Invalid output_ptr JSON: {str(e)}")
-                else:
-                    self.block_output.lpush("OUTPUT", output_bytes)
-
-                self.metrics.increment_counter("on_data_count")
+                metrics.inc("on_data_count")
                 on_data_latency = on_data_end - on_data_start
-                self.metrics.set_gauge("on_data_latency", on_data_latency)
-                self.metrics.set_gauge(
+                metrics.set("on_data_latency", on_data_latency)
+                metrics.set(
                     "on_data_fps", 1 / on_data_latency if on_data_latency > 0 else 0)
 
             job_end_time = time.time()
-            self.metrics.increment_counter("end_to_end_count")
-            end_to_end_latency = job_end_time - job_start_time
-
-            # Prometheus
-            self.metrics.set_gauge("end_to_end_latency", end_to_end_latency)
-            self.metrics.increment_counter("end_to_end_count")
-            self.metrics.set_gauge("end_to_end_fps", 1 / end_to_end_latency if end_to_end_latency > 0 else 0)
-
-            # Rolling
-            self.metrics.observe_rolling("latency", end_to_end_latency)
-            self.metrics.observe_rolling("fps", 1 / end_to_end_latency if end_to_end_latency > 0 else 0)
-            self.metrics.observe_rolling("tasks_processed", 1)
+            self._record_end_to_end(job_end_time - job_start_time)
 
         except Exception as e:
             logging.error(f"Error when executing job: {str(e)}")
@@ -586,14 +807,42 @@ class Block:
     def run(self):
         self.start_parameters_server()
         self.ws_server.start_as_thread()
-        self.listen_for_jobs()
+        self.startup.mark_ready()
+        self._publish_startup_report()
+        if self.batch_mode:
+            self.listen_for_jobs_batched()
+        else:
+            self.listen_for_jobs()
+
+    def _publish_startup_report(self):
+        report = self.startup.report()
+        self.metrics.register_gauge(
+            "startup_total_seconds", "time spent in the critical startup path")
+        self.metrics.set_gauge("startup_total_seconds", report["time_to_ready"])
+
+        for phase, seconds in report["phases"].items():
+            name = "startup_{}_seconds".format(phase.replace(":", "_"))
+            self.metrics.register_gauge(name, f"time spent in startup phase {phase}")
+            self.metrics.set_gauge(name, seconds)
 
     def start_parameters_server(self):
+        if self.parameters_server_started:
+            return
+        self.parameters_server_started = True
+        self.boot_server.stop()
+
         app = Flask(__name__)
 
+        @app.route('/ready')
+        def ready():
+            report = self.startup.report()
+            return {"success": report["ready"], "data": report}, 200 if report["ready"] else 503
+
         @app.route('/health')
         def health():
             try:
+                if not self.block_module:
+                    raise Exception("block is still starting")
                 response = self.block_module.health()
                 return {"success": True, "data": response}, 200
             except Exception as e:
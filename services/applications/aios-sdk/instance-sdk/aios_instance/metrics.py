@@ -1,41 +1,211 @@
 import os
+import math
 import threading
 import time
 import json
+import logging
 import redis
 
 from prometheus_client import Counter, Gauge, Histogram, start_http_server
 from prometheus_client.registry import REGISTRY
 
-from collections import deque
 from .block_metrics import BlockHardwareMetrics
 from .node import detect_node_id
 
+logger = logging.getLogger(__name__)
+
+
+class QuantileSketch:
+    # log-bucketed quantile sketch with bounded relative error, sketches merge by adding bins
+    def __init__(self, relative_accuracy=0.02):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+
+    def quantile(self, q):
+        if self.count == 0:
+            return 0
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0
+
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
 
 class RollingMetric:
-    def __init__(self, window_seconds=900):
+    # fixed ring of time buckets: O(1) insert, O(buckets) window queries, constant memory
+    def __init__(self, window_seconds=900, bucket_seconds=1, relative_accuracy=0.02):
         self.window = window_seconds
-        self.data = deque()
+        self.bucket_seconds = bucket_seconds
+        self.relative_accuracy = relative_accuracy
+        self.num_buckets = int(math.ceil(window_seconds / bucket_seconds))
+
+        self.bucket_ids = [-1] * self.num_buckets
+        self.counts = [0] * self.num_buckets
+        self.sums = [0.0] * self.num_buckets
+        self.sketches = [None] * self.num_buckets
+
+        self.last_value = 0
+        self.last_ts = 0
+        self.lock = threading.Lock()
 
     def add(self, value):
         now = time.time()
-        self.data.append((now, value))
-        self.cleanup(now)
+        bucket_id = int(now // self.bucket_seconds)
+        slot = bucket_id % self.num_buckets
+
+        with self.lock:
+            if self.bucket_ids[slot] != bucket_id:
+                self.bucket_ids[slot] = bucket_id
+                self.counts[slot] = 0
+                self.sums[slot] = 0.0
+                self.sketches[slot] = QuantileSketch(self.relative_accuracy)
 
-    def cleanup(self, now=None):
-        now = now or time.time()
-        while self.data and self.data[0][0] < now - self.window:
-            self.data.popleft()
+            self.counts[slot] += 1
+            self.sums[slot] += value
+            self.sketches[slot].add(value)
+
+            self.last_value = value
+            self.last_ts = now
+
+    def _slots_in_window(self, window):
+        now = time.time()
+        current_id = int(now // self.bucket_seconds)
+        oldest_id = current_id - int(math.ceil(min(window, self.window) / self.bucket_seconds)) + 1
+        return [slot for slot, bucket_id in enumerate(self.bucket_ids) if oldest_id <= bucket_id <= current_id]
 
     def average(self, window):
+        with self.lock:
+            slots = self._slots_in_window(window)
+            count = sum(self.counts[slot] for slot in slots)
+            total = sum(self.sums[slot] for slot in slots)
+        return total / count if count else 0
+
+    def percentile(self, q, window):
+        merged = QuantileSketch(self.relative_accuracy)
+        with self.lock:
+            for slot in self._slots_in_window(window):
+                merged.merge(self.sketches[slot])
+        return merged.quantile(q)
+
+    def add_many(self, values):
+        if not values:
+            return
+
         now = time.time()
-        self.cleanup(now)
-        values = [v for t, v in self.data if t >= now - window]
-        return sum(values) / len(values) if values else 0
+        bucket_id = int(now // self.bucket_seconds)
+        slot = bucket_id % self.num_buckets
+
+        with self.lock:
+            if self.bucket_ids[slot] != bucket_id:
+                self.bucket_ids[slot] = bucket_id
+                self.counts[slot] = 0
+                self.sums[slot] = 0.0
+                self.sketches[slot] = QuantileSketch(self.relative_accuracy)
+
+            sketch = self.sketches[slot]
+            for value in values:
+                sketch.add(value)
+            self.counts[slot] += len(values)
+            self.sums[slot] += sum(values)
+
+            self.last_value = values[-1]
+            self.last_ts = now
 
     def current(self):
-        self.cleanup()
-        return self.data[-1][1] if self.data else 0
+        if time.time() - self.last_ts > self.window:
+            return 0
+        return self.last_value
+
+
+class MetricsAccumulator:
+    # owned by a single thread, the hot path only touches plain dicts and lists;
+    # drain() is called from the merge thread and reads counters as deltas so
+    # the owning thread never takes a lock
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.rolling = {}
+        self.histograms = {}
+        self.custom = {}
+        self._reported = {}
+
+    def inc(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        self.gauges[name] = value
+
+    def observe_rolling(self, name, value):
+        values = self.rolling.get(name)
+        if values is None:
+            values = self.rolling[name] = []
+        values.append(value)
+
+    def observe_histogram(self, name, value):
+        values = self.histograms.get(name)
+        if values is None:
+            values = self.histograms[name] = []
+        values.append(value)
+
+    def observe_custom_rolling(self, category, name, value):
+        values = self.custom.get((category, name))
+        if values is None:
+            values = self.custom[(category, name)] = []
+        values.append(value)
+
+    def _drain_values(self, store):
+        drained = {}
+        for name, values in list(store.items()):
+            n = len(values)
+            if n:
+                drained[name] = values[:n]
+                del values[:n]
+        return drained
+
+    def drain(self):
+        counters = {}
+        for name, total in list(self.counters.items()):
+            delta = total - self._reported.get(name, 0)
+            if delta:
+                counters[name] = delta
+                self._reported[name] = total
+
+        custom = {}
+        for (category, name), values in self._drain_values(self.custom).items():
+            custom.setdefault(category, {})[name] = values
+
+        return {
+            "counters": counters,
+            "gauges": dict(self.gauges),
+            "rolling": self._drain_values(self.rolling),
+            "histograms": self._drain_values(self.histograms),
+            "custom": custom
+        }
 
 
 class AIOSMetrics:
@@ -58,21 +228,36 @@ class AIOSMetrics:
         # Rolling metrics
         self.rolling_metrics = {}      
         self.custom_metrics = {}        
+        # the merge thread adds metrics while get_extended_metrics iterates them
+        self.rolling_lock = threading.RLock()
+
+        # Per-thread accumulators merged in the background
+        self.merge_interval = float(os.getenv("METRICS_MERGE_INTERVAL", 1.0))
+        self.local_state = threading.local()
+        self.accumulators = []
+        self.accumulators_lock = threading.Lock()
+        self.merge_thread = None
 
     # Prometheus Registration
     def register_counter(self, name, documentation, labelnames=None):
+        if name in self.metrics:
+            return
         if labelnames is None:
             labelnames = []
         self.metrics[name] = Counter(
             name, documentation, labelnames=labelnames, registry=REGISTRY)
 
     def register_gauge(self, name, documentation, labelnames=None):
+        if name in self.metrics:
+            return
         if labelnames is None:
             labelnames = []
         self.metrics[name] = Gauge(
             name, documentation, labelnames=labelnames, registry=REGISTRY)
 
     def register_histogram(self, name, documentation, labelnames=None, buckets=None):
+        if name in self.metrics:
+            return
         if labelnames is None:
             labelnames = []
         if buckets is None:
@@ -81,10 +266,10 @@ class AIOSMetrics:
             name, documentation, labelnames=labelnames, buckets=buckets, registry=REGISTRY)
 
     # Prometheus Usage
-    def increment_counter(self, name, labelnames=None):
+    def increment_counter(self, name, labelnames=None, amount=1):
         metric = self.metrics.get(name)
         if metric and isinstance(metric, Counter):
-            metric.inc()
+            metric.inc(amount)
 
     def set_gauge(self, name, value, labelnames=None):
         metric = self.metrics.get(name)
@@ -98,26 +283,99 @@ class AIOSMetrics:
 
     # Rolling Metrics API
     def observe_rolling(self, name, value):
-        if name not in self.rolling_metrics:
-            self.rolling_metrics[name] = RollingMetric()
-        self.rolling_metrics[name].add(value)
+        with self.rolling_lock:
+            self._get_rolling(name).add(value)
+
+    def _get_rolling(self, name):
+        metric = self.rolling_metrics.get(name)
+        if metric is None:
+            metric = self.rolling_metrics.setdefault(name, RollingMetric())
+        return metric
+
+    # Fast path: per-thread accumulators
+    def local(self):
+        accumulator = getattr(self.local_state, "accumulator", None)
+        if accumulator is not None:
+            return accumulator
+
+        accumulator = MetricsAccumulator()
+        self.local_state.accumulator = accumulator
+        with self.accumulators_lock:
+            self.accumulators.append((threading.current_thread(), accumulator))
+            if self.merge_thread is None:
+                self.merge_thread = threading.Thread(target=self._merge_loop, daemon=True)
+                self.merge_thread.start()
+
+        return accumulator
+
+    def apply_report(self, report):
+        for name, count in report["counters"].items():
+            self.increment_counter(name, amount=count)
+        for name, value in report["gauges"].items():
+            self.set_gauge(name, value)
+        for name, values in report["histograms"].items():
+            for value in values:
+                self.observe_histogram(name, value)
+        with self.rolling_lock:
+            for name, values in report["rolling"].items():
+                self._get_rolling(name).add_many(values)
+            for category, names in report.get("custom", {}).items():
+                for name, values in names.items():
+                    for value in values:
+                        self.observe_custom_rolling(category, name, value)
+
+    def merge_local(self):
+        with self.accumulators_lock:
+            accumulators = list(self.accumulators)
+
+        finished = []
+        reports = []
+        for thread, accumulator in accumulators:
+            # checked before draining so the last values of an exited thread are still merged
+            if not thread.is_alive():
+                finished.append(accumulator)
+            reports.append(accumulator.drain())
+
+        # one acquisition per merge, readers of the rolling metrics wait at most one merge
+        with self.rolling_lock:
+            for report in reports:
+                try:
+                    self.apply_report(report)
+                except Exception as e:
+                    logger.error(f"Error merging local metrics: {e}")
+
+        if finished:
+            with self.accumulators_lock:
+                finished = set(map(id, finished))
+            self.accumulators = [entry for entry in self.accumulators if id(entry[1]) not in finished]
+
+    def _merge_loop(self):
+        while not self.stop_event.is_set():
+            time.sleep(self.merge_interval)
+            self.merge_local()
 
     def observe_custom_rolling(self, category, name, value):
-        if category not in self.custom_metrics:
-            self.custom_metrics[category] = {}
-        if name not in self.custom_metrics[category]:
-            self.custom_metrics[category][name] = RollingMetric()
-        self.custom_metrics[category][name].add(value)
+        with self.rolling_lock:
+            if category not in self.custom_metrics:
+                self.custom_metrics[category] = {}
+            if name not in self.custom_metrics[category]:
+                self.custom_metrics[category][name] = RollingMetric()
+            self.custom_metrics[category][name].add(value)
 
     def get_extended_metrics(self):
         summary = {}
-        for name, metric in self.rolling_metrics.items():
-            summary[name] = {
-                "current": metric.current(),
-                "average_1m": metric.average(60),
-                "average_5m": metric.average(300),
-                "average_15m": metric.average(900)
-            }
+        with self.rolling_lock:
+            for name, metric in self.rolling_metrics.items():
+                summary[name] = {
+                    "current": metric.current(),
+                    "average_1m": metric.average(60),
+                    "average_5m": metric.average(300),
+                    "average_15m": metric.average(900)
+                }
+
+                for label, window in (("1m", 60), ("5m", 300), ("15m", 900)):
+                    for q in (50, 95, 99):
+                        summary[name][f"p{q}_{label}"] = metric.percentile(q / 100, window)
 
         return summary
 
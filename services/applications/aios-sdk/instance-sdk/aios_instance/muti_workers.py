@@ -1,8 +1,17 @@
+import os
+import json
+import atexit
 import threading
 import queue
 import logging
 import random
-from multiprocessing import Process, Queue, Event, current_process
+import struct
+import time
+import multiprocessing
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+from .metrics import MetricsAccumulator
 
 
 logging.basicConfig(level=logging.DEBUG)
@@ -16,16 +25,79 @@ class BaseJobExecutor:
         raise NotImplementedError
 
 
+class SessionAffinityTable:
+    # session_id -> worker index, bounded by size and idle TTL (LRU order = last access order)
+    def __init__(self, max_sessions=10000, ttl=600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.entries = OrderedDict()
+
+    def get(self, session_id):
+        entry = self.entries.get(session_id)
+        if entry is None:
+            return None
+
+        index, last_seen = entry
+        now = time.time()
+        if self.ttl and now - last_seen > self.ttl:
+            del self.entries[session_id]
+            return None
+
+        self.entries[session_id] = (index, now)
+        self.entries.move_to_end(session_id)
+        return index
+
+    def set(self, session_id, index):
+        self.entries[session_id] = (index, time.time())
+        self.entries.move_to_end(session_id)
+        self.evict()
+
+    def evict(self):
+        while len(self.entries) > self.max_sessions:
+            self.entries.popitem(last=False)
+
+        if self.ttl:
+            cutoff = time.time() - self.ttl
+            while self.entries:
+                _, (_, last_seen) = next(iter(self.entries.items()))
+                if last_seen >= cutoff:
+                    break
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
 class ThreadJobExecutor(BaseJobExecutor):
-    def __init__(self, worker_fn, max_threads=4, max_queue_size=100, sticky_sessions=False):
+    def __init__(self, worker_fn, max_threads=4, max_queue_size=100, sticky_sessions=False,
+                 scheduler="random", max_sessions=10000, session_ttl=600, backpressure=False, metrics=None):
         self.worker_fn = worker_fn
         self.max_threads = max_threads
         self.sticky_sessions = sticky_sessions
+        self.scheduler = scheduler
+        self.backpressure = backpressure
+        self.metrics = metrics
 
         self.queues = [queue.Queue(maxsize=max_queue_size) for _ in range(max_threads)]
-        self.session_to_thread = {}
+        self.session_to_thread = SessionAffinityTable(max_sessions=max_sessions, ttl=session_ttl)
+        self.lock = threading.Lock()
+        self.capacity = threading.Condition()
         self.stop_event = threading.Event()
 
+        if self.metrics:
+            for i in range(max_threads):
+                self.metrics.register_gauge(
+                    f"thread_worker_{i}_queue_depth", f"number of jobs waiting in the queue of thread-{i}")
+            self.metrics.register_counter(
+                "thread_executor_dropped_jobs", "number of jobs dropped because the worker queue was full")
+            self.metrics.register_counter(
+                "thread_executor_backpressure_waits", "number of times reading from redis paused on full worker queues")
+            self.metrics.register_gauge(
+                "thread_executor_sticky_sessions", "number of sessions in the affinity table")
+
+            t = threading.Thread(target=self._report_metrics, daemon=True)
+            t.start()
+
         for i in range(max_threads):
             t = threading.Thread(target=self._run_worker, args=(i,), daemon=True)
             t.start()
@@ -35,6 +107,8 @@ class ThreadJobExecutor(BaseJobExecutor):
         while not self.stop_event.is_set():
             try:
                 job = self.queues[thread_index].get(timeout=1)
+                with self.capacity:
+                    self.capacity.notify_all()
                 self.worker_fn(job)
                 self.queues[thread_index].task_done()
             except queue.Empty:
@@ -42,71 +116,506 @@ class ThreadJobExecutor(BaseJobExecutor):
             except Exception as e:
                 logging.error(f"[ThreadJobExecutor] Error in thread-{thread_index}: {str(e)}")
 
-    def assign_job(self, job_data, session_id=None):
-        try:
-            if self.sticky_sessions and session_id:
+    def _report_metrics(self):
+        while not self.stop_event.is_set():
+            for i, q in enumerate(self.queues):
+                self.metrics.set_gauge(f"thread_worker_{i}_queue_depth", q.qsize())
+            self.metrics.set_gauge("thread_executor_sticky_sessions", len(self.session_to_thread))
+            time.sleep(1)
+
+    def _least_loaded(self):
+        return min(range(self.max_threads), key=lambda i: self.queues[i].qsize())
+
+    def _pick_thread(self, session_id):
+        if self.sticky_sessions and session_id:
+            with self.lock:
                 thread_index = self.session_to_thread.get(session_id)
                 if thread_index is None:
-                    thread_index = hash(session_id) % self.max_threads
-                    self.session_to_thread[session_id] = thread_index
+                    if self.scheduler == "least_loaded":
+                        thread_index = self._least_loaded()
+                    else:
+                        thread_index = hash(session_id) % self.max_threads
+                    self.session_to_thread.set(session_id, thread_index)
+                return thread_index
+
+        if self.scheduler == "least_loaded":
+            return self._least_loaded()
+
+        return random.randint(0, self.max_threads - 1)
+
+    def wait_for_capacity(self):
+        # called by the reader before popping the next packet, so that packets
+        # stay in the redis list while every worker queue is saturated
+        if not self.backpressure:
+            return
+
+        with self.capacity:
+            if not all(q.full() for q in self.queues):
+                return
+
+            if self.metrics:
+                self.metrics.increment_counter("thread_executor_backpressure_waits")
+
+            while all(q.full() for q in self.queues) and not self.stop_event.is_set():
+                self.capacity.wait(timeout=1)
+
+    def assign_job(self, job_data, session_id=None):
+        thread_index = self._pick_thread(session_id)
+        try:
+            if self.backpressure:
+                # block this reader instead of dropping, the worker queue drains eventually
+                while not self.stop_event.is_set():
+                    try:
+                        self.queues[thread_index].put(job_data, timeout=1)
+                        break
+                    except queue.Full:
+                        if self.metrics:
+                            self.metrics.increment_counter("thread_executor_backpressure_waits")
+                        if not (self.sticky_sessions and session_id):
+                            thread_index = self._pick_thread(session_id)
             else:
-                thread_index = random.randint(0, self.max_threads - 1)
+                self.queues[thread_index].put_nowait(job_data)
 
-            self.queues[thread_index].put_nowait(job_data)
             logging.debug(f"[ThreadJobExecutor] Assigned job to thread-{thread_index}")
             return True
         except queue.Full:
             logging.warning(f"[ThreadJobExecutor] Queue full for thread-{thread_index}")
+            if self.metrics:
+                self.metrics.increment_counter("thread_executor_dropped_jobs")
             return False
 
+    def end_session(self, session_id):
+        with self.lock:
+            self.session_to_thread.entries.pop(session_id, None)
+
     def shutdown(self):
         self.stop_event.set()
 
 
+class SharedMemoryRing:
+    # single-producer/single-consumer ring of fixed size slots backed by shared memory,
+    # the parent only advances head and the worker only advances tail. tail is kept in
+    # the shared segment so a restarted worker continues where the previous one stopped.
+    # packets larger than a slot are spilled to the overflow queue and a marker
+    # takes their slot, so the ring stays the single FIFO order for the worker.
+    HEADER = struct.Struct("Id")
+    TAIL = struct.Struct("Q")
+    SPILLED = 0xFFFFFFFF
+
+    def __init__(self, ctx, slots=64, slot_size=256 * 1024, overflow=None):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.stride = self.HEADER.size + slot_size
+        self.shm = shared_memory.SharedMemory(create=True, size=self.TAIL.size + slots * self.stride)
+        self.TAIL.pack_into(self.shm.buf, 0, 0)
+        self.free = ctx.Semaphore(slots)
+        self.filled = ctx.Semaphore(0)
+        self.overflow = overflow
+        self.head = 0
+
+    def fits(self, data):
+        return len(data) <= self.slot_size
+
+    def _offset(self, slot):
+        return self.TAIL.size + slot * self.stride
+
+    def put_nowait(self, data, ts):
+        if not self.free.acquire(block=False):
+            raise queue.Full
+
+        offset = self._offset(self.head)
+        if self.fits(data):
+            self.HEADER.pack_into(self.shm.buf, offset, len(data), ts)
+            start = offset + self.HEADER.size
+            self.shm.buf[start:start + len(data)] = data
+        else:
+            try:
+                self.overflow.put_nowait(data)
+            except queue.Full:
+                self.free.release()
+                raise
+            self.HEADER.pack_into(self.shm.buf, offset, self.SPILLED, ts)
+
+        self.head = (self.head + 1) % self.slots
+        self.filled.release()
+
+    def get(self, timeout=1):
+        if not self.filled.acquire(timeout=timeout):
+            raise queue.Empty
+
+        tail = self.TAIL.unpack_from(self.shm.buf, 0)[0]
+        offset = self._offset(tail)
+        size, ts = self.HEADER.unpack_from(self.shm.buf, offset)
+        if size == self.SPILLED:
+            # already enqueued before the marker was published
+            data = self.overflow.get()
+        else:
+            start = offset + self.HEADER.size
+            data = bytes(self.shm.buf[start:start + size])
+        self.TAIL.pack_into(self.shm.buf, 0, (tail + 1) % self.slots)
+        self.free.release()
+        return data, ts
+
+    def close(self, unlink=False):
+        try:
+            self.shm.close()
+            if unlink:
+                self.shm.unlink()
+        except Exception as e:
+            logging.warning(f"[SharedMemoryRing] Failed to release shared memory: {str(e)}")
+
+
+class SharedSummary:
+    # latest AIOSMetrics.get_extended_metrics() of the parent, published as JSON
+    # so block code in worker processes reads the same aggregated view
+    LENGTH = struct.Struct("I")
+
+    def __init__(self, ctx, size=1024 * 1024):
+        self.size = size
+        self.buffer = ctx.Array("c", self.LENGTH.size + size)
+        self.LENGTH.pack_into(self.buffer.get_obj(), 0, 0)
+
+    def publish(self, summary):
+        data = json.dumps(summary).encode()
+        if len(data) > self.size:
+            logging.warning(f"[SharedSummary] Extended metrics ({len(data)} bytes) exceed {self.size} bytes, not published")
+            return
+        with self.buffer.get_lock():
+            raw = self.buffer.get_obj()
+            raw[self.LENGTH.size:self.LENGTH.size + len(data)] = data
+            self.LENGTH.pack_into(raw, 0, len(data))
+
+    def read(self):
+        with self.buffer.get_lock():
+            raw = self.buffer.get_obj()
+            length = self.LENGTH.unpack_from(raw, 0)[0]
+            data = bytes(raw[self.LENGTH.size:self.LENGTH.size + length])
+        return json.loads(data) if data else {}
+
+
+class WorkerMetricsProxy:
+    # stands in for AIOSMetrics inside a worker process, aggregates updates in
+    # per-thread accumulators and ships them to the parent at a fixed interval.
+    METHODS = ("local", "register_counter", "register_gauge", "register_histogram", "increment_counter",
+               "set_gauge", "observe_histogram", "observe_rolling", "observe_custom_rolling",
+               "get_extended_metrics")
+
+    def __init__(self, worker_index, metrics_queue, flush_interval=1.0, summary=None):
+        self.worker_index = worker_index
+        self.metrics_queue = metrics_queue
+        self.flush_interval = flush_interval
+        self.summary = summary
+        self.local_state = threading.local()
+        self.accumulators = []
+        self.accumulators_lock = threading.Lock()
+
+        t = threading.Thread(target=self._flush_loop, daemon=True)
+        t.start()
+
+    def local(self):
+        accumulator = getattr(self.local_state, "accumulator", None)
+        if accumulator is None:
+            accumulator = MetricsAccumulator()
+            self.local_state.accumulator = accumulator
+            with self.accumulators_lock:
+                self.accumulators.append((threading.current_thread(), accumulator))
+        return accumulator
+
+    def register_counter(self, name, documentation, labelnames=None):
+        pass
+
+    def register_gauge(self, name, documentation, labelnames=None):
+        pass
+
+    def register_histogram(self, name, documentation, labelnames=None, buckets=None):
+        pass
+
+    def increment_counter(self, name, labelnames=None, amount=1):
+        self.local().inc(name, amount)
+
+    def set_gauge(self, name, value, labelnames=None):
+        self.local().set(name, value)
+
+    def observe_histogram(self, name, value, labelnames=None):
+        self.local().observe_histogram(name, value)
+
+    def observe_rolling(self, name, value):
+        self.local().observe_rolling(name, value)
+
+    def observe_custom_rolling(self, category, name, value):
+        self.local().observe_custom_rolling(category, name, value)
+
+    def get_extended_metrics(self):
+        if self.summary is None:
+            return {}
+        return self.summary.read()
+
+    def install(self, metrics):
+        # the block inherited from the parent keeps references to the parent's
+        # AIOSMetrics, shadow its methods so those calls are reported from here
+        for name in self.METHODS:
+            setattr(metrics, name, getattr(self, name))
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+
+            report = {
+                "worker_index": self.worker_index,
+                "counters": {},
+                "gauges": {},
+                "rolling": {},
+                "histograms": {},
+                "custom": {}
+            }
+
+            with self.accumulators_lock:
+                accumulators = list(self.accumulators)
+
+            finished = []
+            for thread, accumulator in accumulators:
+                if not thread.is_alive():
+                    finished.append(accumulator)
+                drained = accumulator.drain()
+                for name, count in drained["counters"].items():
+                    report["counters"][name] = report["counters"].get(name, 0) + count
+                report["gauges"].update(drained["gauges"])
+                for key in ("rolling", "histograms"):
+                    for name, values in drained[key].items():
+                        report[key].setdefault(name, []).extend(values)
+                for category, names in drained["custom"].items():
+                    for name, values in names.items():
+                        report["custom"].setdefault(category, {}).setdefault(name, []).extend(values)
+
+            if finished:
+                with self.accumulators_lock:
+                    finished = set(map(id, finished))
+            self.accumulators = [entry for entry in self.accumulators if id(entry[1]) not in finished]
+
+            try:
+                self.metrics_queue.put_nowait(report)
+            except Exception as e:
+                logging.warning(f"[WorkerMetricsProxy] Failed to report metrics from process-{self.worker_index}: {str(e)}")
+
+
 class ProcessJobExecutor(BaseJobExecutor):
-    def __init__(self, worker_fn, max_threads=4, max_queue_size=100, sticky_sessions=False):
+    # workers are forked from a single-threaded supervisor process, itself forked
+    # before the block starts any SDK thread, so neither the first fork nor a
+    # restart happens in a multithreaded process. workers inherit the loaded block
+    # (copy-on-write) and only rebuild process-local state in worker_init.
+    def __init__(self, worker_fn, max_threads=4, max_queue_size=100, sticky_sessions=False,
+                 worker_init=None, metrics=None, slot_size=256 * 1024, restart_delay=1,
+                 max_sessions=10000, session_ttl=600, summary_size=1024 * 1024):
         self.worker_fn = worker_fn
+        self.worker_init = worker_init
+        self.metrics = metrics
         self.max_threads = max_threads
+        self.max_queue_size = max_queue_size
         self.sticky_sessions = sticky_sessions
+        self.slot_size = slot_size
+        self.restart_delay = restart_delay
 
-        self.queues = [Queue(maxsize=max_queue_size) for _ in range(max_threads)]
-        self.session_to_thread = {}
-        self.stop_event = Event()
-        self.processes = []
+        self.ctx = multiprocessing.get_context("fork")
+        self.stop_event = self.ctx.Event()
+        self.metrics_queue = self.ctx.Queue()
+        self.summary = SharedSummary(self.ctx, size=summary_size)
 
-        for i in range(max_threads):
-            p = Process(target=self._run_worker, args=(i,))
-            p.daemon = True
-            p.start()
-            self.processes.append(p)
-            logging.info(f"[ProcessJobExecutor] Started process-{i}")
+        # created once, a restarted worker takes over the ring of the one it replaces;
+        # packets that do not fit in a ring slot are spilled to a pickled queue
+        self.rings = [
+            SharedMemoryRing(self.ctx, slots=max_queue_size, slot_size=slot_size,
+                             overflow=self.ctx.Queue(maxsize=max_queue_size))
+            for _ in range(max_threads)
+        ]
+        self.worker_pids = self.ctx.Array("i", max_threads)
+        self.restarts = self.ctx.Value("i", 0)
+
+        self.worker_stats = {}
+        self.session_to_thread = SessionAffinityTable(max_sessions=max_sessions, ttl=session_ttl)
+        self.lock = threading.Lock()
+
+        if self.metrics:
+            self.metrics.register_counter(
+                "process_worker_restarts", "number of crashed worker processes that were restarted")
+            self.metrics.register_gauge(
+                "process_workers_alive", "number of live worker processes")
+            self.metrics.register_counter(
+                "process_worker_jobs", "number of jobs processed by worker processes")
+            self.metrics.register_counter(
+                "process_worker_errors", "number of jobs that raised in worker processes")
+
+        others = [t.name for t in threading.enumerate() if t is not threading.current_thread()]
+        if others:
+            logging.warning(
+                f"[ProcessJobExecutor] Forking workers while threads are running: {others}, "
+                f"locks they hold at this point stay locked in the workers")
+
+        self.supervisor = self.ctx.Process(target=self._supervise, name="aios-worker-supervisor")
+        self.supervisor.start()
+        atexit.register(self.shutdown)
+
+        t = threading.Thread(target=self._collect_metrics, daemon=True)
+        t.start()
+
+        t = threading.Thread(target=self._monitor_workers, daemon=True)
+        t.start()
+
+    def _supervise(self):
+        # single-threaded: only forks, reaps and re-forks workers
+        parent_pid = os.getppid()
+        workers = [None] * self.max_threads
+
+        while not self.stop_event.is_set() and os.getppid() == parent_pid:
+            for index in range(self.max_threads):
+                p = workers[index]
+                if p is not None:
+                    if p.is_alive():
+                        continue
+                    logging.error(
+                        f"[ProcessJobExecutor] process-{index} exited with code {p.exitcode}, restarting")
+                    with self.restarts.get_lock():
+                        self.restarts.value += 1
+                    time.sleep(self.restart_delay)
+
+                p = self.ctx.Process(target=self._run_worker, args=(index, self.rings[index]), daemon=True)
+                p.start()
+                workers[index] = p
+                self.worker_pids[index] = p.pid
+                logging.info(f"[ProcessJobExecutor] Started process-{index} pid={p.pid}")
+
+            self.stop_event.wait(0.5)
+
+        for p in workers:
+            if p is not None and p.is_alive():
+                p.terminate()
+        for p in workers:
+            if p is not None:
+                p.join(timeout=5)
+
+    def _run_worker(self, index, ring):
+        metrics_proxy = WorkerMetricsProxy(index, self.metrics_queue, summary=self.summary)
+
+        try:
+            if self.worker_init:
+                self.worker_init(metrics_proxy)
+        except Exception as e:
+            logging.error(f"[ProcessJobExecutor] Worker init failed in process-{index}: {str(e)}")
+            raise
 
-    def _run_worker(self, index):
         while not self.stop_event.is_set():
             try:
-                job = self.queues[index].get(timeout=1)
+                job = ring.get(timeout=1)
+
                 self.worker_fn(job)
+                metrics_proxy.increment_counter("process_worker_jobs")
+            except queue.Empty:
+                continue
             except Exception as e:
-                continue  # For multiprocessing, can't log easily without sync
+                logging.error(f"[ProcessJobExecutor] Error in process-{index}: {str(e)}")
+                metrics_proxy.increment_counter("process_worker_errors")
+
+        ring.close()
+
+    def _collect_metrics(self):
+        published_at = 0
+        while not self.stop_event.is_set():
+            if self.metrics and time.time() - published_at >= 1:
+                published_at = time.time()
+                try:
+                    self.summary.publish(self.metrics.get_extended_metrics())
+                except Exception as e:
+                    logging.error(f"[ProcessJobExecutor] Error publishing extended metrics: {str(e)}")
+
+            try:
+                report = self.metrics_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            except Exception as e:
+                logging.error(f"[ProcessJobExecutor] Error reading worker metrics: {str(e)}")
+                continue
+
+            index = report["worker_index"]
+            stats = self.worker_stats.setdefault(index, {"jobs": 0, "errors": 0, "last_report": 0})
+            stats["jobs"] += report["counters"].get("process_worker_jobs", 0)
+            stats["errors"] += report["counters"].get("process_worker_errors", 0)
+            stats["last_report"] = time.time()
+
+            if not self.metrics:
+                continue
+
+            try:
+                self.metrics.apply_report(report)
+            except Exception as e:
+                logging.error(f"[ProcessJobExecutor] Error applying metrics from process-{index}: {str(e)}")
+
+    @staticmethod
+    def _pid_alive(pid):
+        if not pid:
+            return False
+        try:
+            os.kill(pid, 0)
+            return True
+        except OSError:
+            return False
+
+    def _monitor_workers(self):
+        # restarts happen in the supervisor, the parent only reports
+        reported_restarts = 0
+        supervisor_lost = False
+        while not self.stop_event.is_set():
+            if not supervisor_lost and not self.supervisor.is_alive():
+                supervisor_lost = True
+                logging.error(
+                    f"[ProcessJobExecutor] worker supervisor exited with code {self.supervisor.exitcode}, "
+                    f"crashed workers are no longer restarted")
+            alive = sum(1 for pid in self.worker_pids if self._pid_alive(pid))
+
+            if self.metrics:
+                restarts = self.restarts.value
+                if restarts > reported_restarts:
+                    self.metrics.increment_counter("process_worker_restarts", amount=restarts - reported_restarts)
+                    reported_restarts = restarts
+                self.metrics.set_gauge("process_workers_alive", alive)
+
+            self.stop_event.wait(1)
+
+    def get_worker_stats(self):
+        stats = dict(self.worker_stats)
+        for index, pid in enumerate(self.worker_pids):
+            stats.setdefault(index, {"jobs": 0, "errors": 0, "last_report": 0})["pid"] = pid
+        return stats
 
     def assign_job(self, job_data, session_id=None):
         try:
-            if self.sticky_sessions and session_id:
-                idx = self.session_to_thread.get(session_id)
-                if idx is None:
-                    idx = hash(session_id) % self.max_threads
-                    self.session_to_thread[session_id] = idx
-            else:
-                idx = random.randint(0, self.max_threads - 1)
+            job_bytes, ts = job_data
+
+            with self.lock:
+                if self.sticky_sessions and session_id:
+                    idx = self.session_to_thread.get(session_id)
+                    if idx is None:
+                        idx = hash(session_id) % self.max_threads
+                        self.session_to_thread.set(session_id, idx)
+                else:
+                    idx = random.randint(0, self.max_threads - 1)
+
+                self.rings[idx].put_nowait(job_bytes, ts)
 
-            self.queues[idx].put_nowait(job_data)
             logging.debug(f"[ProcessJobExecutor] Assigned job from {session_id} to process-{idx}")
             return True
         except queue.Full:
             logging.warning(f"[ProcessJobExecutor] Queue full for process-{idx}")
             return False
 
+    def end_session(self, session_id):
+        with self.lock:
+            self.session_to_thread.entries.pop(session_id, None)
+
     def shutdown(self):
+        if self.stop_event.is_set():
+            return
         self.stop_event.set()
-        for p in self.processes:
-            p.terminate()
+        self.supervisor.join(timeout=10)
+        if self.supervisor.is_alive():
+            self.supervisor.terminate()
+        for ring in self.rings:
+            ring.close(unlink=True)
@@ -0,0 +1,125 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingTarget:
+    def __init__(self, block_id, host, port, queue_name):
+        self.block_id = block_id
+        self.host = host
+        self.port = port
+        self.queue_name = queue_name
+
+
+class RoutingPlan:
+    def __init__(self, targets):
+        # group targets by host:port so each host gets one pipelined batch:
+        self.groups = OrderedDict()
+        for target in targets:
+            key = (target.host, target.port)
+            if key not in self.groups:
+                self.groups[key] = {"block_id": target.block_id, "queues": []}
+            self.groups[key]["queues"].append(target.queue_name)
+
+        self.connections = {}
+
+    def is_empty(self):
+        return len(self.groups) == 0
+
+
+class RoutingPlanCache:
+    def __init__(self, block_id, connection_cache, metrics=None, max_size=1024):
+        self.block_id = block_id
+        self.connection_cache = connection_cache
+        self.metrics = metrics
+        self.max_size = max_size
+        self.plans = OrderedDict()
+        self.lock = threading.Lock()
+
+        if self.metrics:
+            self.metrics.register_counter(
+                "routing_plan_cache_hits", "number of output_ptr lookups served from the routing plan cache")
+            self.metrics.register_counter(
+                "routing_plan_cache_misses", "number of output_ptr lookups that compiled a new routing plan")
+
+    def compile(self, output_ptr: str):
+        output_config = json.loads(output_ptr)
+        if 'is_graph' in output_config and output_config['is_graph']:
+            g = output_config['graph']
+            output_config = g.get(self.block_id, {"outputs": []})
+
+            if len(output_config['outputs']) == 0:
+                output_config = g['final']
+
+        targets = []
+        for output in output_config.get("outputs", []):
+            targets.append(RoutingTarget(
+                block_id=output.get('block_id', ''),
+                host=output.get("host", "localhost"),
+                port=output.get("port", 6379),
+                queue_name=output.get("queue_name", "OUTPUT")
+            ))
+
+        plan = RoutingPlan(targets)
+        for (host, port), group in plan.groups.items():
+            conn = self.connection_cache.get(group["block_id"], host, port)
+            if conn:
+                plan.connections[(host, port)] = conn
+
+        return plan
+
+    def get(self, output_ptr: str):
+        with self.lock:
+            plan = self.plans.get(output_ptr)
+            if plan is not None:
+                self.plans.move_to_end(output_ptr)
+
+        if plan is not None:
+            if self.metrics:
+                self.metrics.local().inc("routing_plan_cache_hits")
+            return plan
+
+        if self.metrics:
+            self.metrics.local().inc("routing_plan_cache_misses")
+
+        plan = self.compile(output_ptr)
+
+        with self.lock:
+            self.plans[output_ptr] = plan
+            self.plans.move_to_end(output_ptr)
+            while len(self.plans) > self.max_size:
+                self.plans.popitem(last=False)
+
+        return plan
+
+    def invalidate(self, output_ptr: str):
+        with self.lock:
+            self.plans.pop(output_ptr, None)
+
+    def push(self, output_ptr: str, output_bytes: bytes):
+        plan = self.get(output_ptr)
+
+        for (host, port), group in plan.groups.items():
+            conn = plan.connections.get((host, port))
+            if not conn:
+                logger.error(f"[RoutingPlanCache] No connection available for {host}:{port}")
+                # recompile on the next packet so the connection is retried
+                self.invalidate(output_ptr)
+                continue
+
+            try:
+                if port == 0:
+                    for queue_name in group["queues"]:
+                        conn.lpush(queue_name, output_bytes)
+                else:
+                    pipe = conn.pipeline(transaction=False)
+                    for queue_name in group["queues"]:
+                        pipe.lpush(queue_name, output_bytes)
+                    pipe.execute()
+            except Exception as e:
+                logger.error(f"[RoutingPlanCache] Failed to push output to {host}:{port}: {str(e)}")
+                self.connection_cache.remove(host, port)
+                self.invalidate(output_ptr)
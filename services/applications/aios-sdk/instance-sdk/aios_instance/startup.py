@@ -0,0 +1,177 @@
+import json
+import time
+import logging
+import threading
+import multiprocessing
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class StartupOrchestrator:
+    # runs instance init steps, concurrently where they are independent, and
+    # records how long every phase took so cold-start costs are visible
+    def __init__(self, max_workers=4, on_update=None):
+        self.max_workers = max_workers
+        # called with the report after every phase, feeds the boot status server
+        self.on_update = on_update
+        self.started_at = time.time()
+        self.timings = {}
+        self.errors = {}
+        self.ready = threading.Event()
+        self.ready_at = None
+        self.lock = threading.Lock()
+
+    def _timed(self, name, fn):
+        start = time.time()
+        try:
+            return fn()
+        except Exception as e:
+            with self.lock:
+                self.errors[name] = str(e)
+            raise
+        finally:
+            with self.lock:
+                self.timings[name] = time.time() - start
+            logger.info(f"[Startup] phase {name} took {self.timings[name]:.3f}s")
+            if self.on_update:
+                self.on_update(self.report())
+
+    def run_step(self, name, fn):
+        return self._timed(name, fn)
+
+    def run_parallel(self, steps: dict):
+        # all steps run to completion, the first failure is raised afterwards
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {name: pool.submit(self._timed, name, fn) for name, fn in steps.items()}
+
+        results = {}
+        for name, future in futures.items():
+            results[name] = future.result()
+        return results
+
+    def defer(self, steps: dict):
+        def _run():
+            for name, fn in steps.items():
+                try:
+                    self._timed(f"deferred:{name}", fn)
+                except Exception as e:
+                    logger.error(f"[Startup] deferred phase {name} failed: {str(e)}")
+
+        t = threading.Thread(target=_run, daemon=True)
+        t.start()
+        return t
+
+    def mark_ready(self):
+        self.ready_at = time.time()
+        self.ready.set()
+        logger.info(f"[Startup] instance ready, report={self.report()}")
+
+    def is_ready(self):
+        return self.ready.is_set()
+
+    def report(self):
+        with self.lock:
+            timings = dict(self.timings)
+            errors = dict(self.errors)
+
+        end = self.ready_at or time.time()
+        return {
+            "ready": self.ready.is_set(),
+            "time_to_ready": end - self.started_at,
+            "phases": timings,
+            "errors": errors
+        }
+
+
+def _serve_boot_status(port, conn, report):
+    state = {"report": report}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/ready":
+                body = {"success": False, "data": state["report"]}
+            elif path == "/health":
+                body = {"success": False, "message": "block is still starting"}
+            else:
+                self.send_error(404)
+                return
+
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = HTTPServer(("0.0.0.0", port), Handler)
+    except OSError as e:
+        logger.warning(f"[BootStatusServer] Could not bind port {port}: {str(e)}")
+        return
+
+    server.timeout = 0.2
+    with server:
+        while True:
+            try:
+                while conn.poll():
+                    report = conn.recv()
+                    if report is None:
+                        return
+                    state["report"] = report
+            except (EOFError, OSError):
+                # the instance is gone
+                return
+            server.handle_request()
+
+
+class BootStatusServer:
+    # answers /ready and /health with 503 and the startup report while the instance boots.
+    # Runs single threaded in a process forked before the instance creates any thread, and
+    # is stopped right before the management server binds the same port
+    def __init__(self, port):
+        self.port = port
+        self.process = None
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def start(self, report):
+        ctx = multiprocessing.get_context("fork")
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_serve_boot_status, args=(self.port, child_conn, report), daemon=True)
+        self.process.start()
+        child_conn.close()
+        logger.info(f"[BootStatusServer] Serving boot status on port {self.port}, pid={self.process.pid}")
+
+    def publish(self, report):
+        with self.lock:
+            if self.conn is None:
+                return
+            try:
+                self.conn.send(report)
+            except (OSError, ValueError) as e:
+                logger.warning(f"[BootStatusServer] Could not publish startup report: {str(e)}")
+
+    def stop(self):
+        with self.lock:
+            if self.process is None:
+                return
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+
+            # the port must be free before the management server binds it
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+            self.conn.close()
+            self.process = None
+            self.conn = None
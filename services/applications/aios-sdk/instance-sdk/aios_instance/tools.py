@@ -1,38 +1,133 @@
-import copy
-import json
-from collections import defaultdict
+import time
+import logging
 import threading
+from collections import OrderedDict
 
 
 class Muxer:
-    def __init__(self, N: int):
+    def __init__(self, N: int, window_seconds: float = 30, max_pending: int = 1000,
+                 eviction_policy: str = "drop", metrics=None, max_tombstones: int = 10000):
         self.N = N
-        self.store = defaultdict(list)
-        self.counts = defaultdict(int)
+        self.window_seconds = window_seconds
+        self.max_pending = max_pending
+        # "drop" discards incomplete groups, "partial" merges whatever arrived
+        self.eviction_policy = eviction_policy
+        self.metrics = metrics
+
+        # (session_id, seq_no) -> (first_seen, packets), in arrival order of the first packet
+        self.store = OrderedDict()
+        # groups completed or evicted recently -> when, late packets for them are dropped
+        # instead of opening a new group that could only end as a duplicate partial
+        self.tombstones = OrderedDict()
+        self.max_tombstones = max_tombstones
+        # evicted partial groups wait here for the main loop, see pop_partials
+        self.partials = []
+        self.evictions = 0
+        self.late_packets = 0
+        self.lock = threading.Lock()
+
+        if self.metrics:
+            # registration is idempotent in AIOSMetrics, several muxers can share it
+            self.metrics.register_gauge(
+                "muxer_pending_groups", "number of incomplete fan-in groups held by the muxer")
+            self.metrics.register_counter(
+                "muxer_evictions", "number of incomplete fan-in groups evicted by the muxer")
+            self.metrics.register_counter(
+                "muxer_late_packets", "number of packets dropped for already completed or evicted groups")
+
+    @property
+    def needs_sweep(self):
+        # the instance wakes up idle muxers to expire their groups
+        return self.N > 1 and bool(self.window_seconds)
 
     def process_packet(self, packet):
         if self.N == 1:
             return packet  # No merging needed
 
         key = (packet.session_id, packet.seq_no)
-        self.store[key].append(packet)
-        self.counts[key] += 1
+        now = time.time()
+
+        with self.lock:
+            self._expire_tombstones(now)
+            if key in self.tombstones:
+                self.late_packets += 1
+                if self.metrics:
+                    self.metrics.local().inc("muxer_late_packets")
+                return None
+
+            entry = self.store.get(key)
+            if entry is None:
+                entry = (now, [])
+                self.store[key] = entry
+
+            packets = entry[1]
+            packets.append(packet)
+
+            merged_packet = None
+            if len(packets) == self.N:
+                del self.store[key]
+                self._tombstone(key, now)
+                merged_packet = self._merge_packets(packets)
+
+            # after the insert, so the group completed above is never evicted
+            self._evict(now)
+
+            if self.metrics:
+                self.metrics.local().set("muxer_pending_groups", len(self.store))
+
+        return merged_packet
+
+    def pop_partials(self):
+        with self.lock:
+            partials = self.partials
+            self.partials = []
+        return partials
+
+    def sweep(self):
+        # called from the instance main loop, evicted partials are returned with pop_partials
+        now = time.time()
+        with self.lock:
+            self._expire_tombstones(now)
+            self._evict(now)
+            if self.metrics:
+                self.metrics.local().set("muxer_pending_groups", len(self.store))
+
+    def _tombstone(self, key, now):
+        self.tombstones[key] = now
+        self.tombstones.move_to_end(key)
+        while len(self.tombstones) > self.max_tombstones:
+            self.tombstones.popitem(last=False)
+
+    def _expire_tombstones(self, now):
+        # without a window tombstones are only bounded by max_tombstones
+        if not self.window_seconds:
+            return
+        while self.tombstones and now - next(iter(self.tombstones.values())) > self.window_seconds:
+            self.tombstones.popitem(last=False)
+
+    def _evict(self, now):
+        while self.store:
+            key, (first_seen, packets) = next(iter(self.store.items()))
+            expired = self.window_seconds and now - first_seen > self.window_seconds
+            if not expired and len(self.store) <= self.max_pending:
+                break
 
-        if self.counts[key] == self.N:
-            merged_packet = self._merge_packets(self.store[key])
             del self.store[key]
-            del self.counts[key]
-            return merged_packet
+            self._tombstone(key, now)
+            self.evictions += 1
+            if self.metrics:
+                self.metrics.local().inc("muxer_evictions")
 
-        return None
+            if self.eviction_policy == "partial":
+                self.partials.append(self._merge_packets(packets))
 
     def _merge_packets(self, packets):
-        merged_data = {"inputs": [json.loads(p.data) for p in packets]}
-        merged_files = [file for p in packets for file in p.files]
-
-        base_packet = copy.deepcopy(packets[0])
-        base_packet.data = merged_data
-        base_packet.files = merged_files
+        # the first packet becomes the merged packet: data is spliced as raw JSON
+        # text and only the files of the remaining packets are appended
+        base_packet = packets[0]
+        base_packet.data = '{"inputs": [' + ", ".join(p.data or "null" for p in packets) + ']}'
+        for p in packets[1:]:
+            base_packet.files.extend(p.files)
 
         return base_packet
 
@@ -58,7 +153,8 @@ class TimeBasedBatcher:
         self.N = N
         self.T = T
         self.batch = []
-        self.lock = threading.Lock()
+        # re-entrant: add_to_batch flushes while already holding the lock
+        self.lock = threading.RLock()
         self.timer = None
         self.flush_callback = flush_callback
 
@@ -4,7 +4,13 @@ from io import BytesIO
 
 import pickle
 import os
+import json
+import time
+import uuid
+import logging
+import threading
 import redis
+from collections import OrderedDict
 from collections.abc import MutableMapping
 
 
@@ -326,6 +332,245 @@ class StateDictV2(MutableMapping):
         return f"{self.__class__.__name__}({dict(self.items())})"
 
 
+class StateDictV3(MutableMapping):
+    # one redis hash per namespace, values carry a one byte type tag
+    BASIC_TAGS = {str: b"s", int: b"i", float: b"f", bool: b"b"}
+
+    def __init__(self, namespace, cache=False, cache_size=10000):
+        redis_host = os.getenv('REDIS_HOST', 'localhost')
+        redis_port = int(os.getenv('REDIS_PORT', 6379))
+        redis_db = int(os.getenv('REDIS_DB', 0))
+        redis_password = os.getenv('REDIS_PASSWORD', None)
+
+        self.namespace = namespace
+        self.hash_key = f"{namespace}:hash"
+        self.channel = f"{namespace}:invalidate"
+        self.origin = str(uuid.uuid4())
+        self.redis_client = redis.StrictRedis(
+            host=redis_host,
+            port=redis_port,
+            db=redis_db,
+            password=redis_password,
+            decode_responses=False
+        )
+
+        self.cache_enabled = cache
+        self.cache_size = cache_size
+        # key -> encoded value, decoded on every hit so callers never share a mutable value
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        # bumped by every invalidation, a read only fills the cache if no
+        # invalidation happened between its redis read and the fill
+        self.cache_epoch = 0
+
+        if self.cache_enabled:
+            self.listener_thread = threading.Thread(
+                target=self._listen_invalidations, daemon=True)
+            self.listener_thread.start()
+
+    # encoding
+    def _encode(self, value):
+        if value is None:
+            return b"n"
+        tag = self.BASIC_TAGS.get(type(value))
+        if tag == b"s":
+            return tag + value.encode("utf-8")
+        if tag == b"b":
+            return tag + (b"1" if value else b"0")
+        if tag is not None:
+            return tag + repr(value).encode("utf-8")
+        return b"p" + pickle.dumps(value)
+
+    def _decode(self, raw):
+        tag, payload = raw[:1], raw[1:]
+        if tag == b"s":
+            return payload.decode("utf-8")
+        if tag == b"i":
+            return int(payload)
+        if tag == b"f":
+            return float(payload)
+        if tag == b"b":
+            return payload == b"1"
+        if tag == b"n":
+            return None
+        if tag == b"p":
+            return pickle.loads(payload)
+        raise ValueError(f"Unknown data type tag in namespace {self.namespace}: {tag}")
+
+    # local cache
+    def _cache_get(self, key):
+        with self.cache_lock:
+            raw = self.cache.get(key)
+            if raw is None:
+                return False, None
+            self.cache.move_to_end(key)
+        return True, self._decode(raw)
+
+    def _cache_insert(self, key, raw):
+        self.cache[key] = raw
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _cache_fill(self, raws, epoch):
+        with self.cache_lock:
+            if self.cache_epoch != epoch:
+                return
+            for key, raw in raws.items():
+                self._cache_insert(key, raw)
+
+    def _cache_drop(self, keys=None):
+        with self.cache_lock:
+            self.cache_epoch += 1
+            if keys is None:
+                self.cache.clear()
+                return
+            for key in keys:
+                self.cache.pop(key, None)
+
+    def _publish(self, pipe, keys=None):
+        # writers notify other instances even when they do not cache themselves
+        pipe.publish(self.channel, json.dumps({"origin": self.origin, "keys": keys}))
+
+    def _listen_invalidations(self):
+        while True:
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # anything could have changed while we were not subscribed
+                self._cache_drop()
+
+                for message in pubsub.listen():
+                    event = json.loads(message["data"])
+                    if event.get("origin") == self.origin:
+                        continue
+                    self._cache_drop(event.get("keys"))
+            except Exception as e:
+                logging.warning(f"[StateDictV3] Invalidation listener for {self.namespace} failed: {str(e)}")
+                self._cache_drop()
+                time.sleep(1)
+
+    # mapping interface
+    def __getitem__(self, key):
+        if self.cache_enabled:
+            found, value = self._cache_get(key)
+            if found:
+                return value
+
+        epoch = self.cache_epoch
+        raw = self.redis_client.hget(self.hash_key, key)
+        if raw is None:
+            raise KeyError(key)
+
+        if self.cache_enabled:
+            self._cache_fill({key: raw}, epoch)
+        return self._decode(raw)
+
+    def __setitem__(self, key, value):
+        self.set_many({key: value})
+
+    def __delitem__(self, key):
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hdel(self.hash_key, key)
+        self._publish(pipe, [key])
+        deleted = pipe.execute()[0]
+
+        if self.cache_enabled:
+            self._cache_drop([key])
+
+        if not deleted:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key in self.redis_client.hkeys(self.hash_key):
+            yield key.decode("utf-8")
+
+    def __len__(self):
+        return self.redis_client.hlen(self.hash_key)
+
+    def __contains__(self, key):
+        if self.cache_enabled:
+            with self.cache_lock:
+                if key in self.cache:
+                    return True
+        return bool(self.redis_client.hexists(self.hash_key, key))
+
+    def get_many(self, keys):
+        keys = list(keys)
+        result = {}
+        missing = []
+
+        for key in keys:
+            if self.cache_enabled:
+                found, value = self._cache_get(key)
+                if found:
+                    result[key] = value
+                    continue
+            missing.append(key)
+
+        if missing:
+            epoch = self.cache_epoch
+            raws = self.redis_client.hmget(self.hash_key, missing)
+            found = {key: raw for key, raw in zip(missing, raws) if raw is not None}
+            for key, raw in found.items():
+                result[key] = self._decode(raw)
+            if self.cache_enabled and found:
+                self._cache_fill(found, epoch)
+
+        return result
+
+    def set_many(self, mapping):
+        if not mapping:
+            return
+
+        encoded = {key: self._encode(value) for key, value in mapping.items()}
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hset(self.hash_key, mapping=encoded)
+        self._publish(pipe, list(mapping.keys()))
+        pipe.execute()
+
+        # dropped rather than filled: concurrent writers would race on the fill order
+        if self.cache_enabled:
+            self._cache_drop(list(mapping.keys()))
+
+    def clear(self):
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.delete(self.hash_key)
+        self._publish(pipe, None)
+        pipe.execute()
+
+        if self.cache_enabled:
+            self._cache_drop()
+
+    def keys(self):
+        return list(self.__iter__())
+
+    def values(self):
+        for _, value in self.items():
+            yield value
+
+    def items(self):
+        for key, raw in self.redis_client.hgetall(self.hash_key).items():
+            yield key.decode("utf-8"), self._decode(raw)
+
+    def get(self, key, default=None):
+        try:
+            return self.__getitem__(key)
+        except KeyError:
+            return default
+
+    def update(self, *args, **kwargs):
+        mapping = {}
+        if args:
+            mapping.update(dict(args[0]))
+        mapping.update(kwargs)
+        self.set_many(mapping)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({dict(self.items())})"
+
+
 class Session:
 
     def __init__(self, session_id, session_init_data) -> None:
@@ -1,6 +1,7 @@
 import asyncio
 import json
 import logging
+import queue
 import uuid
 import threading
 import websockets
@@ -13,22 +14,76 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class SessionOrderedDispatcher:
+    # every session is pinned to one worker thread, so messages of a session are
+    # processed in arrival order while different sessions run in parallel
+    def __init__(self, handler_function, num_workers=4):
+        self.handler_function = handler_function
+        self.num_workers = num_workers
+        self.queues = [queue.Queue() for _ in range(num_workers)]
+        self.started = False
+
+    def start(self):
+        # started with the websocket server rather than in __init__, the block
+        # forks its process workers in between and must not inherit these threads
+        if self.started:
+            return
+        self.started = True
+
+        for i in range(self.num_workers):
+            t = threading.Thread(target=self._run_worker, args=(i,), daemon=True)
+            t.start()
+
+    def _run_worker(self, index):
+        while True:
+            session_id, packet, on_done = self.queues[index].get()
+            try:
+                self.handler_function(session_id, packet)
+            except Exception as e:
+                logger.error(f"Failed to handle websocket message from {session_id}: {e}")
+            finally:
+                if on_done:
+                    on_done()
+
+    def dispatch(self, session_id, packet, on_done=None):
+        index = hash(session_id) % self.num_workers
+        self.queues[index].put((session_id, packet, on_done))
+
+
 class WebsocketStreamingManager:
-    def __init__(self, handler_function, port=18002):
+    def __init__(self, handler_function, port=18002, num_workers=4, max_inflight_per_session=32):
         self.handler_function = handler_function
         self.port = port
+        self.max_inflight_per_session = max_inflight_per_session
         self.session_map = {}  # session_id -> websocket
+        # session_id -> semaphore bounding messages not yet processed
+        self.inflight = {}
         self.server = None
         self.loop = None
+        self.dispatcher = SessionOrderedDispatcher(
+            self.websocket_handler, num_workers=num_workers)
 
-    def websocket_handler(self, session_id, data: dict):
-        try:
+    def build_packet(self, message):
+        # binary frames carry a serialized AIOSPacket, text frames carry JSON
+        if isinstance(message, (bytes, bytearray)):
             packet = AIOSPacket()
-            packet.session_id = session_id
-            packet.seq_no = int(data.get("seq_no", 0))
-            packet.data = data.get("data", "")
-            packet.ts = data.get("ts", time.time())
+            packet.ParseFromString(bytes(message))
+            if not packet.ts:
+                packet.ts = time.time()
+            return packet, False
+
+        data = json.loads(message)
+
+        packet = AIOSPacket()
+        packet.session_id = data.get('session_id') or ""
+        packet.seq_no = int(data.get("seq_no", 0))
+        packet.data = data.get("data", "")
+        packet.ts = data.get("ts", time.time())
 
+        return packet, bool(data.get('connect'))
+
+    def websocket_handler(self, session_id, packet):
+        try:
             self.handler_function((packet, packet.ts),
                                   serialized=True, is_ws=True)
 
@@ -46,25 +101,42 @@ class WebsocketStreamingManager:
         except Exception as e:
             logger.warning(f"Failed to set TCP_NODELAY: {e}")
 
+        loop = asyncio.get_running_loop()
+
         try:
             async for message in websocket:
                 try:
-                    data = json.loads(message)
-                    session_id = data.get('session_id')
-
-                    self.session_map[session_id] = websocket
-                    logger.info(f"New WebSocket session started: {session_id}")
-
-                    if 'connect' in data and data['connect']:
-                        return
-
-                    self.websocket_handler(session_id, data)
+                    packet, is_connect = self.build_packet(message)
+                    session_id = packet.session_id
+
+                    if self.session_map.get(session_id) is not websocket:
+                        self.session_map[session_id] = websocket
+                        logger.info(f"New WebSocket session started: {session_id}")
+
+                    if is_connect:
+                        continue
+
+                    # flow control: stop reading this connection while the session has
+                    # too many messages in flight, the client is then held back by TCP
+                    semaphore = self.inflight.get(session_id)
+                    if semaphore is None:
+                        semaphore = self.inflight[session_id] = asyncio.Semaphore(
+                            self.max_inflight_per_session)
+                    await semaphore.acquire()
+
+                    self.dispatcher.dispatch(
+                        session_id, packet,
+                        on_done=lambda s=semaphore: loop.call_soon_threadsafe(s.release))
                 except json.JSONDecodeError:
                     await websocket.send(json.dumps({"error": "Invalid JSON"}))
                 except Exception as e:
                     await websocket.send(json.dumps({"error": str(e)}))
         except ConnectionClosed:
             logger.info(f"WebSocket session closed")
+        finally:
+            for session_id in [s for s, ws in self.session_map.items() if ws is websocket]:
+                del self.session_map[session_id]
+                self.inflight.pop(session_id, None)
 
     async def _start_server(self):
         self.server = await websockets.serve(
@@ -74,10 +146,13 @@ class WebsocketStreamingManager:
         await self.server.wait_closed()
 
     def start(self):
+        self.dispatcher.start()
         self.loop = asyncio.get_event_loop()
         self.loop.create_task(self._start_server())
 
     def start_as_thread(self):
+        self.dispatcher.start()
+
         def run():
             self.loop = asyncio.new_event_loop()
             asyncio.set_event_loop(self.loop)
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+
+from aios_instance.tools import Muxer
+
+
+class Packet:
+    def __init__(self, session_id, seq_no, data="{}"):
+        self.session_id = session_id
+        self.seq_no = seq_no
+        self.data = data
+        self.files = []
+
+
+def test_group_merges_when_complete():
+    muxer = Muxer(2)
+    assert muxer.process_packet(Packet("s", 1, '{"a": 1}')) is None
+    merged = muxer.process_packet(Packet("s", 1, '{"b": 2}'))
+
+    assert json.loads(merged.data) == {"inputs": [{"a": 1}, {"b": 2}]}
+    assert muxer.store == {}
+
+
+def test_late_packet_after_completion_is_dropped():
+    muxer = Muxer(2, eviction_policy="partial")
+    muxer.process_packet(Packet("s", 1))
+    assert muxer.process_packet(Packet("s", 1)) is not None
+
+    # a retried packet must not open a group that later ends as a partial
+    assert muxer.process_packet(Packet("s", 1)) is None
+    assert muxer.store == {}
+    assert muxer.late_packets == 1
+
+
+def test_expired_group_still_completes_with_its_last_packet():
+    muxer = Muxer(2, window_seconds=0.05, eviction_policy="partial")
+    muxer.process_packet(Packet("s", 1))
+    time.sleep(0.1)
+
+    assert muxer.process_packet(Packet("s", 1)) is not None
+    assert muxer.pop_partials() == []
+    assert muxer.evictions == 0
+
+
+def test_capacity_eviction_keeps_newest_group_and_tombstones_oldest():
+    muxer = Muxer(2, window_seconds=0, max_pending=2, eviction_policy="partial")
+    for seq_no in range(3):
+        muxer.process_packet(Packet("s", seq_no))
+
+    assert list(muxer.store) == [("s", 1), ("s", 2)]
+    partials = muxer.pop_partials()
+    assert len(partials) == 1 and partials[0].seq_no == 0
+
+    # the rest of the evicted group arrives late and is dropped, not a second partial
+    assert muxer.process_packet(Packet("s", 0)) is None
+    assert ("s", 0) not in muxer.store
+    assert muxer.pop_partials() == []
+
+
+def test_sweep_expires_idle_groups_without_threads():
+    threads = threading.active_count()
+    muxer = Muxer(3, window_seconds=0.05, eviction_policy="partial")
+    assert threading.active_count() == threads
+    assert muxer.needs_sweep
+
+    muxer.process_packet(Packet("s", 1, '{"a": 1}'))
+    muxer.process_packet(Packet("s", 1, '{"b": 2}'))
+    muxer.sweep()
+    assert muxer.pop_partials() == []
+
+    time.sleep(0.1)
+    muxer.sweep()
+    partials = muxer.pop_partials()
+    assert len(partials) == 1
+    assert json.loads(partials[0].data) == {"inputs": [{"a": 1}, {"b": 2}]}
+    assert muxer.store == {}
+
+
+def test_tombstones_expire_with_the_window():
+    muxer = Muxer(2, window_seconds=0.05)
+    muxer.process_packet(Packet("s", 1))
+    muxer.process_packet(Packet("s", 1))
+    time.sleep(0.1)
+
+    # seq numbers may be reused once the window has passed
+    muxer.process_packet(Packet("s", 1))
+    assert ("s", 1) in muxer.store
@@ -0,0 +1,82 @@
+import json
+import socket
+import time
+import urllib.error
+import urllib.request
+
+from aios_instance.startup import StartupOrchestrator, BootStatusServer
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get(port, path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=2) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"null")
+
+
+def wait_for(fn, timeout=5.0):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            result = fn()
+            if result:
+                return result
+        except OSError:
+            if time.time() > deadline:
+                raise
+        if time.time() > deadline:
+            return None
+        time.sleep(0.05)
+
+
+def test_boot_server_reports_phases_until_stopped():
+    port = free_port()
+    server = BootStatusServer(port)
+    startup = StartupOrchestrator(on_update=server.publish)
+    server.start(startup.report())
+
+    try:
+        status, body = wait_for(lambda: get(port, "/ready"))
+        assert status == 503
+        assert body["success"] is False
+        assert body["data"]["phases"] == {}
+
+        startup.run_step("load_block_data", lambda: time.sleep(0.01))
+        status, body = wait_for(
+            lambda: (lambda r: r if "load_block_data" in r[1]["data"]["phases"] else None)(
+                get(port, "/ready")))
+        assert status == 503
+        assert body["data"]["ready"] is False
+
+        status, body = get(port, "/health")
+        assert status == 503
+        assert body["success"] is False
+    finally:
+        server.stop()
+
+    # the management server can bind the port right away
+    with socket.socket() as s:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind(("0.0.0.0", port))
+
+    # publishing after the stop is a no-op
+    startup.run_step("late", lambda: None)
+    server.stop()
+
+
+def test_orchestrator_report_marks_ready():
+    updates = []
+    startup = StartupOrchestrator(on_update=updates.append)
+    startup.run_parallel({"a": lambda: 1, "b": lambda: 2})
+
+    assert len(updates) == 2
+    assert not startup.is_ready()
+    startup.mark_ready()
+    assert startup.report()["ready"] is True
@@ -0,0 +1,106 @@
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from aios_instance import utils
+from aios_instance.utils import StateDictV3
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(utils.redis, "StrictRedis",
+                        lambda **kwargs: fakeredis.FakeStrictRedis(server=server))
+    return server
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_invalidation_during_read_does_not_cache_stale_value(server):
+    cached = StateDictV3("ns", cache=True)
+    writer = StateDictV3("ns")
+    writer["k"] = 1
+
+    hget = cached.redis_client.hget
+
+    def racing_hget(name, key):
+        raw = hget(name, key)
+        # another instance writes and its invalidation lands before the fill
+        writer["k"] = 2
+        cached._cache_drop([key])
+        return raw
+
+    cached.redis_client.hget = racing_hget
+    assert cached["k"] == 1
+    cached.redis_client.hget = hget
+
+    assert "k" not in cached.cache
+    assert cached["k"] == 2
+
+
+def test_invalidation_during_get_many_does_not_cache_stale_values(server):
+    cached = StateDictV3("ns", cache=True)
+    writer = StateDictV3("ns")
+    writer.set_many({"a": 1, "b": 1})
+
+    hmget = cached.redis_client.hmget
+
+    def racing_hmget(name, keys):
+        raws = hmget(name, keys)
+        writer.set_many({"a": 2, "b": 2})
+        cached._cache_drop(["a", "b"])
+        return raws
+
+    cached.redis_client.hmget = racing_hmget
+    assert cached.get_many(["a", "b"]) == {"a": 1, "b": 1}
+    cached.redis_client.hmget = hmget
+
+    assert cached.get_many(["a", "b"]) == {"a": 2, "b": 2}
+
+
+def test_remote_write_invalidates_cache(server):
+    cached = StateDictV3("ns", cache=True)
+    writer = StateDictV3("ns")
+    writer["k"] = "old"
+
+    # the listener drops everything once subscribed, wait until a read sticks
+    assert wait_for(lambda: cached["k"] == "old" and "k" in cached.cache)
+
+    writer["k"] = "new"
+    assert wait_for(lambda: "k" not in cached.cache)
+    assert cached["k"] == "new"
+
+
+def test_cached_values_are_not_shared(server):
+    cached = StateDictV3("ns", cache=True)
+    cached["k"] = {"items": [1]}
+
+    first = cached["k"]
+    first["items"].append(2)
+    assert cached["k"] == {"items": [1]}
+
+    many = cached.get_many(["k"])
+    many["k"]["items"].append(3)
+    assert cached.get_many(["k"]) == {"k": {"items": [1]}}
+
+
+def test_local_write_replaces_cached_value(server):
+    cached = StateDictV3("ns", cache=True)
+    cached["k"] = [1]
+    assert cached["k"] == [1]
+
+    cached["k"] = [2]
+    assert cached["k"] == [2]
+
+    del cached["k"]
+    with pytest.raises(KeyError):
+        cached["k"]
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import random
+import threading
+import time
+
+from aios_instance.ws import SessionOrderedDispatcher, WebsocketStreamingManager
+
+
+class FakeTransport:
+    def get_extra_info(self, name):
+        return None
+
+
+class FakeWebSocket:
+    def __init__(self, messages, processed, expected):
+        self.transport = FakeTransport()
+        self.messages = messages
+        self.processed = processed
+        self.expected = expected
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    async def __aiter__(self):
+        for message in self.messages:
+            yield message
+        # stay connected until the workers are done so releases reach a live loop
+        while len(self.processed) < self.expected:
+            await asyncio.sleep(0.01)
+
+
+def test_dispatcher_keeps_order_per_session():
+    received = {}
+    lock = threading.Lock()
+    sessions, per_session = 16, 100
+    done = threading.Semaphore(0)
+
+    def handler(session_id, seq_no):
+        time.sleep(random.random() / 10000)
+        with lock:
+            received.setdefault(session_id, []).append(seq_no)
+
+    dispatcher = SessionOrderedDispatcher(handler, num_workers=4)
+    dispatcher.start()
+
+    def produce(session_id):
+        for seq_no in range(per_session):
+            dispatcher.dispatch(session_id, seq_no, on_done=done.release)
+
+    producers = [threading.Thread(target=produce, args=(f"session-{i}",)) for i in range(sessions)]
+    for t in producers:
+        t.start()
+    for t in producers:
+        t.join()
+    for _ in range(sessions * per_session):
+        assert done.acquire(timeout=10)
+
+    assert len(received) == sessions
+    for seq_nos in received.values():
+        assert seq_nos == list(range(per_session))
+
+
+def test_dispatcher_threads_start_lazily():
+    dispatcher = SessionOrderedDispatcher(lambda session_id, packet: None, num_workers=2)
+    assert not dispatcher.started
+
+    dispatcher.start()
+    dispatcher.start()
+    assert dispatcher.started
+
+
+def test_disconnect_cleans_up_sessions():
+    processed = []
+    seen = {}
+    sessions = ["a", "b", "c"]
+    messages = [json.dumps({"session_id": s, "connect": True}) for s in sessions]
+    messages += [json.dumps({"session_id": s, "seq_no": i, "data": "{}"})
+                 for i in range(10) for s in sessions]
+
+    manager = None
+
+    def handler(packet_ts, serialized=False, is_ws=False):
+        packet, _ = packet_ts
+        seen[packet.session_id] = (set(manager.session_map), set(manager.inflight))
+        processed.append((packet.session_id, packet.seq_no))
+
+    manager = WebsocketStreamingManager(handler, num_workers=2, max_inflight_per_session=2)
+    manager.dispatcher.start()
+
+    websocket = FakeWebSocket(messages, processed, expected=len(sessions) * 10)
+    asyncio.run(manager._handle_connection(websocket, "/"))
+
+    assert len(processed) == len(sessions) * 10
+    for session_id in sessions:
+        session_map, inflight = seen[session_id]
+        assert session_id in session_map
+        assert session_id in inflight
+    assert manager.session_map == {}
+    assert manager.inflight == {}
+    assert websocket.sent == []
@@ -1,5 +1,6 @@
 import redis
-from queue import Queue
+import threading
+from queue import Queue, Empty
 import json
 import os
 
@@ -38,9 +39,21 @@ class InputInternalQueue:
     def wait_and_get(self):
         return self.ip.get(block=True)
 
+    def wait_and_drain(self, max_items):
+        # blocks for the first item, then takes whatever else is already queued
+        items = [self.ip.get(block=True)]
+        while len(items) < max_items:
+            try:
+                items.append(self.ip.get_nowait())
+            except Empty:
+                break
+        return items
+
 
 receiver_queue: ReceiverQueue = None
 internal_queue: InputInternalQueue = None
+executor_metrics = None
+metrics_lock = threading.Lock()
 
 
 def init_internal_queue():
@@ -79,3 +92,13 @@ def get_receiver_queue():
 
     except Exception as e:
         return False, str(e)
+
+
+def get_executor_metrics():
+    # one AIOSMetrics per executor process, shared by the listener and the executor
+    global executor_metrics
+    with metrics_lock:
+        if not executor_metrics:
+            from .metrics import AIOSMetrics
+            executor_metrics = AIOSMetrics(os.getenv("BLOCK_ID"))
+        return executor_metrics
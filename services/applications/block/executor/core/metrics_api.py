@@ -1,21 +1,25 @@
 import requests
 import os
+import time
+import logging
+import threading
 
 
 class BlockMetricsClient:
-    def __init__(self, base_url):
+    def __init__(self, base_url, timeout=None):
         self.base_url = base_url.rstrip('/')
+        self.timeout = timeout or float(os.getenv("METRICS_CLIENT_TIMEOUT", 2))
 
     def insert_document(self, document):
         response = requests.post(
-            f"{self.base_url}/block/insert", json=document)
+            f"{self.base_url}/block/insert", json=document, timeout=self.timeout)
         if response.status_code == 200:
             return response.json()["data"]
         raise Exception(response.json().get("data", "Unknown error"))
 
     def update_document(self, node_id, update_fields):
         payload = {"nodeId": node_id, "updateFields": update_fields}
-        response = requests.put(f"{self.base_url}/block/update", json=payload)
+        response = requests.put(f"{self.base_url}/block/update", json=payload, timeout=self.timeout)
         if response.status_code == 200:
             return response.json()["data"]
         raise Exception(response.json().get("data", "Unknown error"))
@@ -23,32 +27,33 @@ class BlockMetricsClient:
     def delete_document(self, node_id):
         payload = {"nodeId": node_id}
         response = requests.delete(
-            f"{self.base_url}/block/delete", json=payload)
+            f"{self.base_url}/block/delete", json=payload, timeout=self.timeout)
         if response.status_code == 200:
             return response.json()["data"]
         raise Exception(response.json().get("data", "Unknown error"))
 
     def get_by_block_id(self, block_id):
-        response = requests.get(f"{self.base_url}/block/{block_id}")
+        response = requests.get(f"{self.base_url}/block/{block_id}", timeout=self.timeout)
         if response.status_code == 200:
             return response.json()["data"]
         raise Exception(response.json().get("data", "Unknown error"))
 
     def query_documents(self, query_filter):
         response = requests.post(
-            f"{self.base_url}/block/query", json=query_filter)
+            f"{self.base_url}/block/query", json=query_filter, timeout=self.timeout)
         if response.status_code == 200:
             return response.json()["data"]
         raise Exception(response.json().get("data", "Unknown error"))
 
 
 class ClusterMetricsClient:
-    def __init__(self, base_url, cluster_id="cluster-123"):
+    def __init__(self, base_url, cluster_id="cluster-123", timeout=None):
         self.base_url = base_url.rstrip('/')
         self.cluster_id = cluster_id
+        self.timeout = timeout or float(os.getenv("METRICS_CLIENT_TIMEOUT", 2))
 
     def get_cluster_metrics(self):
-        response = requests.get(f"{self.base_url}/cluster")
+        response = requests.get(f"{self.base_url}/cluster", timeout=self.timeout)
         if response.status_code == 200:
             return response.json()["data"]
         raise Exception(response.json().get("error", "Unknown error"))
@@ -63,13 +68,125 @@ def get_metrics(block_client, cluster_client, block_id):
     }
 
 
-def get_metrics_collector(block_id):
+class MetricsSnapshotService:
+    # keeps the latest block/cluster metrics in memory, refreshed in the background,
+    # so load balancer policies never wait on the metrics service
+    def __init__(self, block_id, block_client, cluster_client, refresh_interval=5, max_staleness=60, max_backoff=60, metrics=None):
+        self.block_id = block_id
+        self.block_client = block_client
+        self.cluster_client = cluster_client
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.max_backoff = max_backoff
+        self.metrics = metrics
+
+        self.snapshot = {"block_metrics": {}, "cluster_metrics": {}}
+        self.updated_at = 0
+        self.first_refresh = threading.Event()
+        self.refresh_failures = 0
+        self.consecutive_failures = 0
+        self.refresh_lock = threading.Lock()
+        self.wake = threading.Event()
+
+        if self.metrics and "metrics_snapshot_age" not in self.metrics.metrics:
+            self.metrics.register_gauge(
+                "metrics_snapshot_age", "seconds since the load balancer metrics snapshot was refreshed")
+            self.metrics.register_counter(
+                "metrics_snapshot_refresh_failures", "number of failed metrics snapshot refreshes")
+        if self.metrics:
+            # computed when scraped, a value set by the refresher would always read ~0
+            self.metrics.metrics["metrics_snapshot_age"].set_function(self.age)
+
+        threading.Thread(target=self._refresh_loop, daemon=True).start()
+
+    def refresh(self):
+        with self.refresh_lock:
+            try:
+                snapshot = get_metrics(
+                    self.block_client, self.cluster_client, self.block_id)
+                # replaced as a whole, readers never see a partial snapshot
+                self.snapshot = snapshot
+                self.updated_at = time.time()
+                self.consecutive_failures = 0
+                self.first_refresh.set()
+                return True
+            except Exception as e:
+                self.refresh_failures += 1
+                self.consecutive_failures += 1
+                if self.metrics:
+                    self.metrics.increment_counter("metrics_snapshot_refresh_failures")
+                logging.error(f"failed to refresh metrics snapshot: {e}")
+                return False
+
+    def backoff(self):
+        if not self.consecutive_failures:
+            return self.refresh_interval
+        return min(self.refresh_interval * 2 ** min(self.consecutive_failures, 10), self.max_backoff)
+
+    def _refresh_loop(self):
+        while True:
+            # cleared before the refresh so a wake-up raised during it is not lost
+            self.wake.clear()
+            refreshed = self.refresh()
+            if refreshed:
+                self.wake.wait(self.refresh_interval)
+            else:
+                # a failing metrics service is not retried faster than the backoff,
+                # however many callers find the snapshot stale
+                time.sleep(self.backoff())
+
+    def age(self):
+        if not self.updated_at:
+            return float("inf")
+        return time.time() - self.updated_at
+
+    def wait_for_first_refresh(self, timeout):
+        # blocks once at startup so the first packets are not balanced without metrics
+        if not self.first_refresh.wait(timeout):
+            logging.warning(f"no metrics snapshot after {timeout}s, serving without metrics until the first refresh")
+            return False
+        return True
+
+    def get(self):
+        # never refreshes on the caller's thread. Data older than max_staleness is not
+        # served: callers get empty metrics flagged stale and fall back, while the
+        # background refresher is woken to catch up
+        age = self.age()
+        if age > self.max_staleness:
+            self.wake.set()
+            return {"block_metrics": {}, "cluster_metrics": {}, "snapshot_age": age, "stale": True}
+
+        snapshot = self.snapshot
+        return {
+            "block_metrics": snapshot["block_metrics"],
+            "cluster_metrics": snapshot["cluster_metrics"],
+            "snapshot_age": age,
+            "stale": False
+        }
+
+
+def get_metrics_collector(block_id, metrics=None):
 
     base_uri = os.getenv("CLUSTER_METRICS_SERVICE_URL", "http://localhost:5000")
 
     cluster_client = ClusterMetricsClient(base_uri)
     block_client = BlockMetricsClient(base_uri)
 
+    snapshot_service = MetricsSnapshotService(
+        block_id,
+        block_client,
+        cluster_client,
+        refresh_interval=float(os.getenv("METRICS_SNAPSHOT_TTL", 5)),
+        max_staleness=float(os.getenv("METRICS_SNAPSHOT_MAX_STALENESS", 60)),
+        max_backoff=float(os.getenv("METRICS_SNAPSHOT_MAX_BACKOFF", 60)),
+        metrics=metrics
+    )
+
+    snapshot_service.wait_for_first_refresh(
+        float(os.getenv("METRICS_SNAPSHOT_STARTUP_WAIT", 5)))
+
     def collector():
-        return get_metrics(block_client, cluster_client, block_id)
+        return snapshot_service.get()
+    # exposed for callers that need the age without fetching the snapshot
+    collector.snapshot_service = snapshot_service
     return collector
@@ -8,12 +8,13 @@ import random
 
 from .streaming import check_is_streaming_enabled, K8sNodePortManager, get_block_streaming_url
 from .log_stream import K8sPodLogsFetcher
-from .globals import init_internal_queue, init_receiver_queue, get_internal_queue
+from .globals import init_internal_queue, init_receiver_queue, get_internal_queue, get_executor_metrics
 from .block import BlocksDB
 from .policy_sandbox import LocalPolicyEvaluator
 from .server import serve_in_thread
 from .metrics_api import get_metrics_collector
 from .default_policies import LoadBalancerPolicyRule
+from .routing_header import parse_packet
 
 from flask import Flask, request, jsonify
 from threading import Thread
@@ -41,6 +42,34 @@ def load_block_data():
         return False, str(e)
 
 
+def wait_for_redis(host='localhost', port=6379, timeout=15, interval=0.25):
+    deadline = time.time() + timeout
+    client = redis.Redis(host=host, port=port, db=0, password=None)
+    while True:
+        try:
+            client.ping()
+            return True
+        except redis.RedisError as e:
+            if time.time() >= deadline:
+                logging.warning(f"redis at {host}:{port} not reachable after {timeout}s: {e}")
+                return False
+            time.sleep(interval)
+
+
+def policy_capability(evaluator, name):
+    # policies opt in with class attributes on AIOSv1PolicyRule:
+    #   supports_batch = True       -> one load_balance_batch call per dispatch batch
+    #   routing_header_only = True  -> packets are RoutingHeader(session_id, seq_no, ts)
+    #                                  instead of a fully parsed AIOSPacket
+    # Remote evaluators expose no policy object and get neither
+    if evaluator is None:
+        return False
+    policy = getattr(evaluator, "custom_function", None)
+    if policy is None:
+        policy = getattr(getattr(evaluator, "executor", None), "function_class", None)
+    return bool(getattr(policy, name, False))
+
+
 class ConnectionsCache:
     def __init__(self):
         self.connections = {}
@@ -71,9 +100,11 @@ class Executor:
         self.block_id = os.getenv("BLOCK_ID")
         self.connections = ConnectionsCache()
 
-        self.metrics_collector = get_metrics_collector(self.block_id)
+        self.metrics_collector = get_metrics_collector(
+            self.block_id, metrics=get_executor_metrics())
 
-        time.sleep(15)
+        # wait only as long as the local redis actually needs to come up
+        wait_for_redis(timeout=int(os.getenv("REDIS_STARTUP_TIMEOUT", 15)))
 
         init_receiver_queue()
         ret, block_data = load_block_data()
@@ -98,6 +129,15 @@ class Executor:
                 lb_policy_rule_uri, lb_parameters, lb_settings
             )
 
+        self.dispatch_batch_size = int(os.getenv("DISPATCH_BATCH_SIZE", 64))
+        # decided once: only policies declaring supports_batch get load_balance_batch calls
+        self.lb_supports_batch = policy_capability(self.load_balancer, "supports_batch")
+        self.lb_header_only = policy_capability(self.load_balancer, "routing_header_only")
+        self.logger.info(
+            f"load balancer batch support: {self.lb_supports_batch}, header only: {self.lb_header_only}")
+        self.lb_batch_cooldown = float(os.getenv("LB_BATCH_RETRY_COOLDOWN", 30))
+        self.lb_batch_retry_at = 0
+
         self.current_instances = []
         self.instance_listener = redis.Redis(
             host='localhost', port=6379, db=0, password=None)
@@ -122,6 +162,72 @@ class Executor:
             except redis.RedisError as e:
                 self.logger.error(f"Redis error: {e}")
 
+    def select_instances(self, packets):
+        if not self.load_balancer:
+            return ["1"] * len(packets)
+
+        # one policy call for the whole batch when the policy supports it
+        if self.lb_supports_batch and time.time() >= self.lb_batch_retry_at:
+            try:
+                resp = self.load_balancer.execute_policy_rule({
+                    "mode": "load_balance_batch",
+                    "packets": packets,
+                    "instances": self.current_instances
+                })
+
+                if len(resp['instance_ids']) != len(packets):
+                    raise Exception(
+                        f"policy returned {len(resp['instance_ids'])} instance_ids for {len(packets)} packets")
+                return resp['instance_ids']
+            except Exception as e:
+                # transient failures fall back for a while, batching is retried after the cooldown
+                self.logger.error(
+                    f"batch load balancing failed, using per-packet calls for {self.lb_batch_cooldown}s: {e}")
+                self.lb_batch_retry_at = time.time() + self.lb_batch_cooldown
+
+        instance_ids = []
+        for packet in packets:
+            try:
+                resp = self.load_balancer.execute_policy_rule({
+                    "mode": "load_balance",
+                    "packet": packet,
+                    "instances": self.current_instances
+                })
+                instance_ids.append(resp['instance_id'])
+            except Exception as e:
+                self.logger.error(f"failed to process frame: {e}")
+                instance_ids.append(None)
+
+        return instance_ids
+
+    def policy_packets(self, batch):
+        # the listener only decodes the routing header, policies that did not declare
+        # routing_header_only get the full AIOSPacket they were written against
+        if not self.load_balancer or self.lb_header_only:
+            return [data['packet'] for data in batch]
+        return [parse_packet(data['raw']) for data in batch]
+
+    def dispatch(self, batch, ip_queue):
+        packets = self.policy_packets(batch)
+        instance_ids = self.select_instances(packets)
+
+        groups = {}
+        for instance_id, data in zip(instance_ids, batch):
+            if instance_id is None:
+                continue
+            groups.setdefault(instance_id, []).append(data['raw'])
+
+        for target_instance, raws in groups.items():
+            try:
+                connection = self.connections.get_connection(target_instance)
+                # LPUSH of several values keeps arrival order for the consumer's BRPOP
+                pipe = connection.pipeline(transaction=False)
+                pipe.lpush(ip_queue, *raws)
+                pipe.execute()
+            except Exception as e:
+                self.logger.error(
+                    f"failed to push {len(raws)} frames to instance {target_instance}: {e}")
+
     def process_adhoc_jobs(self):
 
         _, queue = get_internal_queue()
@@ -130,27 +236,8 @@ class Executor:
         while True:
             try:
 
-                data = queue.wait_and_get()
-                packet = data['packet']
-                raw = data['raw']
-
-                # use load balancer to select the target instance:
-                if self.load_balancer:
-                    resp = self.load_balancer.execute_policy_rule({
-                        "mode": "load_balance",
-                        "packet": packet,
-                        "instances": self.current_instances
-                    })
-
-                    target_instance = resp['instance_id']
-                    connection = self.connections.get_connection(
-                        target_instance)
-                    connection.lpush(ip_queue, raw)
-                else:
-                    target_instance = "1"
-                    connection = self.connections.get_connection(
-                        target_instance)
-                    connection.lpush(ip_queue, raw)
+                batch = queue.wait_and_drain(self.dispatch_batch_size)
+                self.dispatch(batch, ip_queue)
 
             except Exception as e:
                 self.logger.error(f"failed to process frame: {e}")
@@ -0,0 +1,104 @@
+import struct
+from collections import namedtuple
+
+from .aios_packet_pb2 import AIOSPacket
+
+# AIOSPacket field numbers used for routing
+SESSION_ID_FIELD = 1
+SEQ_NO_FIELD = 2
+TS_FIELD = 5
+
+WIRE_VARINT = 0
+WIRE_I64 = 1
+WIRE_LEN = 2
+WIRE_I32 = 5
+
+DOUBLE = struct.Struct("<d")
+
+
+def _read_varint(buf, pos):
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise ValueError("truncated varint")
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+        if shift >= 64:
+            raise ValueError("varint too long")
+
+
+def read_routing_header(raw):
+    # walks the protobuf wire format of an AIOSPacket and decodes only
+    # session_id, seq_no and ts; data, output_ptr and files are skipped by
+    # length, so the cost does not depend on the payload size
+    buf = memoryview(raw)
+    pos = 0
+    end = len(buf)
+
+    header = {"session_id": "", "seq_no": 0, "ts": 0.0}
+
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 0x07
+
+        if wire_type == WIRE_VARINT:
+            value, pos = _read_varint(buf, pos)
+            if field == SEQ_NO_FIELD:
+                header["seq_no"] = value
+        elif wire_type == WIRE_I64:
+            if field == TS_FIELD:
+                header["ts"] = DOUBLE.unpack_from(buf, pos)[0]
+            pos += 8
+        elif wire_type == WIRE_LEN:
+            length, pos = _read_varint(buf, pos)
+            if field == SESSION_ID_FIELD:
+                header["session_id"] = bytes(buf[pos:pos + length]).decode("utf-8")
+            pos += length
+        elif wire_type == WIRE_I32:
+            pos += 4
+        else:
+            raise ValueError(f"unsupported wire type {wire_type}")
+
+        if pos > end:
+            raise ValueError("truncated packet")
+
+    return header
+
+
+def check_routing_header():
+    # the field numbers above are hand-copied from aios_packet.proto, fail at
+    # import rather than route on a wrong ts/seq_no if the schema drifts
+    fields = AIOSPacket.DESCRIPTOR.fields_by_name
+    for name, number in (("session_id", SESSION_ID_FIELD), ("seq_no", SEQ_NO_FIELD), ("ts", TS_FIELD)):
+        if fields[name].number != number:
+            raise RuntimeError(
+                f"routing header expects {name} as field {number}, AIOSPacket has {fields[name].number}")
+
+    packet = AIOSPacket(session_id="check", seq_no=7, data="x", ts=1.5, output_ptr="{}")
+    header = read_routing_header(packet.SerializeToString())
+    if header != {"session_id": "check", "seq_no": 7, "ts": 1.5}:
+        raise RuntimeError(f"routing header does not round-trip AIOSPacket: {header}")
+
+
+check_routing_header()
+
+
+# what header-only load balancer policies receive instead of an AIOSPacket: the
+# routing fields and nothing else, immutable so a policy cannot expect its
+# changes to reach the forwarded bytes
+RoutingHeader = namedtuple("RoutingHeader", ["session_id", "seq_no", "ts"])
+
+
+def parse_routing_header(raw):
+    return RoutingHeader(**read_routing_header(raw))
+
+
+def parse_packet(raw):
+    packet = AIOSPacket()
+    packet.ParseFromString(raw)
+    return packet
@@ -4,10 +4,9 @@ import threading
 import logging
 
 
-from .aios_packet_pb2 import AIOSPacket
-from .globals import get_receiver_queue, get_internal_queue
+from .routing_header import parse_routing_header
+from .globals import get_receiver_queue, get_internal_queue, get_executor_metrics
 from .redis_cache import RedisConnectionCache
-from .metrics import AIOSMetrics
 
 
 logging.basicConfig(level=logging.INFO)
@@ -22,7 +21,7 @@ class RedisListener:
         self.redis_cache = RedisConnectionCache()
         self.redis_client = self.redis_cache.get(
             self.redis_host, self.redis_port)
-        self.metrics = AIOSMetrics(os.getenv("BLOCK_ID"))
+        self.metrics = get_executor_metrics()
 
         self.metrics.register_counter(
             "tasks_processed", "number of tasks processed by the inference server")
@@ -38,8 +37,8 @@ class RedisListener:
 
                 st = time.time()
 
-                packet = AIOSPacket()
-                packet.ParseFromString(job_data)
+                # only the routing header is decoded, the raw bytes are forwarded unchanged
+                packet = parse_routing_header(job_data)
 
                 ret, internal_queue = get_internal_queue()
                 if not ret:
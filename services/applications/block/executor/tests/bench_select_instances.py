@@ -0,0 +1,38 @@
+# python -m tests.bench_select_instances
+# compares per-packet and batch load balancer calls for one dispatch batch
+import time
+
+from tests.test_select_instances import BatchPolicy, PerPacketPolicy, make_executor, packets
+
+
+class SlowEvaluator:
+    # models the fixed cost of one policy call: logging, sandbox dispatch, metrics lookup
+    def __init__(self, evaluator, call_cost):
+        self.evaluator = evaluator
+        self.custom_function = evaluator.custom_function
+        self.call_cost = call_cost
+
+    def execute_policy_rule(self, input_data):
+        deadline = time.perf_counter() + self.call_cost
+        while time.perf_counter() < deadline:
+            pass
+        return self.evaluator.execute_policy_rule(input_data)
+
+
+def run(policy, batch_size, rounds, call_cost):
+    executor = make_executor(policy)
+    executor.load_balancer = SlowEvaluator(executor.load_balancer, call_cost)
+    batch = packets(batch_size)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        executor.select_instances(batch)
+    elapsed = time.perf_counter() - start
+    return batch_size * rounds / elapsed, len(policy.modes) / rounds
+
+
+if __name__ == "__main__":
+    for batch_size in (1, 16, 64):
+        for name, policy in (("per-packet", PerPacketPolicy()), ("batch", BatchPolicy())):
+            rate, calls = run(policy, batch_size, rounds=200, call_cost=20e-6)
+            print(f"{name:>10} batch={batch_size:<3} {rate:>10.0f} packets/s {calls:>5.1f} policy calls/batch")
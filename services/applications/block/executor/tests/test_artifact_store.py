@@ -0,0 +1,171 @@
+import io
+import time
+import tarfile
+import zipfile
+import threading
+import multiprocessing
+from pathlib import Path
+from http.server import HTTPServer, ThreadingHTTPServer, SimpleHTTPRequestHandler, BaseHTTPRequestHandler
+from functools import partial
+
+import pytest
+import requests
+
+from core.policy_sandbox.artifact_store import PolicyArtifactStore
+
+
+def make_archive(path: Path, files: dict):
+    with tarfile.open(path, "w:gz") as tar:
+        for name, content in files.items():
+            data = content.encode()
+            info = tarfile.TarInfo(f"code/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return path
+
+
+def make_wheel(wheel_dir: Path, name="tinydep", version="1.0"):
+    # a minimal pure-python wheel, pip installs it without an index
+    wheel_dir.mkdir(parents=True, exist_ok=True)
+    dist_info = f"{name}-{version}.dist-info"
+    path = wheel_dir / f"{name}-{version}-py3-none-any.whl"
+    with zipfile.ZipFile(path, "w") as whl:
+        whl.writestr(f"{name}/__init__.py", "VALUE = 42\n")
+        whl.writestr(f"{dist_info}/METADATA", f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+        whl.writestr(f"{dist_info}/WHEEL", "Wheel-Version: 1.0\nGenerator: test\nRoot-Is-Purelib: true\nTag: py3-none-any\n")
+        whl.writestr(f"{dist_info}/RECORD", "")
+    return path
+
+
+@pytest.fixture
+def served_dir(tmp_path):
+    # serves tmp_path/www over http on a local port
+    www = tmp_path / "www"
+    www.mkdir()
+    server = HTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=str(www)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield www, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class StallingHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "1000000")
+        self.end_headers()
+        self.wfile.write(b"x")
+        self.wfile.flush()
+        time.sleep(5)
+
+    def log_message(self, *args):
+        pass
+
+
+def store_at(tmp_path, **kwargs):
+    kwargs.setdefault("grace_period", 0)
+    return PolicyArtifactStore(root=str(tmp_path / "store"), **kwargs)
+
+
+def test_second_prepare_reuses_the_stored_entry(tmp_path, served_dir):
+    www, base_url = served_dir
+    make_archive(www / "policy.tar.gz", {"function.py": "X = 1\n"})
+    store = store_at(tmp_path, url_ttl=60)
+
+    first = store.prepare(f"{base_url}/policy.tar.gz")
+    (www / "policy.tar.gz").unlink()
+    second = store.prepare(f"{base_url}/policy.tar.gz")
+
+    assert second.archive_hash == first.archive_hash
+    assert (second.code_dir / "function.py").read_text() == "X = 1\n"
+    first.release()
+    second.release()
+
+
+def test_dependencies_install_from_an_offline_wheel_directory(tmp_path, monkeypatch):
+    wheels = tmp_path / "wheels"
+    make_wheel(wheels)
+    monkeypatch.setenv("PIP_NO_INDEX", "1")
+    monkeypatch.setenv("PIP_FIND_LINKS", str(wheels))
+    archive = make_archive(tmp_path / "policy.tar.gz", {
+        "function.py": "X = 1\n", "requirements.txt": "tinydep==1.0\n"})
+    store = store_at(tmp_path)
+
+    artifact = store.prepare(str(archive))
+    assert (artifact.deps_dir / "tinydep" / "__init__.py").exists()
+
+    start = time.time()
+    again = store.prepare(str(archive))
+    assert again.deps_dir == artifact.deps_dir
+    assert time.time() - start < 1
+    artifact.release()
+    again.release()
+
+
+def test_pinned_artifacts_are_not_evicted(tmp_path):
+    store = store_at(tmp_path, max_bytes=1)
+    pinned = store.prepare(str(make_archive(tmp_path / "a.tar.gz", {"function.py": "A = 1\n"})))
+    other = store.prepare(str(make_archive(tmp_path / "b.tar.gz", {"function.py": "B = 1\n"})))
+
+    # both are over the budget, both are still loaded
+    store.evict()
+    assert pinned.code_dir.exists() and other.code_dir.exists()
+
+    other.release()
+    store.evict()
+    assert pinned.code_dir.exists()
+    assert not other.code_dir.exists()
+
+    pinned.release()
+    store.evict()
+    assert not pinned.code_dir.exists()
+
+
+def _hold_pin(root, archive, ready, done):
+    artifact = PolicyArtifactStore(root=root, grace_period=0).prepare(archive)
+    ready.set()
+    done.wait(10)
+    artifact.release()
+
+
+def test_pins_of_other_processes_block_eviction(tmp_path):
+    archive = str(make_archive(tmp_path / "a.tar.gz", {"function.py": "A = 1\n"}))
+    store = store_at(tmp_path, max_bytes=1)
+
+    ctx = multiprocessing.get_context("fork")
+    ready, done = ctx.Event(), ctx.Event()
+    holder = ctx.Process(target=_hold_pin, args=(str(store.root), archive, ready, done))
+    holder.start()
+    try:
+        assert ready.wait(10)
+        store.evict()
+        assert store.stats()["entries"] == 1
+    finally:
+        done.set()
+        holder.join(10)
+
+    store.evict()
+    assert store.stats()["entries"] == 0
+
+    # an evicted artifact is rebuilt by the next prepare
+    artifact = store.prepare(archive)
+    assert (artifact.code_dir / "function.py").exists()
+    artifact.release()
+
+
+def test_stalled_download_times_out(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StallingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    store = store_at(tmp_path, download_timeout=0.3)
+
+    start = time.time()
+    with pytest.raises(requests.exceptions.RequestException):
+        store.prepare(f"http://127.0.0.1:{server.server_address[1]}/policy.tar.gz")
+    assert time.time() - start < 3
+    assert list((store.root / "downloads").iterdir()) == []
+    server.shutdown()
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from core.metrics_api import MetricsSnapshotService
+
+
+class FakeBlockClient:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.delay = 0
+
+    def get_by_block_id(self, block_id):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise Exception("metrics service down")
+        return {"block_id": block_id, "calls": self.calls}
+
+
+class FakeClusterClient:
+    def get_cluster_metrics(self):
+        return {"nodes": 1}
+
+
+def test_first_refresh_is_awaited_once():
+    block_client = FakeBlockClient()
+    block_client.delay = 0.1
+    service = MetricsSnapshotService("b", block_client, FakeClusterClient(), refresh_interval=60)
+
+    # before the first refresh nothing is served as fresh
+    assert service.get()["stale"] is True
+    assert service.get()["block_metrics"] == {}
+
+    assert service.wait_for_first_refresh(5)
+    snapshot = service.get()
+    assert snapshot["stale"] is False
+    assert snapshot["block_metrics"]["block_id"] == "b"
+    assert snapshot["snapshot_age"] < 5
+
+
+def test_first_refresh_wait_times_out():
+    block_client = FakeBlockClient()
+    block_client.fail = True
+    service = MetricsSnapshotService("b", block_client, FakeClusterClient(), refresh_interval=60)
+
+    start = time.time()
+    assert service.wait_for_first_refresh(0.2) is False
+    assert time.time() - start < 2
+
+
+def test_snapshot_older_than_bound_is_not_served():
+    block_client = FakeBlockClient()
+    service = MetricsSnapshotService(
+        "b", block_client, FakeClusterClient(), refresh_interval=60, max_staleness=0.2)
+    assert service.wait_for_first_refresh(5)
+    assert service.get()["stale"] is False
+
+    block_client.fail = True
+    time.sleep(0.3)
+
+    snapshot = service.get()
+    assert snapshot["stale"] is True
+    assert snapshot["snapshot_age"] > 0.2
+    assert snapshot["block_metrics"] == {}
+    # the refresher was woken rather than the caller refreshing inline
+    assert service.wake.is_set() or block_client.calls > 1
+
+
+def test_get_never_blocks_on_refresh():
+    block_client = FakeBlockClient()
+    service = MetricsSnapshotService(
+        "b", block_client, FakeClusterClient(), refresh_interval=0.05, max_staleness=60)
+    assert service.wait_for_first_refresh(5)
+
+    block_client.delay = 1
+    time.sleep(0.1)
+    start = time.time()
+    for _ in range(1000):
+        service.get()
+    assert time.time() - start < 0.5
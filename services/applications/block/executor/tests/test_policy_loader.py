@@ -0,0 +1,86 @@
+import sys
+
+import pytest
+
+from core.policy_sandbox import code_executor, policy_loader
+from core.policy_sandbox.artifact_store import PolicyArtifactStore
+from core.policy_sandbox.code_executor import LocalCodeExecutor
+
+FUNCTION = '''
+from helpers import scale
+from helpers.units import UNIT
+import helpers.state
+
+class AIOSv1PolicyRule:
+    def __init__(self, rule_id, settings, parameters):
+        helpers.state.FACTOR = parameters["factor"]
+
+    def eval(self, parameters, input_data, context):
+        return {"value": scale.apply(input_data["value"]), "unit": UNIT}
+'''
+
+FILES = {
+    "function.py": FUNCTION,
+    "helpers/__init__.py": "",
+    "helpers/state.py": "FACTOR = None\n",
+    "helpers/scale.py": "from . import state\n\ndef apply(value):\n    return value * state.FACTOR\n",
+    "helpers/units.py": "UNIT = 'ms'\n",
+}
+
+
+@pytest.fixture
+def policy_dir(tmp_path, monkeypatch):
+    code = tmp_path / "policy" / "code"
+    for name, content in FILES.items():
+        (code / name).parent.mkdir(parents=True, exist_ok=True)
+        (code / name).write_text(content)
+
+    store = PolicyArtifactStore(root=str(tmp_path / "store"))
+    monkeypatch.setattr(code_executor, "get_artifact_store", lambda: store)
+    return str(code)
+
+
+def evaluator(path, factor):
+    executor = LocalCodeExecutor(path, {}, {"factor": factor})
+    executor.init()
+    return executor
+
+
+def test_parameterisations_of_one_archive_are_isolated(policy_dir):
+    double = evaluator(policy_dir, 2)
+    triple = evaluator(policy_dir, 3)
+
+    try:
+        assert double.namespace != triple.namespace
+        assert double.artifact.archive_hash == triple.artifact.archive_hash
+        # each evaluator keeps its own module-level state
+        assert double.execute({"value": 5}) == {"value": 10, "unit": "ms"}
+        assert triple.execute({"value": 5}) == {"value": 15, "unit": "ms"}
+        assert double.execute({"value": 1})["value"] == 2
+    finally:
+        double.unload()
+        triple.unload()
+
+    assert double.namespace is None
+    assert not [name for name in sys.modules if name.startswith(policy_loader.NAMESPACE_PREFIX)]
+
+
+def test_from_import_loads_submodules(policy_dir):
+    executor = evaluator(policy_dir, 1)
+    try:
+        namespace = executor.namespace
+        assert f"{namespace}.helpers.scale" in sys.modules
+        assert f"{namespace}.helpers.units" in sys.modules
+        # the policy's package never leaks into the global module names
+        assert "helpers" not in sys.modules
+    finally:
+        executor.unload()
+
+
+def test_missing_name_in_from_import_raises_import_error(policy_dir, tmp_path):
+    function_file = tmp_path / "policy" / "code" / "function.py"
+    function_file.write_text("from helpers import nothing_here\n")
+
+    with pytest.raises(ImportError):
+        evaluator(policy_dir, 1)
+    assert policy_loader.loaded_policies() == {}
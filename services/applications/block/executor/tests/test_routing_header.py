@@ -0,0 +1,86 @@
+import logging
+import random
+
+import pytest
+
+from core.aios_packet_pb2 import AIOSPacket, FileInfo
+from core.processor import Executor
+from core.routing_header import RoutingHeader, parse_packet, parse_routing_header, read_routing_header
+
+
+def random_packet(rng):
+    packet = AIOSPacket()
+    if rng.random() < 0.8:
+        packet.session_id = rng.choice(["", "s", "session-é-✓", "x" * 300])
+    if rng.random() < 0.8:
+        packet.seq_no = rng.choice([0, 1, 127, 128, 2 ** 32, 2 ** 64 - 1])
+    if rng.random() < 0.8:
+        packet.ts = rng.choice([0.0, 1.5, -3.25, 1.7e9 + rng.random()])
+    if rng.random() < 0.5:
+        packet.data = "d" * rng.choice([0, 1, 200, 70000])
+    if rng.random() < 0.5:
+        packet.output_ptr = '{"is_graph": false}'
+    for _ in range(rng.choice([0, 0, 1, 3])):
+        packet.files.append(FileInfo(metadata="{}", file_data=bytes(rng.randrange(256) for _ in range(50))))
+    return packet
+
+
+def test_header_parse_matches_full_parse():
+    rng = random.Random(7)
+    for _ in range(500):
+        raw = random_packet(rng).SerializeToString()
+        full = parse_packet(raw)
+        header = parse_routing_header(raw)
+        assert header == RoutingHeader(full.session_id, full.seq_no, full.ts)
+
+
+def test_truncated_packet_is_rejected():
+    raw = AIOSPacket(session_id="abc", seq_no=1, data="payload").SerializeToString()
+    with pytest.raises(ValueError):
+        read_routing_header(raw[:-2])
+
+
+def test_header_is_header_only():
+    header = parse_routing_header(AIOSPacket(session_id="s", data="x").SerializeToString())
+    with pytest.raises(AttributeError):
+        header.data
+    with pytest.raises(AttributeError):
+        header.session_id = "other"
+
+
+class Policy:
+    def eval(self, parameters, input_data, context):
+        return {"instance_id": "1"}
+
+
+class HeaderOnlyPolicy(Policy):
+    routing_header_only = True
+
+
+class Evaluator:
+    def __init__(self, policy):
+        self.custom_function = policy
+
+
+def make_executor(policy, header_only):
+    executor = Executor.__new__(Executor)
+    executor.logger = logging.getLogger("test")
+    executor.load_balancer = Evaluator(policy)
+    executor.lb_header_only = header_only
+    return executor
+
+
+def batch_of(*packets):
+    return [{"packet": parse_routing_header(raw), "raw": raw}
+            for raw in (p.SerializeToString() for p in packets)]
+
+
+def test_policies_get_full_packets_unless_header_only():
+    batch = batch_of(AIOSPacket(session_id="a", seq_no=1, data='{"x": 1}'))
+
+    packets = make_executor(Policy(), header_only=False).policy_packets(batch)
+    assert isinstance(packets[0], AIOSPacket)
+    assert packets[0].data == '{"x": 1}'
+
+    packets = make_executor(HeaderOnlyPolicy(), header_only=True).policy_packets(batch)
+    assert packets[0] == RoutingHeader("a", 1, 0.0)
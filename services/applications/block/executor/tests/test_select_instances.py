@@ -0,0 +1,102 @@
+from core.processor import Executor, policy_capability
+import logging
+
+
+class PerPacketPolicy:
+    def __init__(self):
+        self.modes = []
+
+    def eval(self, parameters, input_data, context):
+        self.modes.append(input_data["mode"])
+        if input_data["mode"] != "load_balance":
+            # the usual shape of a policy that knows nothing about batches
+            return input_data["packet"]["missing"]
+        return {"instance_id": input_data["packet"]["target"]}
+
+
+class BatchPolicy(PerPacketPolicy):
+    supports_batch = True
+
+    def __init__(self):
+        super().__init__()
+        self.fail_batch = False
+
+    def eval(self, parameters, input_data, context):
+        if input_data["mode"] == "load_balance_batch":
+            self.modes.append(input_data["mode"])
+            if self.fail_batch:
+                raise TimeoutError("metrics service timed out")
+            return {"instance_ids": [p["target"] for p in input_data["packets"]]}
+        return super().eval(parameters, input_data, context)
+
+
+class Evaluator:
+    def __init__(self, policy):
+        self.custom_function = policy
+
+    def execute_policy_rule(self, input_data):
+        return self.custom_function.eval({}, input_data, None)
+
+
+def make_executor(policy):
+    executor = Executor.__new__(Executor)
+    executor.logger = logging.getLogger("test")
+    executor.load_balancer = Evaluator(policy)
+    executor.lb_supports_batch = policy_capability(executor.load_balancer, "supports_batch")
+    executor.lb_batch_cooldown = 30
+    executor.lb_batch_retry_at = 0
+    executor.current_instances = ["1", "2"]
+    return executor
+
+
+def packets(n):
+    return [{"target": str(i % 2 + 1)} for i in range(n)]
+
+
+def test_capability_is_read_from_the_policy():
+    assert policy_capability(Evaluator(BatchPolicy()), "supports_batch")
+    assert not policy_capability(Evaluator(PerPacketPolicy()), "supports_batch")
+    assert not policy_capability(None, "supports_batch")
+
+    class RemoteEvaluator:
+        executor = None
+    assert not policy_capability(RemoteEvaluator(), "supports_batch")
+
+
+def test_policy_without_batch_support_is_never_called_in_batch_mode():
+    policy = PerPacketPolicy()
+    executor = make_executor(policy)
+
+    for _ in range(3):
+        executor.lb_batch_retry_at = 0  # a cooldown expiring must not re-probe
+        assert executor.select_instances(packets(4)) == ["1", "2", "1", "2"]
+
+    assert set(policy.modes) == {"load_balance"}
+
+
+def test_batch_policy_gets_one_call_per_batch():
+    policy = BatchPolicy()
+    executor = make_executor(policy)
+
+    assert executor.select_instances(packets(64)) == [str(i % 2 + 1) for i in range(64)]
+    assert policy.modes == ["load_balance_batch"]
+
+
+def test_batch_failure_falls_back_until_cooldown():
+    policy = BatchPolicy()
+    policy.fail_batch = True
+    executor = make_executor(policy)
+
+    assert executor.select_instances(packets(2)) == ["1", "2"]
+    assert policy.modes == ["load_balance_batch", "load_balance", "load_balance"]
+    assert executor.lb_supports_batch
+
+    policy.modes.clear()
+    executor.select_instances(packets(2))
+    assert "load_balance_batch" not in policy.modes
+
+    policy.fail_batch = False
+    executor.lb_batch_retry_at = 0
+    policy.modes.clear()
+    executor.select_instances(packets(2))
+    assert policy.modes == ["load_balance_batch"]
@@ -80,6 +80,8 @@ class AdhocInferenceClient:
     def __init__(self, server_address='localhost:50051'):
         self.server_address = server_address
         self.connections_manager = AdhocInferenceConnectionsManager()
+        self.aio_channel = None
+        self.aio_stub = None
 
     def infer(self, session_id, request, timeout=10, wait_for_ready=True):
         stub = self.connections_manager.get_connection(session_id, self.server_address)
@@ -98,3 +100,39 @@ class AdhocInferenceClient:
             self.connections_manager.reestablish_connection(session_id, self.server_address)
 
         return None
+
+    def infer_stream(self, session_id, request, wait_for_ready=True):
+        stub = self.connections_manager.get_connection(session_id, self.server_address)
+        if not stub:
+            raise Exception(f"No valid connection available for session {session_id}")
+
+        try:
+            for response in stub.infer_stream(request, wait_for_ready=wait_for_ready):
+                yield response
+        except grpc.RpcError as e:
+            logging.error(f"gRPC error during stream inference: {e.code()} - {e.details()}", exc_info=True)
+            self.connections_manager.reestablish_connection(session_id, self.server_address)
+            raise
+
+    def _get_aio_stub(self):
+        # the aio channel is bound to the serving event loop, create it lazily there
+        if self.aio_stub is None:
+            self.aio_channel = grpc.aio.insecure_channel(self.server_address)
+            self.aio_stub = adhoc_service_pb2_grpc.BlockInferenceServiceStub(self.aio_channel)
+        return self.aio_stub
+
+    async def infer_async(self, request, timeout=None, wait_for_ready=True):
+        try:
+            return await self._get_aio_stub().infer(
+                request, timeout=timeout, wait_for_ready=wait_for_ready)
+        except grpc.RpcError as e:
+            logging.error(f"gRPC error during inference: {e.code()} - {e.details()}", exc_info=True)
+        except Exception as e:
+            logging.error(f"Unexpected error during inference: {str(e)}", exc_info=True)
+
+        return None
+
+    async def infer_stream_async(self, request, wait_for_ready=True):
+        call = self._get_aio_stub().infer_stream(request, wait_for_ready=wait_for_ready)
+        async for response in call:
+            yield response
@@ -1,7 +1,10 @@
 import grpc
+import os
+import asyncio
 import logging
 import json
 import uuid
+import threading
 from concurrent import futures
 import time
 from threading import Thread
@@ -13,7 +16,7 @@ from .adhoc_inference_server_client import AdhocInferenceClient
 from .system import vDAGAPIServer
 
 from .env import Env
-from .system import vDAG, block_to_vdag, vdag_to_block
+from .system import vDAG, block_to_vdag, routed_vdag_to_block
 
 from .health_checker import HealthChecker
 from .quality_checker import QualityChecker, QualityCheckerManagementServer
@@ -38,13 +41,19 @@ class vDAGInferenceServiceServicer(vdag_service_pb2_grpc.vDAGInferenceServiceSer
         self.metrics.register_counter("inference_requests_total", "Total inference requests processed")
         self.metrics.register_gauge("inference_fps", "Frames per second (FPS) of inference")
         self.metrics.register_gauge("inference_latency_seconds", "Current latency per inference request")
+        self.metrics.register_counter("inference_requests_rejected", "Requests rejected by the vDAG concurrency limit")
+
+        # per vDAG limit, set through the custom init data or the environment
+        self.limiter = ConcurrencyLimiter(int(self.env.vdag_custom_init_data.get(
+            "maxConcurrentRequests", os.getenv("VDAG_MAX_CONCURRENT_REQUESTS", 0))))
 
         self.vdag_api = vDAGAPIServer(self.vdag)
 
         # prepare all policies
         self.quota_checker = QuotaManager(self.vdag.vdag_data, self.env.vdag_custom_init_data)
         self.quality_checker = QualityChecker(self.vdag.vdag_data, self.env.vdag_custom_init_data)
-        self.health_checker = HealthChecker(self.vdag.vdag_data, self.vdag_api.app, self.env.vdag_custom_init_data)
+        self.health_checker = HealthChecker(
+            self.vdag.vdag_data, self.vdag_api.app, self.env.vdag_custom_init_data, metrics=self.metrics)
 
         # quota checker APIs:
         self.quota_checker_apis = QuotaManagerAPIServer(
@@ -61,6 +70,8 @@ class vDAGInferenceServiceServicer(vdag_service_pb2_grpc.vDAGInferenceServiceSer
         self.vdag_serialized_l3_graph = json.dumps(self.vdag.get_l3_graph())
         self.vdag_serialized_l2_graph = json.dumps(self.vdag.get_graph_format())
         self.head = self.vdag.head_block_id
+        # resolve the block route up front, requests only read the cached one
+        self.vdag.block_route()
 
         self.adhoc_inference_client = AdhocInferenceClient(
             self.env.adhoc_inference_server_uri
@@ -120,6 +131,13 @@ class vDAGInferenceServiceServicer(vdag_service_pb2_grpc.vDAGInferenceServiceSer
                         files=None
                     )
 
+                    if body.get("stream", False):
+                        return Response(
+                            self._chat_completion_events(request_packet),
+                            mimetype="text/event-stream",
+                            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+                        )
+
                     response = self.infer_no_ctx(request_packet)
 
                     return jsonify({
@@ -296,94 +314,162 @@ class vDAGInferenceServiceServicer(vdag_service_pb2_grpc.vDAGInferenceServiceSer
         except Exception as e:
             raise e
 
-    def infer_no_ctx(self, request):
+    def _chat_completion_events(self, request_packet):
+        # OpenAI compatible SSE stream, partial outputs carry {"partial": true, "delta": "..."}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        def chunk(delta, finish_reason=None):
+            return "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }) + "\n\n"
+
+        yield chunk({"role": "assistant"})
+
+        streamed = False
         try:
+            for response in self.infer_stream_no_ctx(request_packet):
+                data = response.data
+                parsed = None
+                if data.startswith('{'):
+                    try:
+                        parsed = json.loads(data)
+                    except Exception:
+                        parsed = None
+
+                # delta.content is always a string for OpenAI clients
+                if isinstance(parsed, dict) and parsed.get("partial") is True:
+                    streamed = True
+                    delta = parsed.get("delta", "")
+                    yield chunk({"content": delta if isinstance(delta, str) else json.dumps(delta)})
+                    continue
 
-            if not self.quota_checker.check_quota(request.session_id, request):
-                return vdag_service_pb2.vDAGInferencePacket(
-                    session_id=request.session_id,
-                    data=json.dumps({"success": False, "message": "quota management policy did not allow this request"})
-                )
+                # final output, only sent as content when nothing was streamed
+                if not streamed:
+                    yield chunk({"content": data})
+                yield chunk({}, finish_reason="stop")
+
+        except Exception as e:
+            logging.error(f"Error streaming chat completion: {str(e)}", exc_info=True)
+            yield "data: " + json.dumps({"error": {"message": str(e), "type": "internal_error"}}) + "\n\n"
+
+        yield "data: [DONE]\n\n"
+
+    def _reject(self, request, message):
+        return vdag_service_pb2.vDAGInferencePacket(
+            session_id=request.session_id,
+            data=json.dumps({"success": False, "message": message})
+        )
 
-            # check for health:
-            if not self.health_checker.is_healthy_fast_check():
-                return vdag_service_pb2.vDAGInferencePacket(
-                    session_id=request.session_id,
-                    data=json.dumps({"success": False, "message": "one or more blocks of the vDAG is not healthy at the moment"})
-                )
+    def _admit(self, request):
+        if not self.quota_checker.check_quota(request.session_id, request):
+            return self._reject(request, "quota management policy did not allow this request")
 
+        # check for health:
+        if not self.health_checker.is_healthy_fast_check():
+            return self._reject(request, "one or more blocks of the vDAG is not healthy at the moment")
+
+        return None
+
+    def _record(self, request, vdag_response, start_time):
+        # Record metrics
+        self.metrics.increment_counter("inference_requests_total")
+        latency = time.time() - start_time  # Calculate latency
+        self.metrics.set_gauge("inference_latency_seconds", latency)  # Update latest latency
+
+        # Estimate FPS (assuming one request = one frame)
+        fps = 1 / latency if latency > 0 else 0
+        self.metrics.set_gauge("inference_fps", fps)
+
+        if self.quality_checker.policy:
+            self.quality_checker.submit_for_quality_check({
+                "request": request,
+                "response": vdag_response
+            })
+
+    def _to_block(self, request):
+        head, graph_str, session_prefix = self.vdag.block_route()
+        return routed_vdag_to_block(request, head, graph_str, session_prefix)
+
+    def infer_no_ctx(self, request):
+        if not self.limiter.try_acquire():
+            self.metrics.increment_counter("inference_requests_rejected")
+            return self._reject(request, "vDAG concurrency limit reached")
+
+        try:
+
+            rejection = self._admit(request)
+            if rejection:
+                return rejection
 
             logging.info(f"Received inference request for session: {request.session_id}")
             start_time = time.time()  # Start latency measurement
 
             # Perform inference logic
-            block_request = vdag_to_block(request, self.head, self.vdag_serialized_l2_graph, self.vdag.vdag_uri)
+            block_request = self._to_block(request)
             block_response = self.adhoc_inference_client.infer(request.session_id, block_request)
 
             logging.info(f"Received response: {block_response}")
             vdag_response = block_to_vdag(block_response)
 
-            # Record metrics
-            self.metrics.increment_counter("inference_requests_total")
-            latency = time.time() - start_time  # Calculate latency
-            self.metrics.set_gauge("inference_latency_seconds", latency)  # Update latest latency
-
-            # Estimate FPS (assuming one request = one frame)
-            fps = 1 / latency if latency > 0 else 0
-            self.metrics.set_gauge("inference_fps", fps)
-
-            if self.quality_checker.policy:
-                self.quality_checker.submit_for_quality_check({
-                    "request": request,
-                    "response": vdag_response
-                })
-
+            self._record(request, vdag_response, start_time)
             return vdag_response
 
         except Exception as e:
             logging.error(f"Error processing inference request: {str(e)}", exc_info=True)
             return vdag_service_pb2.vDAGInferencePacket()
+        finally:
+            self.limiter.release()
+
+    def infer_stream_no_ctx(self, request):
+        # yields vDAG packets, partial outputs first and the final output last
+        if not self.limiter.try_acquire():
+            self.metrics.increment_counter("inference_requests_rejected")
+            yield self._reject(request, "vDAG concurrency limit reached")
+            return
 
-    def infer(self, request, context):
         try:
 
-            if not self.quota_checker.check_quota(request.session_id, request):
-                return vdag_service_pb2.vDAGInferencePacket(
-                    session_id=request.session_id,
-                    data=json.dumps({"success": False, "message": "quota management policy did not allow this request"})
-                )
+            rejection = self._admit(request)
+            if rejection:
+                yield rejection
+                return
 
-            if not self.health_checker.is_healthy_fast_check():
-                return vdag_service_pb2.vDAGInferencePacket(
-                    session_id=request.session_id,
-                    data=json.dumps({"success": False, "message": "one or more blocks of the vDAG is not healthy at the moment"})
-                )
+            start_time = time.time()
+            vdag_response = None
+            for block_response in self.adhoc_inference_client.infer_stream(request.session_id, self._to_block(request)):
+                vdag_response = block_to_vdag(block_response)
+                yield vdag_response
 
-            logging.info(f"Received inference request for session: {request.session_id}")
-            start_time = time.time()  # Start latency measurement
+            if vdag_response is not None:
+                self._record(request, vdag_response, start_time)
 
-            # Perform inference logic
-            block_request = vdag_to_block(request, self.head, self.vdag_serialized_l2_graph, self.vdag.vdag_uri)
-            block_response = self.adhoc_inference_client.infer(request.session_id, block_request)
+        finally:
+            self.limiter.release()
 
-            logging.info(f"Received response: {block_response}")
-            vdag_response = block_to_vdag(block_response)
+    async def infer(self, request, context):
+        if not self.limiter.try_acquire():
+            self.metrics.increment_counter("inference_requests_rejected")
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "vDAG concurrency limit reached")
 
-            # Record metrics
-            self.metrics.increment_counter("inference_requests_total")
-            latency = time.time() - start_time  # Calculate latency
-            self.metrics.set_gauge("inference_latency_seconds", latency)  # Update latest latency
+        try:
+            loop = asyncio.get_running_loop()
+            rejection = await loop.run_in_executor(None, self._admit, request)
+            if rejection:
+                return rejection
 
-            # Estimate FPS (assuming one request = one frame)
-            fps = 1 / latency if latency > 0 else 0
-            self.metrics.set_gauge("inference_fps", fps)
+            logging.info(f"Received inference request for session: {request.session_id}")
+            start_time = time.time()  # Start latency measurement
 
-            if self.quality_checker.policy:
-                self.quality_checker.submit_for_quality_check({
-                    "request": request,
-                    "response": vdag_response
-                })
+            block_response = await self.adhoc_inference_client.infer_async(self._to_block(request))
+            if block_response is None:
+                raise Exception("no response from the adhoc inference server")
 
+            vdag_response = block_to_vdag(block_response)
+            self._record(request, vdag_response, start_time)
             return vdag_response
 
         except Exception as e:
@@ -391,15 +477,68 @@ class vDAGInferenceServiceServicer(vdag_service_pb2_grpc.vDAGInferenceServiceSer
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details("Internal server error.")
             return vdag_service_pb2.vDAGInferencePacket()
+        finally:
+            self.limiter.release()
 
+    async def infer_stream(self, request, context):
+        if not self.limiter.try_acquire():
+            self.metrics.increment_counter("inference_requests_rejected")
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "vDAG concurrency limit reached")
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+        try:
+            loop = asyncio.get_running_loop()
+            rejection = await loop.run_in_executor(None, self._admit, request)
+            if rejection:
+                yield rejection
+                return
+
+            logging.info(f"Received stream inference request for session: {request.session_id}")
+            start_time = time.time()
+
+            vdag_response = None
+            async for block_response in self.adhoc_inference_client.infer_stream_async(self._to_block(request)):
+                vdag_response = block_to_vdag(block_response)
+                yield vdag_response
+
+            if vdag_response is not None:
+                self._record(request, vdag_response, start_time)
+
+        except Exception as e:
+            logging.error(f"Error processing stream inference request: {str(e)}", exc_info=True)
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details("Internal server error.")
+        finally:
+            self.limiter.release()
+
+
+class ConcurrencyLimiter:
+    # non-blocking admission, requests beyond the limit are rejected; 0 means unlimited
+    def __init__(self, max_concurrent):
+        self.max_concurrent = max_concurrent
+        self.semaphore = threading.BoundedSemaphore(max_concurrent) if max_concurrent > 0 else None
+
+    def try_acquire(self):
+        if self.semaphore is None:
+            return True
+        return self.semaphore.acquire(blocking=False)
+
+    def release(self):
+        if self.semaphore is not None:
+            self.semaphore.release()
+
+
+async def _serve():
+    server = grpc.aio.server(
+        futures.ThreadPoolExecutor(max_workers=int(os.getenv("GRPC_MAX_WORKERS", 10))))
 
     servicer = vDAGInferenceServiceServicer()
     servicer.web_server()
     vdag_service_pb2_grpc.add_vDAGInferenceServiceServicer_to_server(servicer, server)
     server.add_insecure_port('[::]:50051')
     logging.info("Starting vDAGInferenceService server on port 50051...")
-    server.start()
-    server.wait_for_termination()
+    await server.start()
+    await server.wait_for_termination()
+
+
+def serve():
+    asyncio.run(_serve())
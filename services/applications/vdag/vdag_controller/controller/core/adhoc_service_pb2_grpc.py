@@ -20,6 +20,11 @@ class BlockInferenceServiceStub(object):
                 request_serializer=adhoc__service__pb2.BlockInferencePacket.SerializeToString,
                 response_deserializer=adhoc__service__pb2.AIOSPacket.FromString,
                 )
+        self.infer_stream = channel.unary_stream(
+                '/BlockInferenceService/infer_stream',
+                request_serializer=adhoc__service__pb2.BlockInferencePacket.SerializeToString,
+                response_deserializer=adhoc__service__pb2.AIOSPacket.FromString,
+                )
 
 
 class BlockInferenceServiceServicer(object):
@@ -32,6 +37,13 @@ class BlockInferenceServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def infer_stream(self, request, context):
+        """partial outputs of the final block, then the final output
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_BlockInferenceServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -40,6 +52,11 @@ def add_BlockInferenceServiceServicer_to_server(servicer, server):
                     request_deserializer=adhoc__service__pb2.BlockInferencePacket.FromString,
                     response_serializer=adhoc__service__pb2.AIOSPacket.SerializeToString,
             ),
+            'infer_stream': grpc.unary_stream_rpc_method_handler(
+                    servicer.infer_stream,
+                    request_deserializer=adhoc__service__pb2.BlockInferencePacket.FromString,
+                    response_serializer=adhoc__service__pb2.AIOSPacket.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'BlockInferenceService', rpc_method_handlers)
@@ -67,3 +84,20 @@ class BlockInferenceService(object):
             adhoc__service__pb2.AIOSPacket.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def infer_stream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/BlockInferenceService/infer_stream',
+            adhoc__service__pb2.BlockInferencePacket.SerializeToString,
+            adhoc__service__pb2.AIOSPacket.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -102,9 +102,14 @@ class BlocksDB:
 
 
 class HealthChecker:
-    def __init__(self, vdag_info: vDAGObject, app: Flask, custom_init_data: dict) -> None:
+    def __init__(self, vdag_info: vDAGObject, app: Flask, custom_init_data: dict, metrics=None) -> None:
 
         self.policy = None
+        self.metrics = metrics
+
+        # (healthy, evaluated_at), replaced as a whole so readers never see a torn verdict
+        self.verdict = None
+        self.refresh_event = threading.Event()
 
         self.vdag_info = vdag_info
         controller = self.vdag_info.controller
@@ -136,13 +141,30 @@ class HealthChecker:
 
         self.interval = int(health_checker.get('interval', 60))
         self.max_retries = int(health_checker.get('maxRetries', 1))
+
+        # verdicts served on the inference path are evaluated in the background
+        self.verdict_interval = float(health_checker.get('verdictRefreshInterval', 5))
+        self.verdict_max_staleness = float(health_checker.get('verdictMaxStaleness', 30))
+        self.fail_mode = health_checker.get('failMode', 'open')
+
         self.policy = self.load_health_checker_policy_rule()
         self.is_initialized = True
         logger.info("HealthChecker successfully initialized.")
 
+        if self.metrics:
+            self.metrics.register_gauge("health_verdict_age_seconds", "Age of the cached vDAG health verdict")
+            self.metrics.register_gauge("health_verdict_healthy", "Cached vDAG health verdict, 1 if healthy")
+            self.metrics.register_counter("health_verdict_stale_reads", "Requests that found the health verdict stale")
+            # computed when scraped, a gauge set by the refresher would always read ~0
+            self.metrics.metrics["health_verdict_age_seconds"].set_function(self.verdict_age)
+
+        self.verdict_thread = threading.Thread(target=self.run_verdict_refresher, daemon=True)
+        self.verdict_thread.start()
+
         # register health check API:
         app.add_url_rule("/health/check", "health_check", self.run_health_check_adhoc, methods=["GET"])
         app.add_url_rule("/health/mgmt", "health_mgmt", self.mgmt, methods=["POST"])
+        app.add_url_rule("/health/refresh", "health_refresh", self.refresh_api, methods=["POST"])
 
     def load_health_checker_policy_rule(self):
         try:
@@ -188,20 +210,50 @@ class HealthChecker:
             raise e
 
     def is_healthy_fast_check(self):
-        try:
+        if not self.policy:
+            return True
 
-            if not self.policy:
-                return True
+        verdict = self.verdict
+        if verdict is None or time.time() - verdict[1] > self.verdict_max_staleness:
+            if self.metrics:
+                self.metrics.increment_counter("health_verdict_stale_reads")
+            self.refresh_event.set()
+            return self.fail_mode != "closed"
 
-            all_blocks = []
-            for _, block in self.vdag_info.assignment_info.items():
-                all_blocks.append(block)
+        return verdict[0]
+
+    def set_verdict(self, healthy):
+        self.verdict = (bool(healthy), time.time())
+        if self.metrics:
+            self.metrics.set_gauge("health_verdict_healthy", 1 if healthy else 0)
+
+    def verdict_age(self):
+        verdict = self.verdict
+        if verdict is None:
+            return float("inf")
+        return time.time() - verdict[1]
 
+    def refresh_verdict(self):
+        try:
+            # the vDAG and its block assignment are read again every cycle
+            all_blocks = list(self.vdag_info.assignment_info.values())
             response = self.check_health(all_blocks, mode="fast_check")
-            return response['overall_healthy']
+            self.set_verdict(response['overall_healthy'])
         except Exception as e:
-            logger.error("health checker failed, returning True")
-            return True
+            # the previous verdict is kept and ages out into the fail mode
+            logger.error(f"health verdict refresh failed: {e}")
+
+    def run_verdict_refresher(self):
+        while True:
+            # cleared before the evaluation so a refresh requested during it is not lost
+            self.refresh_event.clear()
+            self.refresh_verdict()
+            self.refresh_event.wait(self.verdict_interval)
+
+    def refresh_api(self):
+        # hook for metrics / health events that should re-evaluate the verdict now
+        self.refresh_event.set()
+        return jsonify({"success": True}), 200
 
     def run_health_check_adhoc(self):
         try:
@@ -210,6 +262,8 @@ class HealthChecker:
                 all_blocks.append(block)
 
             response =  self.check_health(all_blocks)
+            if isinstance(response, dict) and 'overall_healthy' in response:
+                self.set_verdict(response['overall_healthy'])
             return jsonify({"success": True, "data": response}), 200
 
         except Exception as e:
@@ -223,6 +277,8 @@ class HealthChecker:
             mgmt_data = data.get('mgmt_data', {})
 
             response =  self.policy.execute_mgmt_command(mgmt_action, mgmt_data)
+            # policy settings may have changed the verdict
+            self.refresh_event.set()
             return jsonify({"success": True, "data": response}), 200
             
         except Exception as e:
@@ -239,7 +295,9 @@ class HealthChecker:
                 if all_blocks:
                     logger.info(
                         f"Running periodic health check for {len(all_blocks)} blocks.")
-                    self.check_health(all_blocks)
+                    response = self.check_health(all_blocks)
+                    if isinstance(response, dict) and 'overall_healthy' in response:
+                        self.set_verdict(response['overall_healthy'])
             except Exception as e:
                 logger.error(f"Health check error: {e}")
 
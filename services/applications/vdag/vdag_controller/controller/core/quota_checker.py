@@ -1,7 +1,8 @@
 import os
 import logging
 import time
-from threading import Lock
+import uuid
+from threading import Lock, Thread
 import redis
 from flask import Flask, jsonify, request
 
@@ -9,12 +10,82 @@ from .schema import vDAGObject
 from .policy_sandbox import LocalPolicyEvaluator
 
 
+# check-and-increment in one round trip, ARGV: amount, ttl (0 = none), limit (0 = none),
+# candidate window id. KEYS[2] holds the id of the counter's current window, a new one is
+# started whenever the counter expired or was reset.
+# returns {new value, granted amount, window id}, a lease may be granted partially up to the limit
+INCREMENT_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+local window = redis.call('GET', KEYS[2])
+if not raw or not window then
+    window = ARGV[4]
+    redis.call('SET', KEYS[2], window)
+end
+local current = tonumber(raw or '0')
+local amount = tonumber(ARGV[1])
+local limit = tonumber(ARGV[3])
+if limit > 0 and current + amount > limit then
+    amount = limit - current
+    if amount <= 0 then
+        return {current, 0, window}
+    end
+end
+local value = redis.call('INCRBY', KEYS[1], amount)
+if tonumber(ARGV[2]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+end
+return {value, amount, window}
+"""
+
+# hands back the unused part of a lease, never below zero and only to the window
+# the lease was taken from, ARGV: amount, window id
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[2] then
+    return -1
+end
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local amount = math.min(tonumber(ARGV[1]), current)
+if amount > 0 then
+    redis.call('DECRBY', KEYS[1], amount)
+end
+return current - amount
+"""
+
+
+def window_key(session_id):
+    return session_id + ":window"
+
+
+class QuotaLease:
+    # a block of tokens reserved in redis, consumed locally: the token values
+    # are (base - size, base] of the counter window the lease was taken from
+    def __init__(self, base, size, expires_at, window):
+        self.base = base
+        self.size = size
+        self.used = 0
+        self.expires_at = expires_at
+        self.window = window
+
+    def remaining(self):
+        return self.size - self.used
+
+
 class QuotaManagement:
-    def __init__(self, redis_host="localhost", redis_port=6379, redis_db=0, quota_ttl=None):
+    def __init__(self, redis_host="localhost", redis_port=6379, redis_db=0, quota_ttl=None,
+                 lease_size=1, lease_ttl=5, quota_limit=0, num_stripes=64):
+        # only guards the in-memory fallback, redis accounting is done by the scripts
         self._lock = Lock()
         self.quota_ttl = quota_ttl
         self.in_memory_quota = {}  # session_id -> (value, expiry_time or None)
 
+        self.lease_size = lease_size
+        self.lease_ttl = lease_ttl
+        self.quota_limit = quota_limit
+        self.leases = {}  # session_id -> QuotaLease
+        self._stripes = [Lock() for _ in range(num_stripes)]
+        self._reaper = None
+
         try:
             self.redis_client = redis.StrictRedis(
                 host=redis_host,
@@ -23,11 +94,33 @@ class QuotaManagement:
                 decode_responses=True
             )
             self.redis_client.ping()
+            self._increment_script = self.redis_client.register_script(INCREMENT_SCRIPT)
+            self._release_script = self.redis_client.register_script(RELEASE_SCRIPT)
             logger.info("Connected to Redis for quota management.")
         except redis.ConnectionError as e:
             logger.error(f"Redis connection error: {e}")
             self.redis_client = None
 
+    def configure(self, lease_size=None, lease_ttl=None, quota_limit=None, quota_ttl=None):
+        if lease_size is not None:
+            self.lease_size = max(1, int(lease_size))
+        if lease_ttl is not None:
+            self.lease_ttl = float(lease_ttl)
+        if quota_limit is not None:
+            self.quota_limit = int(quota_limit)
+        if quota_ttl is not None:
+            self.quota_ttl = int(quota_ttl)
+
+        # unused tokens of every replica are bounded by lease_size - 1 per session
+        logger.info(f"Quota leases: size={self.lease_size}, ttl={self.lease_ttl}s, limit={self.quota_limit}")
+
+        if self.lease_size > 1 and self._reaper is None:
+            self._reaper = Thread(target=self._reap_leases, daemon=True)
+            self._reaper.start()
+
+    def _stripe(self, session_id):
+        return self._stripes[hash(session_id) % len(self._stripes)]
+
     def _is_expired(self, expiry_time):
         return expiry_time is not None and time.time() > expiry_time
 
@@ -41,21 +134,77 @@ class QuotaManagement:
             return 0
         return value
 
+    def _redis_increment(self, session_id, amount):
+        value, granted, window = self._increment_script(
+            keys=[session_id, window_key(session_id)],
+            args=[amount, self.quota_ttl or 0, self.quota_limit or 0, uuid.uuid4().hex])
+        return int(value), int(granted), window
+
+    def _return_tokens(self, session_id, amount, window):
+        # the tokens are already counted in redis, a failed return only leaves them
+        # counted and must not reach the in-memory fallback of increment
+        if amount <= 0 or not self.redis_client:
+            return
+        try:
+            if int(self._release_script(keys=[session_id, window_key(session_id)], args=[amount, window])) < 0:
+                logger.debug(f"quota window of {session_id} rolled over, {amount} tokens not returned")
+        except redis.RedisError as e:
+            logger.error(f"Redis error returning {amount} quota tokens of {session_id}: {e}")
+
+    def _release(self, session_id, lease):
+        self._return_tokens(session_id, lease.remaining(), lease.window)
+
+    def _reap_leases(self):
+        while True:
+            time.sleep(max(self.lease_ttl / 2, 0.1))
+            now = time.time()
+            for session_id in list(self.leases.keys()):
+                with self._stripe(session_id):
+                    lease = self.leases.get(session_id)
+                    if lease is None or lease.expires_at > now:
+                        continue
+                    del self.leases[session_id]
+                self._release(session_id, lease)
+
+    def _increment_leased(self, session_id, amount):
+        with self._stripe(session_id):
+            lease = self.leases.get(session_id)
+            if lease is not None and lease.expires_at > time.time() and lease.remaining() >= amount:
+                lease.used += amount
+                return lease.base - lease.remaining()
+
+            if lease is not None:
+                del self.leases[session_id]
+                self._release(session_id, lease)
+
+            value, granted, window = self._redis_increment(session_id, max(self.lease_size, amount))
+            if granted < amount:
+                # over the hard limit, nothing is consumed
+                self._return_tokens(session_id, granted, window)
+                return value - granted + amount
+
+            lease = QuotaLease(value, granted, time.time() + self.lease_ttl, window)
+            lease.used = amount
+            self.leases[session_id] = lease
+            return lease.base - lease.remaining()
+
     def increment(self, session_id: str, amount: int = 1) -> int:
         if amount < 0:
             raise ValueError("Increment amount cannot be negative.")
 
-        with self._lock:
-            if self.redis_client:
-                try:
-                    new_quota = self.redis_client.incrby(session_id, amount)
-                    if self.quota_ttl is not None:
-                        self.redis_client.expire(session_id, self.quota_ttl)
-                    logger.debug(f"Incremented quota for {session_id} to {new_quota}")
-                    return new_quota
-                except redis.RedisError as e:
-                    logger.error(f"Redis error in increment: {e}")
+        if self.redis_client:
+            try:
+                if self.lease_size > 1:
+                    new_quota = self._increment_leased(session_id, amount)
+                else:
+                    value, granted, _ = self._redis_increment(session_id, amount)
+                    new_quota = value if granted == amount else value + amount
+                logger.debug(f"Incremented quota for {session_id} to {new_quota}")
+                return new_quota
+            except redis.RedisError as e:
+                logger.error(f"Redis error in increment: {e}")
 
+        with self._lock:
             # In-memory fallback
             value = self._get_in_memory(session_id)
             new_value = value + amount
@@ -64,24 +213,37 @@ class QuotaManagement:
             logger.debug(f"[Fallback] Incremented quota for {session_id} to {new_value}")
             return new_value
 
+    def _drop_lease(self, session_id):
+        with self._stripe(session_id):
+            self.leases.pop(session_id, None)
+
     def get(self, session_id: str) -> int:
         with self._lock:
             if self.redis_client:
                 try:
                     value = self.redis_client.get(session_id)
-                    return int(value) if value else 0
+                    value = int(value) if value else 0
+                    lease = self.leases.get(session_id)
+                    if lease is not None:
+                        value -= lease.remaining()
+                    return value
                 except redis.RedisError as e:
                     logger.error(f"Redis error in get: {e}")
 
             return self._get_in_memory(session_id)
 
     def reset(self, session_id: str) -> None:
+        self._drop_lease(session_id)
         with self._lock:
             if self.redis_client:
                 try:
-                    self.redis_client.set(session_id, 0)
+                    # dropping the window key keeps earlier leases from returning tokens
+                    pipe = self.redis_client.pipeline()
+                    pipe.set(session_id, 0)
+                    pipe.delete(window_key(session_id))
                     if self.quota_ttl is not None:
-                        self.redis_client.expire(session_id, self.quota_ttl)
+                        pipe.expire(session_id, self.quota_ttl)
+                    pipe.execute()
                     return
                 except redis.RedisError as e:
                     logger.error(f"Redis error in reset: {e}")
@@ -90,6 +252,7 @@ class QuotaManagement:
             self.in_memory_quota[session_id] = (0, expiry_time)
 
     def clean(self) -> None:
+        self.leases.clear()
         with self._lock:
             if self.redis_client:
                 try:
@@ -103,10 +266,11 @@ class QuotaManagement:
             logger.info("[Fallback] All quotas cleared from in-memory store.")
 
     def remove(self, session_id: str) -> None:
+        self._drop_lease(session_id)
         with self._lock:
             if self.redis_client:
                 try:
-                    self.redis_client.delete(session_id)
+                    self.redis_client.delete(session_id, window_key(session_id))
                     return
                 except redis.RedisError as e:
                     logger.error(f"Redis error in remove: {e}")
@@ -158,6 +322,14 @@ class QuotaManager:
                 logger.info("QuotaManager is disabled in configuration.")
                 return
 
+        # leaseSize tokens are reserved per round trip, 1 keeps accounting exact
+        self.quota_cache.configure(
+            lease_size=quota_checker.get('leaseSize', 1),
+            lease_ttl=quota_checker.get('leaseTTL', 5),
+            quota_limit=quota_checker.get('quotaLimit', 0),
+            quota_ttl=quota_checker.get('quotaTTL', None)
+        )
+
         self.quota_checker_policy_rule = quota_checker.get('quotaCheckerPolicyRule')
         if not self.quota_checker_policy_rule:
             logger.warning(
@@ -197,6 +369,10 @@ class QuotaManager:
             logger.debug(
                 f"Session {session_id} quota incremented to {new_quota}")
 
+            if self.quota_cache.quota_limit and new_quota > self.quota_cache.quota_limit:
+                logger.info(f"Quota check for session {session_id}: Denied, hard limit reached")
+                return False
+
             policy_input = {
                 "quota_table": self.quota_cache,
                 "input": input_data,
@@ -1,5 +1,6 @@
 from flask import Flask, jsonify
 import threading
+import json
 import os
 
 from .env import Env
@@ -43,6 +44,10 @@ class vDAG:
         self.head_block_id = self.graph['head']
         self.vdag_uri = vdag_client.vdag_uri
 
+        # (compiled graph, assignment, head, serialized l2 graph, session prefix)
+        self.route = None
+        self.route_lock = threading.Lock()
+
     def get_connection_cycle_interval(self):
         return int(self.controller.get('connectionRefreshInterval', -1))
 
@@ -71,6 +76,21 @@ class vDAG:
     def get_vdag(self):
         return self.vdag_client.vdag_data.to_dict()
 
+    def block_route(self):
+        # resolved once and reused by every request, rebuilt only when the compiled
+        # graph or the assignment object of the vDAG is replaced
+        route = self.route
+        graph = self.vdag_data.compiled_graph_data
+        assignment = self.vdag_data.assignment_info
+        if route is None or route[0] is not graph or route[1] is not assignment:
+            with self.route_lock:
+                route = self.route = (
+                    graph, assignment, graph['head'],
+                    json.dumps({"is_graph": True, "graph": graph['t2_graph']}),
+                    "vdag::" + self.vdag_uri + "::"
+                )
+        return route[2:]
+
 
 class vDAGAPIServer:
     def __init__(self, vdag_instance):
@@ -138,12 +158,14 @@ class vDAGAPIServer:
 
 
 def vdag_to_block(vdag_packet: vDAGInferencePacket, block_id: str, graph_str: str, vdag_uri) -> BlockInferencePacket:
+    return routed_vdag_to_block(vdag_packet, block_id, graph_str, "vdag::" + vdag_uri + "::")
 
-    session_id = "vdag::" + vdag_uri + "::" + vdag_packet.session_id
 
+def routed_vdag_to_block(vdag_packet: vDAGInferencePacket, block_id: str, graph_str: str,
+                         session_prefix: str) -> BlockInferencePacket:
     return BlockInferencePacket(
         block_id=block_id,
-        session_id=session_id,
+        session_id=session_prefix + vdag_packet.session_id,
         seq_no=vdag_packet.seq_no,
         frame_ptr=vdag_packet.frame_ptr,
         data=vdag_packet.data,
@@ -0,0 +1,156 @@
+import threading
+import time
+
+from flask import Flask
+from prometheus_client import CollectorRegistry, Counter, Gauge
+
+from core import health_checker
+from core.health_checker import HealthChecker
+from core.schema import vDAGObject
+from core.system import vDAG, vdag_to_block, routed_vdag_to_block
+from core.vdag_service_pb2 import vDAGInferencePacket
+
+POLICY_DELAY = 0.2
+
+
+class SlowPolicy:
+    def __init__(self, policy_rule_uri, parameters):
+        self.calls = 0
+        self.healthy = True
+        self.running = threading.Event()
+
+    def execute_policy_rule(self, input_data):
+        self.calls += 1
+        self.running.set()
+        time.sleep(POLICY_DELAY)
+        return {"overall_healthy": self.healthy}
+
+
+class FakeMetrics:
+    def __init__(self):
+        self.metrics = {}
+        self.registry = CollectorRegistry()
+
+    def register_gauge(self, name, documentation, labelnames=None):
+        self.metrics[name] = Gauge(name, documentation, registry=self.registry)
+
+    def register_counter(self, name, documentation, labelnames=None):
+        self.metrics[name] = Counter(name, documentation, registry=self.registry)
+
+    def set_gauge(self, name, value, labelnames=None):
+        self.metrics[name].set(value)
+
+    def increment_counter(self, name, labelnames=None):
+        self.metrics[name].inc()
+
+    def value(self, name):
+        return self.registry.get_sample_value(name)
+
+
+def vdag_object(assignment=None):
+    return vDAGObject.from_dict({
+        "vdag_name": "v",
+        "vdag_version": {"version": "1.0", "release-tag": "stable"},
+        "controller": {},
+        "assignment_info": assignment or {"a": "block-a", "b": "block-b"},
+        "compiled_graph_data": {"head": "block-a", "t2_graph": {"block-a": ["block-b"]}, "t3_graph": {}},
+    })
+
+
+def make_checker(monkeypatch, **settings):
+    monkeypatch.setattr(health_checker, "LocalPolicyEvaluator", SlowPolicy)
+    config = {"healthCheckerPolicyRule": {"policyRuleURI": "test"}, "verdictRefreshInterval": 0.05}
+    config.update(settings)
+    metrics = FakeMetrics()
+    checker = HealthChecker(vdag_object(), Flask(__name__), {"healthChecker": config}, metrics=metrics)
+    return checker, metrics
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_request_latency_does_not_include_policy_execution(monkeypatch):
+    checker, _ = make_checker(monkeypatch)
+    assert wait_for(lambda: checker.verdict is not None)
+
+    # the policy takes POLICY_DELAY per evaluation and keeps running in the background
+    checker.policy.running.clear()
+    assert checker.policy.running.wait(2)
+
+    calls = checker.policy.calls
+    start = time.perf_counter()
+    for _ in range(1000):
+        assert checker.is_healthy_fast_check() is True
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < POLICY_DELAY
+    # no request ran the policy, only the refresher did
+    assert checker.policy.calls - calls <= 1
+
+
+def test_verdict_follows_the_policy(monkeypatch):
+    checker, metrics = make_checker(monkeypatch)
+    assert wait_for(lambda: checker.verdict is not None)
+
+    checker.policy.healthy = False
+    assert wait_for(lambda: checker.is_healthy_fast_check() is False)
+    assert metrics.value("health_verdict_healthy") == 0
+
+
+def test_verdict_age_is_computed_when_scraped(monkeypatch):
+    checker, metrics = make_checker(monkeypatch, verdictRefreshInterval=60)
+    assert wait_for(lambda: checker.verdict is not None)
+
+    first = metrics.value("health_verdict_age_seconds")
+    time.sleep(0.1)
+    second = metrics.value("health_verdict_age_seconds")
+    assert second >= first + 0.1
+
+
+def test_stale_verdict_uses_the_fail_mode(monkeypatch):
+    checker, metrics = make_checker(monkeypatch, verdictRefreshInterval=60, failMode="closed")
+    assert wait_for(lambda: checker.verdict is not None)
+
+    checker.verdict = (True, time.time() - 3600)
+    assert checker.is_healthy_fast_check() is False
+    assert metrics.value("health_verdict_stale_reads_total") == 1
+
+    checker.fail_mode = "open"
+    checker.verdict = None
+    assert checker.is_healthy_fast_check() is True
+    assert metrics.value("health_verdict_age_seconds") == float("inf")
+
+
+def make_vdag(data):
+    vdag = vDAG.__new__(vDAG)
+    vdag.vdag_data = data
+    vdag.vdag_uri = "v:1.0-stable"
+    vdag.route = None
+    vdag.route_lock = threading.Lock()
+    return vdag
+
+
+def test_block_route_is_resolved_once_per_assignment():
+    data = vdag_object()
+    vdag = make_vdag(data)
+
+    head, graph_str, prefix = vdag.block_route()
+    assert vdag.block_route()[1] is graph_str
+    assert head == "block-a"
+
+    packet = vDAGInferencePacket(session_id="s1", seq_no=3, data="x")
+    assert routed_vdag_to_block(packet, head, graph_str, prefix) == \
+        vdag_to_block(packet, head, graph_str, vdag.vdag_uri)
+
+    # a re-assignment replaces the assignment and the compiled graph
+    data.compiled_graph_data = {"head": "block-c", "t2_graph": {"block-c": []}, "t3_graph": {}}
+    data.assignment_info = {"a": "block-c"}
+    head, new_graph_str, _ = vdag.block_route()
+    assert head == "block-c"
+    assert new_graph_str != graph_str
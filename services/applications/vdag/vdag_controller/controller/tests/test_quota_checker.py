@@ -0,0 +1,166 @@
+import threading
+import time
+
+import pytest
+import redis
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from core import quota_checker
+from core.quota_checker import QuotaManagement, window_key
+
+THREADS = 8
+PER_THREAD = 500
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = fakeredis.FakeServer()
+
+    def connect(host=None, port=None, db=0, decode_responses=False):
+        return fakeredis.FakeStrictRedis(server=server, decode_responses=decode_responses)
+
+    monkeypatch.setattr(quota_checker.redis, "StrictRedis", connect)
+    return server
+
+
+def make_quota(lease_size=1, quota_limit=0, lease_ttl=60):
+    quota = QuotaManagement()
+    quota.configure(lease_size=lease_size, lease_ttl=lease_ttl, quota_limit=quota_limit)
+    return quota
+
+
+def counter(quota, session_id):
+    return int(quota.redis_client.get(session_id) or 0)
+
+
+def release_all(quota):
+    for session_id, lease in list(quota.leases.items()):
+        quota._release(session_id, lease)
+    quota.leases.clear()
+
+
+def hammer(replicas, session_ids):
+    values = []
+    lock = threading.Lock()
+
+    def run(i):
+        quota = replicas[i % len(replicas)]
+        local = [(session_ids[j % len(session_ids)], quota.increment(session_ids[j % len(session_ids)]))
+                 for j in range(PER_THREAD)]
+        with lock:
+            values.extend(local)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return values, time.perf_counter() - start
+
+
+@pytest.mark.parametrize("lease_size", [1, 16])
+def test_concurrent_increments_are_exact_across_replicas(server, lease_size):
+    replicas = [make_quota(lease_size=lease_size) for _ in range(2)]
+    sessions = ["s1", "s2", "s3"]
+
+    values, _ = hammer(replicas, sessions)
+
+    # every request got its own token of its session
+    for session_id in sessions:
+        tokens = [v for s, v in values if s == session_id]
+        assert len(set(tokens)) == len(tokens)
+
+    # outstanding leases are bounded by lease_size - 1 per session and replica
+    for session_id in sessions:
+        used = sum(1 for s, _ in values if s == session_id)
+        assert used <= counter(replicas[0], session_id) <= used + len(replicas) * (lease_size - 1)
+
+    for quota in replicas:
+        release_all(quota)
+    for session_id in sessions:
+        assert counter(replicas[0], session_id) == sum(1 for s, _ in values if s == session_id)
+
+
+def test_leases_cut_redis_round_trips(server):
+    calls = {1: 0, 32: 0}
+    rates = {}
+    for lease_size in calls:
+        quota = make_quota(lease_size=lease_size)
+        original = quota._redis_increment
+
+        def counted(session_id, amount, lease_size=lease_size, original=original):
+            calls[lease_size] += 1
+            return original(session_id, amount)
+
+        quota._redis_increment = counted
+        _, elapsed = hammer([quota], ["t-%d" % lease_size])
+        rates[lease_size] = THREADS * PER_THREAD / elapsed
+
+    print(f"increments/s: unleased {rates[1]:.0f}, leased {rates[32]:.0f}")
+    assert calls[1] == THREADS * PER_THREAD
+    assert calls[32] <= THREADS * PER_THREAD // 32 + 1
+    assert rates[32] > rates[1]
+
+
+def test_hard_limit_is_exact_under_concurrency(server):
+    replicas = [make_quota(lease_size=8, quota_limit=1000) for _ in range(2)]
+
+    values, _ = hammer(replicas, ["s"])
+
+    allowed = [v for _, v in values if v <= 1000]
+    assert len(allowed) == len(set(allowed)) <= 1000
+    for quota in replicas:
+        release_all(quota)
+    assert counter(replicas[0], "s") == len(allowed)
+
+
+def test_failed_partial_return_is_not_counted_twice(server):
+    quota = make_quota(lease_size=10, quota_limit=5)
+    quota.redis_client.set("s", 3)
+
+    def broken(*args, **kwargs):
+        raise redis.ConnectionError("down")
+
+    quota._release_script = broken
+
+    # 2 tokens are left, the request for 4 is over the limit and its partial grant cannot be returned
+    assert quota.increment("s", 4) == 7
+    assert quota.in_memory_quota == {}
+    assert counter(quota, "s") == 5
+
+
+def test_lease_is_not_returned_into_a_new_window(server):
+    quota = make_quota(lease_size=10)
+    other = make_quota(lease_size=1)
+
+    quota.increment("s")
+    lease = quota.leases["s"]
+    assert counter(quota, "s") == 10
+
+    # the counter expires and another replica starts a new window
+    quota.redis_client.delete("s")
+    other.increment("s")
+    quota._release("s", lease)
+    assert counter(quota, "s") == 1
+
+    # reset starts a new window as well
+    quota.increment("t")
+    lease = quota.leases["t"]
+    other.reset("t")
+    other.increment("t")
+    quota._release("t", lease)
+    assert counter(quota, "t") == 1
+
+
+def test_expired_leases_are_returned(server):
+    quota = make_quota(lease_size=10, lease_ttl=0.1)
+    quota.increment("s")
+    assert counter(quota, "s") == 10
+
+    deadline = time.time() + 2
+    while counter(quota, "s") != 1 and time.time() < deadline:
+        time.sleep(0.02)
+    assert counter(quota, "s") == 1
+    assert quota.redis_client.get(window_key("s")) is not None
@@ -0,0 +1,192 @@
+import sys
+import builtins
+import logging
+import threading
+import importlib
+import importlib.abc
+import importlib.util
+from importlib.machinery import PathFinder
+from pathlib import Path
+
+NAMESPACE_PREFIX = "aios_policy_"
+
+_policies = {}  # namespace -> LoadedPolicy
+_lock = threading.RLock()
+_finder_installed = False
+
+
+class LoadedPolicy:
+    # one policy package imported as <namespace>, its top-level imports of
+    # modules shipped in the package resolve to <namespace>.<name>
+    def __init__(self, namespace: str, code_dir: Path, deps_dir: Path = None):
+        self.namespace = namespace
+        self.code_dir = Path(code_dir)
+        self.deps_dir = Path(deps_dir) if deps_dir else None
+        self.refs = 0
+        self.local_names = self._local_names()
+        self.builtins = dict(builtins.__dict__)
+        self.builtins["__import__"] = self._import
+
+    def _local_names(self):
+        names = set()
+        for path in self.code_dir.iterdir():
+            if path.suffix == ".py":
+                names.add(path.stem)
+            elif path.is_dir() and (path / "__init__.py").exists():
+                names.add(path.name)
+        return names
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level != 0:
+            return builtins.__import__(name, globals, locals, fromlist, level)
+
+        if name.split(".")[0] in self.local_names:
+            module = importlib.import_module(f"{self.namespace}.{name}")
+            if fromlist:
+                self._handle_fromlist(module, fromlist)
+                return module
+            return sys.modules[f"{self.namespace}.{name.split('.')[0]}"]
+
+        if self.deps_dir is None or name in sys.modules:
+            return builtins.__import__(name, globals, locals, fromlist, level)
+
+        # the policy's own requirements take precedence while it imports
+        with _lock:
+            deps_path = str(self.deps_dir)
+            sys.path.insert(0, deps_path)
+            try:
+                return builtins.__import__(name, globals, locals, fromlist, level)
+            finally:
+                sys.path.remove(deps_path)
+
+    @staticmethod
+    def _handle_fromlist(module, fromlist):
+        # as with the default __import__, "from pkg import sub" imports submodules
+        # that are not attributes of the package yet
+        if not hasattr(module, "__path__"):
+            return
+
+        names = [name for name in fromlist if name != "*"]
+        if "*" in fromlist:
+            names.extend(getattr(module, "__all__", ()))
+
+        for name in names:
+            if hasattr(module, name):
+                continue
+            submodule = f"{module.__name__}.{name}"
+            try:
+                importlib.import_module(submodule)
+            except ModuleNotFoundError as e:
+                # a missing attribute is left to the ImportError of the from-import
+                if e.name != submodule:
+                    raise
+
+
+class _ScopedLoader(importlib.abc.Loader):
+    def __init__(self, loader, policy: LoadedPolicy):
+        self.loader = loader
+        self.policy = policy
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        module.__dict__["__builtins__"] = self.policy.builtins
+        self.loader.exec_module(module)
+
+
+class PolicyNamespaceFinder(importlib.abc.MetaPathFinder):
+    def find_spec(self, fullname, path, target=None):
+        if not fullname.startswith(NAMESPACE_PREFIX) or "." not in fullname:
+            return None
+
+        policy = _policies.get(fullname.split(".")[0])
+        if policy is None:
+            return None
+
+        spec = PathFinder.find_spec(fullname, path)
+        if spec is not None and spec.loader is not None:
+            spec.loader = _ScopedLoader(spec.loader, policy)
+        return spec
+
+
+def _install_finder():
+    global _finder_installed
+    if not _finder_installed:
+        sys.meta_path.insert(0, PolicyNamespaceFinder())
+        _finder_installed = True
+
+
+def namespace_for(archive_hash: str, instance_id: str = None) -> str:
+    # every evaluator gets its own copy of the policy's modules, module-level
+    # state of one parameterisation never leaks into another
+    namespace = f"{NAMESPACE_PREFIX}{archive_hash[:16]}"
+    if instance_id:
+        namespace += "_" + "".join(c for c in instance_id if c.isalnum())[:16]
+    return namespace
+
+
+def load_policy_module(archive_hash: str, code_dir: Path, deps_dir: Path = None, module_name="function",
+                       instance_id: str = None):
+    namespace = namespace_for(archive_hash, instance_id)
+
+    with _lock:
+        _install_finder()
+
+        policy = _policies.get(namespace)
+        if policy is None:
+            policy = LoadedPolicy(namespace, code_dir, deps_dir)
+            _policies[namespace] = policy
+
+            # the namespace package itself, its submodules are found through __path__
+            spec = importlib.util.spec_from_loader(namespace, loader=None, is_package=True)
+            package = importlib.util.module_from_spec(spec)
+            package.__path__ = [str(policy.code_dir)]
+            sys.modules[namespace] = package
+
+            # fallback for lazy imports made by the dependencies themselves,
+            # kept while any policy using this deps dir is loaded
+            if policy.deps_dir and str(policy.deps_dir) not in sys.path:
+                sys.path.append(str(policy.deps_dir))
+
+        try:
+            module = importlib.import_module(f"{namespace}.{module_name}")
+        except Exception:
+            if policy.refs == 0:
+                _unload(namespace)
+            raise
+
+        policy.refs += 1
+        logging.info(f"Loaded policy {namespace} from {code_dir} (refs={policy.refs})")
+        return namespace, module
+
+
+def _unload(namespace: str):
+    policy = _policies.pop(namespace, None)
+    for name in [name for name in sys.modules if name == namespace or name.startswith(namespace + ".")]:
+        del sys.modules[name]
+
+    if policy and policy.deps_dir:
+        deps_path = str(policy.deps_dir)
+        still_used = any(p.deps_dir and str(p.deps_dir) == deps_path for p in _policies.values())
+        if not still_used and deps_path in sys.path:
+            sys.path.remove(deps_path)
+
+    importlib.invalidate_caches()
+
+
+def unload_policy_module(namespace: str):
+    with _lock:
+        policy = _policies.get(namespace)
+        if policy is None:
+            return
+
+        policy.refs -= 1
+        if policy.refs <= 0:
+            _unload(namespace)
+            logging.info(f"Unloaded policy {namespace}")
+
+
+def loaded_policies():
+    with _lock:
+        return {namespace: policy.refs for namespace, policy in _policies.items()}
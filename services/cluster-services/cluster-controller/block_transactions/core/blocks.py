@@ -3,6 +3,8 @@ from typing import Dict, Any, Union, List
 import requests
 import logging
 
+from .cache_events import block_changed
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -52,7 +54,10 @@ class BlocksClient:
         try:
             response = requests.put(
                 f'{self.BASE_URL}/blocks/{block_id}', json=block_data, timeout=10)
-            return self._handle_response(response)
+            result = self._handle_response(response)
+            if not (isinstance(result, dict) and 'error' in result):
+                block_changed(block_id)
+            return result
         except requests.exceptions.RequestException as e:
             return {'error': str(e)}
 
@@ -60,7 +65,10 @@ class BlocksClient:
         try:
             response = requests.delete(
                 f'{self.BASE_URL}/blocks/{block_id}', timeout=10)
-            return self._handle_response(response)
+            result = self._handle_response(response)
+            if not (isinstance(result, dict) and 'error' in result):
+                block_changed(block_id)
+            return result
         except requests.exceptions.RequestException as e:
             return {'error': str(e)}
 
@@ -0,0 +1,47 @@
+import os
+import json
+import logging
+import threading
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEventsPublisher:
+    # tells the inference server's lookup caches that a block or cluster record changed,
+    # they listen on this channel and drop the affected entries instead of waiting for the TTL
+    def __init__(self):
+        self.host = os.getenv(
+            "CACHE_EVENTS_REDIS_HOST", "inference-server.inference-server.svc.cluster.local")
+        self.port = int(os.getenv("CACHE_EVENTS_REDIS_PORT", 6379))
+        self.channel = os.getenv("CACHE_EVENTS_CHANNEL", "block_cluster_events")
+        self.client = redis.Redis(
+            host=self.host, port=self.port, socket_timeout=2, socket_connect_timeout=2)
+
+    def publish(self, event_type, object_id):
+        # best effort, the record is already written and the caches still expire by TTL
+        try:
+            self.client.publish(self.channel, json.dumps({"type": event_type, "id": object_id}))
+        except Exception as e:
+            logger.warning(f"[CacheEventsPublisher] Failed to publish {event_type} {object_id}: {str(e)}")
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_cache_events_publisher():
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = CacheEventsPublisher()
+        return _publisher
+
+
+def block_changed(block_id):
+    get_cache_events_publisher().publish("block", block_id)
+
+
+def cluster_changed(cluster_id):
+    get_cache_events_publisher().publish("cluster", cluster_id)
@@ -2,6 +2,8 @@ import requests
 import logging
 import os
 
+from .cache_events import cluster_changed
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -45,6 +47,7 @@ class ClustersClient:
             response.raise_for_status()
             result = response.json()
             logger.info(f"Cluster updated: {result}")
+            cluster_changed(cluster_id)
             return result
         except requests.exceptions.RequestException as e:
             if response and response.status_code == 404:
@@ -61,6 +64,7 @@ class ClustersClient:
             response.raise_for_status()
             result = response.json()
             logger.info(f"Cluster deleted: {result}")
+            cluster_changed(cluster_id)
             return result
         except requests.exceptions.RequestException as e:
             if response and response.status_code == 404:
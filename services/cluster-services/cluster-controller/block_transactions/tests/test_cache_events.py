@@ -0,0 +1,85 @@
+import json
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from core import blocks, cache_events, clusters
+
+
+class Response:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.text = json.dumps(body)
+
+    def raise_for_status(self):
+        import requests
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error")
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def events(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(cache_events.redis, "Redis",
+                        lambda **kwargs: fakeredis.FakeRedis(server=server))
+    monkeypatch.setattr(cache_events, "_publisher", None)
+
+    pubsub = fakeredis.FakeRedis(server=server).pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe("block_cluster_events")
+
+    def received():
+        # the ignored subscribe confirmation also reads as None, poll for a while
+        messages = []
+        deadline = time.time() + 0.3
+        while time.time() < deadline:
+            message = pubsub.get_message(timeout=0.05)
+            if message is not None:
+                messages.append(json.loads(message["data"]))
+        return messages
+
+    return received
+
+
+def test_block_update_publishes_event(events, monkeypatch):
+    monkeypatch.setattr(blocks.requests, "put", lambda *a, **kw: Response(200, {"id": "b1"}))
+    blocks.BlockUpdater().update_block_parameters("b1", {"x": 1})
+
+    assert events() == [{"type": "block", "id": "b1"}]
+
+
+def test_failed_block_update_publishes_nothing(events, monkeypatch):
+    monkeypatch.setattr(blocks.requests, "put", lambda *a, **kw: Response(500, {}))
+    result = blocks.BlockUpdater().update_block_parameters("b1", {"x": 1})
+
+    assert "error" in result
+    assert events() == []
+
+
+def test_block_delete_publishes_event(events, monkeypatch):
+    monkeypatch.setattr(blocks.requests, "delete", lambda *a, **kw: Response(200, {}))
+    blocks.BlocksClient().delete_block_by_id("b2")
+
+    assert events() == [{"type": "block", "id": "b2"}]
+
+
+def test_cluster_update_publishes_event(events, monkeypatch):
+    monkeypatch.setenv("CLUSTER_ID", "c1")
+    monkeypatch.setattr(clusters.requests, "put", lambda *a, **kw: Response(200, {"id": "c1"}))
+    clusters.CurrentClusterClient().update_config({"k": "v"})
+
+    assert events() == [{"type": "cluster", "id": "c1"}]
+
+
+def test_unreachable_redis_does_not_fail_the_update(monkeypatch):
+    monkeypatch.setattr(cache_events, "_publisher", None)
+    monkeypatch.setenv("CACHE_EVENTS_REDIS_HOST", "127.0.0.1")
+    monkeypatch.setenv("CACHE_EVENTS_REDIS_PORT", "1")
+    monkeypatch.setattr(blocks.requests, "put", lambda *a, **kw: Response(200, {"id": "b1"}))
+
+    assert blocks.BlockUpdater().update_block_type("b1", "model") == {"id": "b1"}
@@ -0,0 +1,379 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import logging
+import tarfile
+import zipfile
+import subprocess
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+import requests
+
+
+class PolicyArtifact:
+    def __init__(self, archive_hash: str, code_dir: Path, deps_dir: Path = None, pins=None):
+        self.archive_hash = archive_hash
+        self.code_dir = code_dir
+        self.deps_dir = deps_dir
+        self.pins = pins or []
+
+    def release(self):
+        # drops the pins, the store may evict the code and dependencies afterwards
+        for pin in self.pins:
+            pin.close()
+        self.pins = []
+
+
+class PolicyArtifactStore:
+    # node-local store shared by every process on the node:
+    #   entries/<archive sha256>/code   unpacked policy code
+    #   deps/<requirements sha256>      pip --target install of its requirements
+    #   urls/<url sha256>               archive hash, ETag and Last-Modified of a remote URL,
+    #                                   revalidated with a conditional GET once url_ttl has passed
+    # builds are guarded by file locks, entries are evicted LRU over a disk budget.
+    # a loaded artifact holds a shared flock on locks/pin-<name>.lock until it is
+    # released, eviction skips anything it cannot lock exclusively
+    def __init__(self, root: str = None, max_bytes: int = None, url_ttl: float = None, grace_period: float = None,
+                 download_timeout: float = None):
+        self.root = Path(root or os.getenv("POLICY_ARTIFACT_STORE", "/tmp/aios-policy-store"))
+        self.max_bytes = max_bytes or int(os.getenv("POLICY_ARTIFACT_STORE_MAX_BYTES", 2 * 1024 ** 3))
+        self.url_ttl = url_ttl if url_ttl is not None else float(os.getenv("POLICY_ARTIFACT_URL_TTL", 0))
+        self.grace_period = grace_period if grace_period is not None else float(
+            os.getenv("POLICY_ARTIFACT_GRACE_PERIOD", 300))
+        # connect timeout and the longest wait for a chunk of a streamed download
+        self.download_timeout = download_timeout or float(os.getenv("POLICY_ARTIFACT_DOWNLOAD_TIMEOUT", 60))
+
+        for sub in ("entries", "deps", "urls", "locks", "downloads"):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def _file_lock(self, name: str):
+        lock_path = self.root / "locks" / f"{name}.lock"
+        with open(lock_path, "a+") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _pin(self, name: str):
+        # held for the lifetime of the artifact, a pending eviction of the same
+        # entry finishes first and the caller then finds it gone and rebuilds it
+        pin_file = open(self.root / "locks" / f"pin-{name}.lock", "a+")
+        try:
+            fcntl.flock(pin_file.fileno(), fcntl.LOCK_SH)
+        except OSError:
+            pin_file.close()
+            raise
+        return pin_file
+
+    def _lock_unpinned(self, name: str):
+        # returns the exclusively locked pin file, None while any process holds a pin
+        pin_file = open(self.root / "locks" / f"pin-{name}.lock", "a+")
+        try:
+            fcntl.flock(pin_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            pin_file.close()
+            return None
+        return pin_file
+
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _hash_dir(path: Path) -> str:
+        digest = hashlib.sha256()
+        for file_path in sorted(p for p in path.rglob("*") if p.is_file()):
+            digest.update(str(file_path.relative_to(path)).encode())
+            with open(file_path, "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _dir_size(path: Path) -> int:
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+    def _mark_ready(self, path: Path):
+        (path / ".size").write_text(str(self._dir_size(path)))
+        (path / ".ready").touch()
+
+    @staticmethod
+    def _is_ready(path: Path) -> bool:
+        return (path / ".ready").exists()
+
+    @staticmethod
+    def _touch(path: Path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _read_url_record(self, url_file: Path):
+        try:
+            record = json.loads(url_file.read_text())
+        except (OSError, ValueError):
+            return None
+        if not isinstance(record, dict) or not self._is_ready(self.root / "entries" / record.get("archive_hash", "")):
+            return None
+        return record
+
+    def _write_url_record(self, url_file: Path, record: dict):
+        tmp_file = url_file.with_name(f".{url_file.name}.{os.getpid()}")
+        tmp_file.write_text(json.dumps(record))
+        os.replace(tmp_file, url_file)
+
+    def _is_fresh(self, url_file: Path) -> bool:
+        return time.time() - url_file.stat().st_mtime < self.url_ttl
+
+    def _fetch_remote(self, url: str) -> str:
+        url_key = hashlib.sha256(url.encode()).hexdigest()
+        url_file = self.root / "urls" / url_key
+
+        record = self._read_url_record(url_file)
+        if record and self._is_fresh(url_file):
+            return record["archive_hash"]
+
+        with self._file_lock(f"url-{url_key}"):
+            record = self._read_url_record(url_file)
+            if record and self._is_fresh(url_file):
+                return record["archive_hash"]
+
+            # a policy republished under the same URL gets a new ETag / Last-Modified,
+            # an unchanged one costs a 304 instead of a download
+            headers = {}
+            if record and record.get("etag"):
+                headers["If-None-Match"] = record["etag"]
+            if record and record.get("last_modified"):
+                headers["If-Modified-Since"] = record["last_modified"]
+
+            download_path = self.root / "downloads" / f"{url_key}.{os.getpid()}"
+            try:
+                response = requests.get(url, stream=True, headers=headers, timeout=self.download_timeout)
+                if record and response.status_code == 304:
+                    response.close()
+                    self._touch(url_file)
+                    return record["archive_hash"]
+
+                response.raise_for_status()
+                with open(download_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        f.write(chunk)
+                logging.info(f"Downloaded policy archive {url}")
+
+                archive_hash = self._hash_file(download_path)
+                self._build_entry(archive_hash, archive_path=download_path)
+                self._write_url_record(url_file, {
+                    "archive_hash": archive_hash,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified")
+                })
+                return archive_hash
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if record:
+                    logging.warning(f"Could not revalidate policy archive {url}, using cached {record['archive_hash']}: {e}")
+                    return record["archive_hash"]
+                logging.error(f"Error downloading file: {e}")
+                raise
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Error downloading file: {e}")
+                raise
+            finally:
+                if download_path.exists():
+                    download_path.unlink()
+
+    def _build_entry(self, archive_hash: str, archive_path: Path = None, source_dir: Path = None):
+        entry_dir = self.root / "entries" / archive_hash
+        if self._is_ready(entry_dir):
+            return entry_dir
+
+        with self._file_lock(f"entry-{archive_hash}"):
+            if self._is_ready(entry_dir):
+                return entry_dir
+
+            if entry_dir.exists():
+                shutil.rmtree(entry_dir)
+            staging_dir = self.root / "entries" / f".{archive_hash}.{os.getpid()}"
+            if staging_dir.exists():
+                shutil.rmtree(staging_dir)
+            staging_dir.mkdir(parents=True)
+
+            try:
+                if source_dir is not None:
+                    shutil.copytree(source_dir, staging_dir / "code")
+                elif tarfile.is_tarfile(archive_path):
+                    with tarfile.open(archive_path) as tar:
+                        tar.extractall(staging_dir)
+                elif zipfile.is_zipfile(archive_path):
+                    with zipfile.ZipFile(archive_path, "r") as zip_ref:
+                        zip_ref.extractall(staging_dir)
+                else:
+                    raise ValueError("Unsupported file format")
+
+                if not (staging_dir / "code").exists():
+                    raise FileNotFoundError("code/ directory not found in archive")
+
+                self._mark_ready(staging_dir)
+                staging_dir.rename(entry_dir)
+                logging.info(f"Stored policy code {archive_hash}")
+            except Exception as e:
+                logging.error(f"Error extracting archive: {e}")
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                raise
+
+        return entry_dir
+
+    def _build_deps(self, requirements_file: Path, requirements_hash: str):
+        deps_dir = self.root / "deps" / requirements_hash
+        if self._is_ready(deps_dir):
+            self._touch(deps_dir)
+            return deps_dir
+
+        with self._file_lock(f"deps-{requirements_hash}"):
+            if self._is_ready(deps_dir):
+                return deps_dir
+
+            if deps_dir.exists():
+                shutil.rmtree(deps_dir)
+
+            # PIP_FIND_LINKS / PIP_NO_INDEX in the environment allow offline wheel directories
+            staging_dir = self.root / "deps" / f".{requirements_hash}.{os.getpid()}"
+            staging_dir.mkdir(parents=True, exist_ok=True)
+            try:
+                subprocess.check_call([
+                    sys.executable, "-m", "pip", "install", "--target", str(staging_dir),
+                    "-r", str(requirements_file)
+                ])
+                self._mark_ready(staging_dir)
+                staging_dir.rename(deps_dir)
+                logging.info("Installed dependencies from requirements.txt")
+            except subprocess.CalledProcessError as e:
+                logging.error(f"Error installing dependencies: {e}")
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                raise
+
+        return deps_dir
+
+    def prepare(self, download_url: str) -> PolicyArtifact:
+        target_path = Path(download_url)
+        pins = []
+
+        try:
+            if target_path.exists():
+                if target_path.is_file() and (target_path.suffix in [".gz", ".zip", ".xz"] or target_path.suffixes[-2:] == [".tar", ".gz"]):
+                    logging.info(f"Using local archive: {target_path}")
+                    archive_hash = self._hash_file(target_path)
+                    pins.append(self._pin(f"entry-{archive_hash}"))
+                    entry_dir = self._build_entry(archive_hash, archive_path=target_path)
+                elif target_path.is_dir():
+                    logging.info(f"Using local directory: {target_path}")
+                    archive_hash = self._hash_dir(target_path)
+                    pins.append(self._pin(f"entry-{archive_hash}"))
+                    entry_dir = self._build_entry(archive_hash, source_dir=target_path)
+                else:
+                    raise ValueError(
+                        "Unsupported local path format or non-existing path")
+            else:
+                # the hash is only known after the fetch, an entry evicted before the
+                # pin was taken is fetched again
+                for _ in range(3):
+                    archive_hash = self._fetch_remote(download_url)
+                    pin = self._pin(f"entry-{archive_hash}")
+                    entry_dir = self.root / "entries" / archive_hash
+                    if self._is_ready(entry_dir):
+                        pins.append(pin)
+                        break
+                    pin.close()
+                else:
+                    raise RuntimeError(f"policy archive {download_url} was evicted while being prepared")
+
+            self._touch(entry_dir)
+            code_dir = entry_dir / "code"
+
+            deps_dir = None
+            requirements_file = code_dir / "requirements.txt"
+            if requirements_file.exists():
+                requirements_hash = self._hash_file(requirements_file)
+                pins.append(self._pin(f"deps-{requirements_hash}"))
+                deps_dir = self._build_deps(requirements_file, requirements_hash)
+            else:
+                logging.warning("No requirements.txt found")
+        except Exception:
+            for pin in pins:
+                pin.close()
+            raise
+
+        self.evict()
+        return PolicyArtifact(archive_hash, code_dir, deps_dir, pins)
+
+    def _usage(self):
+        items = []
+        for kind in ("entries", "deps"):
+            for path in (self.root / kind).iterdir():
+                if path.name.startswith(".") or not self._is_ready(path):
+                    continue
+                try:
+                    size = int((path / ".size").read_text())
+                except (OSError, ValueError):
+                    size = 0
+                items.append((path.stat().st_mtime, size, kind, path))
+        return items
+
+    def evict(self):
+        items = self._usage()
+        total = sum(size for _, size, _, _ in items)
+        if total <= self.max_bytes:
+            return
+
+        with self._file_lock("gc"):
+            now = time.time()
+            for mtime, size, kind, path in sorted(items):
+                if total <= self.max_bytes:
+                    break
+                if now - mtime < self.grace_period:
+                    continue
+
+                # artifacts loaded by a live process stay, whatever their age
+                name = "entry" if kind == "entries" else "deps"
+                pin = self._lock_unpinned(f"{name}-{path.name}")
+                if pin is None:
+                    continue
+                try:
+                    with self._file_lock(f"{name}-{path.name}"):
+                        shutil.rmtree(path, ignore_errors=True)
+                finally:
+                    pin.close()
+                total -= size
+                logging.info(f"Evicted policy artifact {kind}/{path.name} ({size} bytes)")
+
+    def stats(self):
+        items = self._usage()
+        return {
+            "root": str(self.root),
+            "entries": sum(1 for item in items if item[2] == "entries"),
+            "deps": sum(1 for item in items if item[2] == "deps"),
+            "bytes": sum(item[1] for item in items),
+            "max_bytes": self.max_bytes
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> PolicyArtifactStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PolicyArtifactStore()
+        return _store
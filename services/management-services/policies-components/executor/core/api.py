@@ -1,7 +1,7 @@
 from flask import Flask, request, jsonify
 import requests
 import os
-from .executor import MultiprocessingPolicyRuleExecutor
+from .executor import get_policy_executor
 from .function_infra import PolicyFunctionInfra
 from .job_infra import PolicyJobInfra
 from .output_listener import start_output_listener
@@ -12,7 +12,7 @@ import logging
 
 app = Flask(__name__)
 
-policy_executor = MultiprocessingPolicyRuleExecutor()
+policy_executor = get_policy_executor()
 policy_db = PolicyDB()
 
 namespace = "policies"
@@ -32,6 +32,7 @@ def execute_policy():
         policy_rule_uri = data.get("policy_rule_uri")
         input_data = data.get("input_data")
         parameters = data.get("parameters", None)  # Optional
+        timeout = data.get("timeout", None)  # Optional, seconds
 
         if not policy_rule_uri or not input_data:
             return jsonify({
@@ -40,10 +41,9 @@ def execute_policy():
             }), 400
 
         # Execute the policy
-        result_queue = policy_executor.execute(
-            policy_rule_uri, parameters, input_data)
-
-        output = result_queue.get()
+        output = policy_executor.run(
+            policy_rule_uri, parameters, input_data,
+            timeout=float(timeout) if timeout is not None else None)
 
         return jsonify({
             "success": True,
@@ -54,6 +54,19 @@ def execute_policy():
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+@app.route('/execute_policy/metrics', methods=['GET'])
+def execute_policy_metrics():
+
+    try:
+        if not hasattr(policy_executor, "get_metrics"):
+            return jsonify({"success": False, "message": "metrics are only available in pool mode"}), 400
+
+        return jsonify({"success": True, "data": policy_executor.get_metrics()}), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 @app.route('/deployments', methods=['POST'])
 def create_deployment():
 
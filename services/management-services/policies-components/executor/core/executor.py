@@ -5,7 +5,14 @@ from .code_executor import LocalCodeExecutor
 import logging
 from multiprocessing import Process, Queue, Semaphore
 import os
+import gc
+import json
+import time
+import hashlib
 import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
 from typing import Dict, Any
 
 
@@ -92,3 +99,303 @@ class MultiprocessingPolicyRuleExecutor:
         logging.info(
             f"Started process {process.pid} for policy {policy_rule_uri}")
         return result_queue
+
+    def run(self, policy_rule_uri: str, parameters: Dict[str, Any] = None, input_data: Dict[str, Any] = None,
+            timeout: float = None):
+        return self.execute(policy_rule_uri, parameters, input_data).get(timeout=timeout)
+
+
+def _process_rss_bytes(pid):
+    # current resident set of a worker, read by the pool while the worker runs
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _policy_worker_main(conn, max_policies):
+    # long-lived worker, keeps up to max_policies rules loaded (LRU) in their
+    # own module namespaces and evaluates whatever the pool routes to it
+    logging.basicConfig(level=logging.INFO)
+    executors = OrderedDict()
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+
+        key, code, settings, parameters, input_data = task
+        warm = key in executors
+        evicted = []
+
+        try:
+            executor = executors.get(key)
+            if executor is None:
+                executor = LocalCodeExecutor(
+                    download_url=code, settings=settings, parameters=parameters)
+                executor.init()
+                executors[key] = executor
+                while len(executors) > max_policies:
+                    old_key, old_executor = executors.popitem(last=False)
+                    old_executor.unload()
+                    evicted.append(old_key)
+                if evicted:
+                    gc.collect()
+            executors.move_to_end(key)
+            reply = (True, executor.evaluate(input_data))
+        except Exception as e:
+            logging.error(f"Error in policy worker execution: {e}")
+            reply = (False, str(e))
+
+        try:
+            conn.send(reply + (warm, key in executors, evicted))
+        except Exception as e:
+            # unpicklable results are reported instead of killing the worker
+            conn.send((False, f"failed to send result: {e}", warm, key in executors, evicted))
+
+
+class PolicyWorker:
+    def __init__(self, ctx, max_policies):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_policy_worker_main, args=(child_conn, max_policies), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+        self.warm = OrderedDict()  # mirror of the policies loaded in the worker
+        self.busy = False
+        self.executions = 0
+
+    def stop(self, graceful=True):
+        if graceful and self.process.is_alive():
+            try:
+                self.conn.send(None)
+                self.process.join(timeout=1)
+            except Exception:
+                pass
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class PolicyWorkerPool:
+    # fixed set of worker processes, executions are routed to an idle worker
+    # that already has the policy loaded, timeouts and memory limits are
+    # enforced by replacing the worker. The worker's RSS is watched from here
+    # while an execution runs, so a runaway policy is stopped mid-call
+    def __init__(self, num_workers: int = None, max_policies: int = None, execution_timeout: float = None,
+                 max_memory_mb: int = None, max_executions: int = None, start_method: str = None,
+                 memory_check_interval: float = None):
+        self.num_workers = num_workers or int(
+            os.getenv("POLICY_WORKERS", os.cpu_count() or 1))
+        self.max_policies = max_policies or int(
+            os.getenv("POLICY_WORKER_MAX_POLICIES", 16))
+        self.execution_timeout = execution_timeout or float(
+            os.getenv("POLICY_EXECUTION_TIMEOUT", 300))
+        self.max_memory_mb = max_memory_mb if max_memory_mb is not None else int(
+            os.getenv("POLICY_WORKER_MAX_MEMORY_MB", 1024))
+        self.memory_check_interval = memory_check_interval or float(
+            os.getenv("POLICY_WORKER_MEMORY_CHECK_INTERVAL", 0.1))
+        self.max_executions = max_executions if max_executions is not None else int(
+            os.getenv("POLICY_WORKER_MAX_EXECUTIONS", 0))
+        # the API process runs threads and holds db clients, do not fork it
+        self.ctx = multiprocessing.get_context(
+            start_method or os.getenv("POLICY_WORKER_START_METHOD", "spawn"))
+
+        self.workers = []
+        self.cond = threading.Condition()
+
+        self.metrics = {
+            "executions": 0,
+            "warm_hits": 0,
+            "cold_starts": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "memory_recycles": 0,
+            "execution_recycles": 0,
+            "crashes": 0,
+            "total_queue_delay": 0.0,
+            "max_queue_delay": 0.0
+        }
+
+    def _ensure_started(self):
+        if not self.workers:
+            self.workers = [PolicyWorker(self.ctx, self.max_policies)
+                            for _ in range(self.num_workers)]
+            logging.info(f"Started {self.num_workers} policy workers")
+
+    def _acquire(self, key):
+        start = time.time()
+        with self.cond:
+            self._ensure_started()
+            while True:
+                idle = [w for w in self.workers if not w.busy]
+                if idle:
+                    warm = [w for w in idle if key in w.warm]
+                    # cold: the idle worker with the fewest resident policies
+                    worker = warm[0] if warm else min(idle, key=lambda w: len(w.warm))
+                    break
+                self.cond.wait()
+
+            worker.busy = True
+            delay = time.time() - start
+            self.metrics["total_queue_delay"] += delay
+            self.metrics["max_queue_delay"] = max(self.metrics["max_queue_delay"], delay)
+            return worker
+
+    def _release(self, worker):
+        with self.cond:
+            worker.busy = False
+            self.cond.notify()
+
+    def _recycle(self, worker, reason):
+        logging.warning(
+            f"Recycling policy worker {worker.process.pid}: {reason}")
+        worker.stop(graceful=reason == "max_executions")
+        replacement = PolicyWorker(self.ctx, self.max_policies)
+        replacement.busy = True
+        with self.cond:
+            self.workers[self.workers.index(worker)] = replacement
+        return replacement
+
+    def _over_memory(self, worker):
+        if not self.max_memory_mb:
+            return 0
+        rss = _process_rss_bytes(worker.process.pid)
+        return rss if rss > self.max_memory_mb * 1024 * 1024 else 0
+
+    def _wait(self, worker, timeout):
+        # poll returns as soon as the reply arrives, the slices only bound how
+        # late a worker over the memory limit is noticed
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return "timeout"
+            if worker.conn.poll(min(remaining, self.memory_check_interval)):
+                return None
+            if self._over_memory(worker):
+                return "memory"
+
+    def execute(self, key: str, code: str, settings: dict, parameters: dict, input_data: dict, timeout: float = None):
+        timeout = timeout or self.execution_timeout
+        worker = self._acquire(key)
+
+        try:
+            try:
+                worker.conn.send((key, code, settings, parameters, input_data))
+                stopped = self._wait(worker, timeout)
+                if stopped == "timeout":
+                    with self.cond:
+                        self.metrics["timeouts"] += 1
+                    worker = self._recycle(worker, "timeout")
+                    return {"success": False, "message": f"policy execution timed out after {timeout}s"}
+                if stopped == "memory":
+                    with self.cond:
+                        self.metrics["memory_recycles"] += 1
+                    worker = self._recycle(worker, f"rss over {self.max_memory_mb}MB during execution")
+                    return {"success": False,
+                            "message": f"policy execution exceeded the memory limit of {self.max_memory_mb}MB"}
+                ok, value, warm, resident, evicted = worker.conn.recv()
+            except (EOFError, OSError) as e:
+                with self.cond:
+                    self.metrics["crashes"] += 1
+                worker = self._recycle(worker, f"worker died: {e}")
+                return {"success": False, "message": f"policy worker died during execution: {e}"}
+
+            worker.executions += 1
+            for evicted_key in evicted:
+                worker.warm.pop(evicted_key, None)
+            if resident:
+                worker.warm[key] = True
+                worker.warm.move_to_end(key)
+
+            with self.cond:
+                self.metrics["executions"] += 1
+                self.metrics["warm_hits" if warm else "cold_starts"] += 1
+                if not ok:
+                    self.metrics["failures"] += 1
+
+            # memory kept by the loaded policies after the call
+            rss = self._over_memory(worker)
+            if rss:
+                with self.cond:
+                    self.metrics["memory_recycles"] += 1
+                worker = self._recycle(
+                    worker, f"rss {rss // (1024 * 1024)}MB over {self.max_memory_mb}MB")
+            elif self.max_executions and worker.executions >= self.max_executions:
+                with self.cond:
+                    self.metrics["execution_recycles"] += 1
+                worker = self._recycle(worker, "max_executions")
+
+            return value if ok else {"success": False, "message": value}
+        finally:
+            self._release(worker)
+
+    def get_metrics(self):
+        with self.cond:
+            metrics = dict(self.metrics)
+            metrics["workers"] = len(self.workers)
+            metrics["busy_workers"] = sum(1 for w in self.workers if w.busy)
+            metrics["resident_policies"] = sum(len(w.warm) for w in self.workers)
+
+        executions = metrics["warm_hits"] + metrics["cold_starts"]
+        metrics["warm_hit_ratio"] = metrics["warm_hits"] / executions if executions else 0.0
+        metrics["avg_queue_delay"] = metrics["total_queue_delay"] / executions if executions else 0.0
+        return metrics
+
+    def shutdown(self):
+        with self.cond:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.stop()
+
+
+class PooledPolicyRuleExecutor:
+    def __init__(self, pool: PolicyWorkerPool = None):
+        self.policy_db = PolicyDB()
+        self.pool = pool or PolicyWorkerPool()
+
+    def run(self, policy_rule_uri: str, parameters: Dict[str, Any] = None, input_data: Dict[str, Any] = None,
+            timeout: float = None):
+
+        if not input_data:
+            raise ValueError("input_data is mandatory and cannot be None.")
+
+        try:
+            policy_data = self.policy_db.read(policy_rule_uri)
+            if not policy_data:
+                raise ValueError(
+                    f"Policy rule with URI '{policy_rule_uri}' not found.")
+
+            if parameters is None:
+                parameters = policy_data.policy_parameters
+
+            # the same rule with different code, settings or parameters is a different warm entry
+            fingerprint = hashlib.sha256(json.dumps(
+                [policy_data.code, policy_data.policy_settings, parameters], sort_keys=True, default=str
+            ).encode()).hexdigest()[:16]
+
+            return self.pool.execute(
+                f"{policy_rule_uri}:{fingerprint}", policy_data.code,
+                policy_data.policy_settings, parameters, input_data, timeout)
+        except Exception as e:
+            logging.error(f"Error executing policy {policy_rule_uri}: {e}")
+            return {"success": False, "message": str(e)}
+
+    def get_metrics(self):
+        return self.pool.get_metrics()
+
+
+def get_policy_executor():
+    if os.getenv("POLICY_EXECUTOR_MODE", "pool") == "process":
+        return MultiprocessingPolicyRuleExecutor()
+    return PooledPolicyRuleExecutor()
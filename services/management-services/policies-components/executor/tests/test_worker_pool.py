@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from core.executor import PolicyWorkerPool
+
+RULE = '''
+{body}
+
+class AIOSv1PolicyRule:
+    def __init__(self, rule_id, settings, parameters):
+        self.parameters = parameters
+
+    def eval(self, parameters, input_data, context):
+        return run(input_data)
+'''
+
+POLICIES = {
+    "double": "def run(input_data):\n    return {'value': input_data['x'] * 2}\n",
+    "slow": "import time\n\ndef run(input_data):\n    time.sleep(5)\n    return {}\n",
+    # grows well past the limit during the call and never returns on its own
+    "hog": (
+        "import time\n\n"
+        "def run(input_data):\n"
+        "    blob = []\n"
+        "    for _ in range(400):\n"
+        "        blob.append(b'x' * (8 * 1024 * 1024))\n"
+        "        time.sleep(0.01)\n"
+        "    return {'size': len(blob)}\n"
+    ),
+    # returns quickly but keeps the memory resident in the worker
+    "leak": (
+        "KEPT = []\n\n"
+        "def run(input_data):\n"
+        "    KEPT.append(b'x' * (320 * 1024 * 1024))\n"
+        "    return {'kept': len(KEPT)}\n"
+    ),
+}
+
+MEMORY_LIMIT_MB = 256
+
+
+@pytest.fixture
+def policies(tmp_path, monkeypatch):
+    monkeypatch.setenv("POLICY_ARTIFACT_STORE", str(tmp_path / "store"))
+    paths = {}
+    for name, body in POLICIES.items():
+        code = tmp_path / name / "code"
+        code.mkdir(parents=True)
+        (code / "function.py").write_text(RULE.format(body=body))
+        paths[name] = str(code)
+    return paths
+
+
+def make_pool(memory_check_interval=0.05):
+    return PolicyWorkerPool(num_workers=1, max_memory_mb=MEMORY_LIMIT_MB, execution_timeout=30,
+                            start_method="fork", memory_check_interval=memory_check_interval)
+
+
+@pytest.fixture
+def pool():
+    pool = make_pool()
+    yield pool
+    pool.shutdown()
+
+
+def run(pool, policies, name, timeout=None):
+    return pool.execute(name, policies[name], {}, {}, {"x": 21}, timeout=timeout)
+
+
+def test_warm_executions_reuse_the_worker(pool, policies):
+    assert run(pool, policies, "double") == {"value": 42}
+    pid = pool.workers[0].process.pid
+    assert run(pool, policies, "double") == {"value": 42}
+
+    metrics = pool.get_metrics()
+    assert pool.workers[0].process.pid == pid
+    assert metrics["cold_starts"] == 1 and metrics["warm_hits"] == 1
+
+
+def test_memory_limit_stops_the_worker_during_the_call(pool, policies):
+    run(pool, policies, "double")
+    pid = pool.workers[0].process.pid
+
+    start = time.time()
+    result = run(pool, policies, "hog")
+    assert result["success"] is False
+    assert "memory limit" in result["message"]
+    # stopped long before the policy would have finished allocating
+    assert time.time() - start < 3
+
+    assert pool.get_metrics()["memory_recycles"] == 1
+    assert pool.workers[0].process.pid != pid
+    # the replacement serves the next execution
+    assert run(pool, policies, "double") == {"value": 42}
+
+
+def test_memory_kept_after_the_call_recycles_the_worker(policies):
+    # checked only once the call returned
+    pool = make_pool(memory_check_interval=30)
+    try:
+        assert run(pool, policies, "leak") == {"kept": 1}
+        assert pool.get_metrics()["memory_recycles"] == 1
+        # the fresh worker starts without the leaked memory
+        assert run(pool, policies, "leak") == {"kept": 1}
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_recycles_the_worker(pool, policies):
+    result = run(pool, policies, "slow", timeout=0.5)
+    assert result["success"] is False
+    assert "timed out" in result["message"]
+    assert pool.get_metrics()["timeouts"] == 1
+    assert run(pool, policies, "double") == {"value": 42}
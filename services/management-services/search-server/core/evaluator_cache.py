@@ -0,0 +1,260 @@
+import os
+import copy
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from .policy_sandbox import LocalPolicyEvaluator
+from .webhooks.policies import PoliciesQueryClient
+
+logger = logging.getLogger(__name__)
+
+
+def _unload(evaluator):
+    executor = getattr(evaluator, "executor", None)
+    if executor is not None:
+        executor.unload()
+
+
+class CachedEvaluator:
+    # up to pool_size evaluators of one policy. Policy rule instances may keep
+    # state between calls, so each evaluator runs one evaluation at a time, and
+    # concurrent searches take different evaluators instead of queueing on one
+    def __init__(self, key, evaluator, version, factory=None, pool_size=1):
+        self.key = key
+        self.version = version
+        self.checked_at = time.time()
+        self.revalidating = False
+        self.factory = factory
+        self.pool_size = max(1, pool_size)
+        self.idle = [evaluator]
+        self.size = 1
+        self.cond = threading.Condition()
+        self.closed = False
+
+    def acquire(self):
+        # None once the entry is closed, the caller looks the policy up again
+        with self.cond:
+            while True:
+                if self.closed:
+                    return None
+                if self.idle:
+                    return self.idle.pop()
+                if self.factory is not None and self.size < self.pool_size:
+                    self.size += 1
+                    break
+                self.cond.wait()
+
+        # code and dependencies are already in the artifact store, only the import runs
+        try:
+            return self.factory()
+        except Exception:
+            with self.cond:
+                self.size -= 1
+                self.cond.notify()
+            raise
+
+    def release(self, evaluator):
+        with self.cond:
+            closed = self.closed
+            if not closed:
+                self.idle.append(evaluator)
+                self.cond.notify()
+        if closed:
+            _unload(evaluator)
+
+    def close(self):
+        # idle evaluators are unloaded now, busy ones when they are released
+        with self.cond:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.cond.notify_all()
+        for evaluator in idle:
+            _unload(evaluator)
+
+
+class PendingLoad:
+    def __init__(self):
+        self.event = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class PolicyEvaluatorCache:
+    # process-wide LRU of initialized evaluators keyed by policy rule URI and
+    # parameters, concurrent misses for the same key share one load
+    def __init__(self, max_size: int = None, revalidate_interval: float = None, policies_client=None,
+                 pool_size: int = None):
+        self.max_size = max_size or int(
+            os.getenv("POLICY_EVALUATOR_CACHE_SIZE", 32))
+        # concurrent evaluations per cached policy
+        self.pool_size = pool_size or int(
+            os.getenv("POLICY_EVALUATOR_POOL_SIZE", 4))
+        self.revalidate_interval = revalidate_interval if revalidate_interval is not None else float(
+            os.getenv("POLICY_EVALUATOR_REVALIDATE_INTERVAL", 30))
+        self.policies_client = policies_client
+
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_failures": 0,
+            "reloads": 0,
+            "revalidations": 0,
+            "revalidation_failures": 0,
+            "evictions": 0
+        }
+
+    @staticmethod
+    def make_key(policy_rule_uri, parameters):
+        return f"{policy_rule_uri}:{json.dumps(parameters, sort_keys=True, default=str)}"
+
+    def _fetch_version(self, policy_rule_uri):
+        if self.policies_client is None:
+            self.policies_client = PoliciesQueryClient()
+        return self.policies_client.get_policy_version(policy_rule_uri)
+
+    def _load(self, key, policy_rule_uri, parameters, settings):
+        try:
+            version = self._fetch_version(policy_rule_uri)
+        except Exception as e:
+            logger.warning(f"[PolicyEvaluatorCache] version lookup failed for {policy_rule_uri}: {e}")
+            version = None
+
+        # the evaluator merges policy defaults into the dicts it is given
+        def factory():
+            return LocalPolicyEvaluator(
+                policy_rule_uri, settings=dict(settings or {}), parameters=copy.deepcopy(parameters))
+
+        return CachedEvaluator(key, factory(), version, factory=factory, pool_size=self.pool_size)
+
+    def _get_or_load(self, policy_rule_uri, parameters, settings, stale=None):
+        key = self.make_key(policy_rule_uri, parameters)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry is not stale:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry
+
+            pending = self.pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = PendingLoad()
+                self.pending[key] = pending
+                self.stats["misses"] += 1
+
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.entry
+
+        evicted = []
+        try:
+            entry = self._load(key, policy_rule_uri, parameters, settings)
+            with self.lock:
+                replaced = self.entries.pop(key, None)
+                if replaced is not None:
+                    evicted.append(replaced)
+                    self.stats["reloads"] += 1
+                self.entries[key] = entry
+                self.stats["loads"] += 1
+                while len(self.entries) > self.max_size:
+                    _, old = self.entries.popitem(last=False)
+                    evicted.append(old)
+                    self.stats["evictions"] += 1
+            pending.entry = entry
+            return entry
+        except Exception as e:
+            with self.lock:
+                self.stats["load_failures"] += 1
+            pending.error = e
+            raise
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+            pending.event.set()
+            # evaluators still running on the old entries are unloaded when released
+            for old in evicted:
+                old.close()
+
+    def _revalidate(self, entry, policy_rule_uri):
+        with self.lock:
+            if entry.revalidating or time.time() - entry.checked_at < self.revalidate_interval:
+                return False
+            entry.revalidating = True
+
+        try:
+            version = self._fetch_version(policy_rule_uri)
+            with self.lock:
+                self.stats["revalidations"] += 1
+            changed = version is not None and version != entry.version
+            if changed:
+                logger.info(f"[PolicyEvaluatorCache] policy {policy_rule_uri} changed in the registry, reloading")
+            return changed
+        except Exception as e:
+            # keep serving the loaded version while the registry is unreachable
+            with self.lock:
+                self.stats["revalidation_failures"] += 1
+            logger.warning(f"[PolicyEvaluatorCache] revalidation failed for {policy_rule_uri}: {e}")
+            return False
+        finally:
+            entry.checked_at = time.time()
+            entry.revalidating = False
+
+    def get(self, policy_rule_uri, parameters, settings=None):
+        entry = self._get_or_load(policy_rule_uri, parameters, settings)
+        if self._revalidate(entry, policy_rule_uri):
+            entry = self._get_or_load(policy_rule_uri, parameters, settings, stale=entry)
+        return entry
+
+    def execute(self, policy_rule_uri, parameters, settings, input_data):
+        while True:
+            entry = self.get(policy_rule_uri, parameters, settings)
+            evaluator = entry.acquire()
+            # evicted or replaced between lookup and evaluation, look it up again
+            if evaluator is None:
+                continue
+            try:
+                return evaluator.execute_policy_rule(input_data)
+            finally:
+                entry.release(evaluator)
+
+    def invalidate(self, policy_rule_uri=None):
+        with self.lock:
+            keys = [key for key in self.entries
+                    if policy_rule_uri is None or key.startswith(f"{policy_rule_uri}:")]
+            removed = [self.entries.pop(key) for key in keys]
+
+        for entry in removed:
+            entry.close()
+        return len(removed)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self.entries)
+            stats["max_size"] = self.max_size
+            stats["evaluators"] = sum(entry.size for entry in self.entries.values())
+            stats["loading"] = len(self.pending)
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_evaluator_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PolicyEvaluatorCache()
+        return _cache
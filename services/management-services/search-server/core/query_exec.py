@@ -0,0 +1,392 @@
+import os
+import logging
+import threading
+
+from pymongo import MongoClient
+
+from .similarity_search import query_translator, query_translator_old
+
+logger = logging.getLogger(__name__)
+
+# <database>.<collection> of each store, defaults follow the registries and metrics services
+STORES = {
+    "blocks": os.getenv("SEARCH_BLOCKS_STORE", "blocks.blocks"),
+    "clusters": os.getenv("SEARCH_CLUSTERS_STORE", "blocks.clusters"),
+    "blockMetrics": os.getenv("SEARCH_BLOCK_METRICS_STORE", "block_metrics.block_metrics"),
+    "clusterMetrics": os.getenv("SEARCH_CLUSTER_METRICS_STORE", "cluster_metrics.cluster_metrics")
+}
+
+
+def _store(name):
+    db, collection = STORES[name].split(".", 1)
+    return db, collection
+
+
+def _get_path(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _sort_key(value):
+    # follows the BSON order of the types join keys take: null, numbers, strings
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, str(value))
+
+
+def _exclude(fields):
+    return {"$project": {field: 0 for field in fields}}
+
+
+def _prefix_match(match, prefix):
+    # rewrites a find-style filter to apply to the joined array field, None when
+    # the filter needs $expr and has to run inside a lookup pipeline
+    if isinstance(match, list):
+        items = [_prefix_match(item, prefix) for item in match]
+        return None if any(item is None for item in items) else items
+
+    prefixed = {}
+    for key, value in match.items():
+        if key == "$expr":
+            return None
+        if key in ("$and", "$or", "$nor"):
+            value = _prefix_match(value, prefix)
+            if value is None:
+                return None
+            prefixed[key] = value
+        else:
+            prefixed[f"{prefix}.{key}"] = value
+    return prefixed
+
+
+def _computed_fields(pipeline):
+    fields = []
+    for stage in pipeline:
+        if "$set" in stage:
+            fields.extend(stage["$set"].keys())
+    return fields
+
+
+class JoinSpec:
+    def __init__(self, store, local_field, foreign_field, pipeline, required, attach=None, none_if_empty=False):
+        self.store = store
+        self.local_field = local_field
+        self.foreign_field = foreign_field
+        self.pipeline = pipeline
+        self.required = required
+        self.attach = attach
+        # the HTTP path answers None instead of [] when this store matches nothing
+        self.none_if_empty = none_if_empty
+
+
+class FilterPlan:
+    def __init__(self, store, match, joins):
+        self.store = store
+        self.match = match
+        self.joins = joins
+
+
+def compile_filter(filter_type, query):
+    # block/cluster filters become one primary scan joined with the other stores,
+    # other filter types stay on the HTTP path
+    if filter_type == "block":
+        joins = []
+        if query.get('clusterQuery'):
+            joins.append(JoinSpec(
+                "clusters", "cluster.id", "id",
+                [{"$match": query_translator_old(query['clusterQuery'])}], required=True, none_if_empty=True))
+
+        if query.get('blockMetricsQuery'):
+            pipeline = query_translator(query['blockMetricsQuery'])["__pipeline__"]
+            joins.append(JoinSpec(
+                "blockMetrics", "id", "blockId", pipeline, required=True, attach="metrics"))
+        else:
+            joins.append(JoinSpec(
+                "blockMetrics", "id", "blockId", [], required=False, attach="metrics"))
+
+        match = query_translator_old(query['blockQuery']) if query.get('blockQuery') else {}
+        return FilterPlan("blocks", match, joins)
+
+    if filter_type == "cluster":
+        joins = []
+        if query.get('clusterMetricsQuery'):
+            pipeline = query_translator(query['clusterMetricsQuery'])["__pipeline__"]
+            joins.append(JoinSpec(
+                "clusterMetrics", "id", "clusterId", pipeline, required=True, none_if_empty=True))
+
+        match = query_translator_old(query['clusterQuery']) if query.get('clusterQuery') else {}
+        return FilterPlan("clusters", match, joins)
+
+    return None
+
+
+class MongoFilterExecutor:
+    # joins against stores in the primary's database run as $lookup stages of a
+    # single pipeline. Stores in other databases joined on one primary field are
+    # merged with the primary cursor, both sorted on the join key, so neither side
+    # is held in memory. Otherwise only the matching join keys are collected (and
+    # pushed down as $in when small) and attached documents are fetched per batch
+    def __init__(self, client=None, batch_size=None, pushdown_limit=None):
+        self.client = client or MongoClient(os.getenv("SEARCH_MONGO_URL"))
+        self.batch_size = batch_size or int(os.getenv("SEARCH_JOIN_BATCH_SIZE", 500))
+        self.pushdown_limit = pushdown_limit if pushdown_limit is not None else int(
+            os.getenv("SEARCH_JOIN_PUSHDOWN_LIMIT", 1000))
+
+    def _collection(self, store):
+        db, collection = _store(store)
+        return self.client[db][collection]
+
+    def _is_local(self, plan, join):
+        return _store(join.store)[0] == _store(plan.store)[0]
+
+    def _lookup_stages(self, join):
+        field = f"_join_{join.store}"
+
+        matches = [stage["$match"] for stage in join.pipeline if list(stage) == ["$match"]]
+        prefixed = _prefix_match(matches, field) if len(matches) == len(join.pipeline) else None
+
+        if prefixed is not None:
+            # plain equality join, filters are applied to the joined document
+            stages = [{"$lookup": {
+                "from": _store(join.store)[1],
+                "localField": join.local_field,
+                "foreignField": join.foreign_field,
+                "as": field
+            }}]
+            stages += [{"$match": match} for match in prefixed]
+        else:
+            pipeline = [{"$match": {"$expr": {"$eq": [f"${join.foreign_field}", "$$key"]}}}]
+            pipeline += join.pipeline
+            pipeline += [{"$limit": 1}, _exclude(["_id"] + _computed_fields(join.pipeline))]
+            stages = [{"$lookup": {
+                "from": _store(join.store)[1],
+                "let": {"key": f"${join.local_field}"},
+                "pipeline": pipeline,
+                "as": field
+            }}]
+
+        if join.required:
+            stages.append({"$match": {f"{field}.0": {"$exists": True}}})
+        if join.attach:
+            stages.append({"$set": {join.attach: {
+                "$ifNull": [{"$arrayElemAt": [f"${field}", 0]}, {}]}}})
+        stages.append(_exclude([field]))
+        return stages
+
+    def _remote_pipeline(self, join):
+        return join.pipeline + [_exclude(["_id"] + _computed_fields(join.pipeline))]
+
+    def _merge_field(self, plan):
+        fields = {join.local_field for join in plan.joins if not self._is_local(plan, join)}
+        return fields.pop() if len(fields) == 1 else None
+
+    def primary_pipeline(self, plan, pushdown=None, sort=None):
+        pipeline = [{"$match": plan.match}] if plan.match else []
+        for field, keys in (pushdown or {}).items():
+            pipeline.append({"$match": {field: {"$in": keys}}})
+        if sort:
+            pipeline.append({"$sort": {sort: 1}})
+        for join in plan.joins:
+            if self._is_local(plan, join):
+                pipeline += self._lookup_stages(join)
+        return pipeline
+
+    def _sorted_pipeline(self, join):
+        return join.pipeline + [{"$sort": {join.foreign_field: 1}}] + \
+            [_exclude(["_id"] + _computed_fields(join.pipeline))]
+
+    def _merge(self, docs, join):
+        # docs and the remote matches arrive sorted on the join key, each remote
+        # document is read once and only the current one is held
+        remote = iter(self._collection(join.store).aggregate(
+            self._sorted_pipeline(join), batchSize=self.batch_size, allowDiskUse=True))
+        current = next(remote, None)
+        for doc in docs:
+            key = _get_path(doc, join.local_field)
+            joined = None
+            if key is not None:
+                while current is not None and \
+                        _sort_key(_get_path(current, join.foreign_field)) < _sort_key(key):
+                    current = next(remote, None)
+                if current is not None and _get_path(current, join.foreign_field) == key:
+                    joined = current
+
+            if joined is None and join.required:
+                continue
+            if join.attach:
+                doc[join.attach] = joined or {}
+            yield doc
+
+    def _keys_pipeline(self, join):
+        return join.pipeline + [{"$project": {"_id": 0, join.foreign_field: 1}}]
+
+    def _build_keys(self, join):
+        # only the join keys of the remote matches are held, never their documents
+        cursor = self._collection(join.store).aggregate(
+            self._keys_pipeline(join), batchSize=self.batch_size)
+        keys = set()
+        for doc in cursor:
+            key = _get_path(doc, join.foreign_field)
+            if key is not None:
+                keys.add(key)
+        return keys
+
+    def _fetch_batch(self, join, keys):
+        # bounded by batch_size, attaches docs to one batch of candidates
+        pipeline = [{"$match": {join.foreign_field: {"$in": keys}}}] + self._remote_pipeline(join)
+        return {_get_path(doc, join.foreign_field): doc
+                for doc in self._collection(join.store).aggregate(pipeline)}
+
+    def _emit(self, batch, attach_joins):
+        for join in attach_joins:
+            keys = [_get_path(doc, join.local_field) for doc in batch]
+            found = self._fetch_batch(join, [key for key in keys if key is not None])
+            kept = []
+            for doc, key in zip(batch, keys):
+                joined = found.get(key)
+                # a required match that went away since the keys were read drops the candidate
+                if joined is None and join.required:
+                    continue
+                doc[join.attach] = joined or {}
+                kept.append(doc)
+            batch = kept
+
+        for doc in batch:
+            if "_id" in doc:
+                doc["_id"] = str(doc["_id"])
+            yield doc
+
+    def _execute_merge(self, plan, field):
+        docs = self._collection(plan.store).aggregate(
+            self.primary_pipeline(plan, sort=field), batchSize=self.batch_size, allowDiskUse=True)
+        for join in plan.joins:
+            if not self._is_local(plan, join):
+                docs = self._merge(docs, join)
+
+        for doc in docs:
+            if "_id" in doc:
+                doc["_id"] = str(doc["_id"])
+            yield doc
+
+    def execute(self, plan: FilterPlan):
+        merge_field = self._merge_field(plan)
+        if merge_field is not None:
+            yield from self._execute_merge(plan, merge_field)
+            return
+
+        key_joins = []
+        attach_joins = []
+        pushdown = {}
+
+        for join in plan.joins:
+            if self._is_local(plan, join):
+                continue
+            if join.attach:
+                attach_joins.append(join)
+            if not join.required:
+                continue
+
+            keys = self._build_keys(join)
+            if not keys:
+                return
+            if len(keys) <= self.pushdown_limit:
+                pushdown[join.local_field] = list(keys)
+            key_joins.append((join, keys))
+
+        cursor = self._collection(plan.store).aggregate(
+            self.primary_pipeline(plan, pushdown), batchSize=self.batch_size, allowDiskUse=True)
+
+        batch = []
+        for doc in cursor:
+            if any(_get_path(doc, join.local_field) not in keys for join, keys in key_joins):
+                continue
+
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                yield from self._emit(batch, attach_joins)
+                batch = []
+
+        if batch:
+            yield from self._emit(batch, attach_joins)
+
+    def explain(self, plan: FilterPlan, verbose=False):
+        db, collection = _store(plan.store)
+        merge_field = self._merge_field(plan)
+        primary = self.primary_pipeline(plan, sort=merge_field)
+        steps = [{
+            "store": plan.store,
+            "collection": f"{db}.{collection}",
+            "strategy": "primary",
+            "pipeline": primary
+        }]
+
+        for join in plan.joins:
+            if self._is_local(plan, join):
+                strategy = "lookup"
+            elif merge_field is not None:
+                strategy = "merge_join"
+            elif join.required:
+                strategy = "key_join"
+            else:
+                strategy = "batched_attach"
+            step = {
+                "store": join.store,
+                "collection": STORES[join.store],
+                "strategy": strategy,
+                "local_field": join.local_field,
+                "foreign_field": join.foreign_field
+            }
+            if strategy == "merge_join":
+                step["pipeline"] = self._sorted_pipeline(join)
+                if join.attach:
+                    step["attach"] = join.attach
+            if strategy == "key_join":
+                step["pipeline"] = self._keys_pipeline(join)
+            if strategy in ("key_join", "batched_attach") and join.attach:
+                step["attach"] = join.attach
+                step["attach_pipeline"] = self._remote_pipeline(join)
+            steps.append(step)
+
+        if verbose:
+            for step in steps:
+                if step["strategy"] in ("primary", "merge_join", "key_join"):
+                    step_db, step_collection = _store(step["store"])
+                    step["explain"] = self.client[step_db].command(
+                        "explain", {"aggregate": step_collection, "pipeline": step["pipeline"], "cursor": {}},
+                        verbosity="queryPlanner")
+
+        return {"mode": "mongo", "steps": steps}
+
+    def _has_match(self, join):
+        cursor = self._collection(join.store).aggregate(join.pipeline + [{"$limit": 1}])
+        return next(iter(cursor), None) is not None
+
+    def execute_filter(self, filter_type, query):
+        # the checks run now, the candidates are produced lazily as they are consumed
+        plan = compile_filter(filter_type, query)
+        for join in plan.joins:
+            if join.none_if_empty and not self._has_match(join):
+                return None
+        return self.execute(plan)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_filter_executor():
+    # direct store access is opt-in, without SEARCH_MONGO_URL filters go through the HTTP clients
+    global _executor
+    if not os.getenv("SEARCH_MONGO_URL"):
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = MongoFilterExecutor()
+        return _executor
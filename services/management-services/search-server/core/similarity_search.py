@@ -2,7 +2,7 @@ import os
 import logging
 
 from .webhooks.blocks import BlocksClient
-from .policy_sandbox import LocalPolicyEvaluator
+from .evaluator_cache import get_evaluator_cache
 from .webhooks.clusters import ClusterClient
 from .webhooks.global_metrics import GlobalBlocksMetricsClient, GlobalClusterMetricsClient
 from .webhooks.component_registry import ComponentRegistryDB
@@ -322,9 +322,20 @@ def prepare_metrics_for_blocks(blocks):
         raise e
 
 
-def execute_filter(filter_type, query):
+def execute_filter(filter_type, query, stream=False):
     try:
 
+        # block/cluster filters run as server-side joins when the stores are reachable directly,
+        # with stream=True their candidates are returned as an iterator
+        if filter_type in ["block", "cluster"]:
+            from .query_exec import get_filter_executor
+            executor = get_filter_executor()
+            if executor is not None:
+                results = executor.execute_filter(filter_type, query)
+                if results is None or stream:
+                    return results
+                return list(results)
+
         if filter_type == "component":
             _, components = execute_query("component", query['componentQuery'])
             return components
@@ -492,18 +503,33 @@ class FilterSearch:
         self.ir = ir
         logging.info("received filter IR: {}".format(ir))
 
-    def execute(self):
+    def execute(self, stream=False):
         try:
 
             filter_type = self.ir['matchType']
             filter_query = self.ir['filter']
 
-            results = execute_filter(filter_type, filter_query)
+            results = execute_filter(filter_type, filter_query, stream=stream)
             return results
 
         except Exception as e:
             raise e
 
+    def explain(self, verbose=False):
+        from .query_exec import get_filter_executor, compile_filter
+
+        filter_type = self.ir['matchType']
+        filter_query = self.ir['filter']
+
+        executor = get_filter_executor()
+        plan = compile_filter(filter_type, filter_query)
+        if executor is None or plan is None:
+            # one query per entity, IDs are passed along as $in filters
+            steps = [key for key in filter_query.keys() if filter_query.get(key)]
+            return {"mode": "http", "steps": steps}
+
+        return executor.explain(plan, verbose=verbose)
+
 
 class SimilaritySearch:
 
@@ -516,14 +542,15 @@ class SimilaritySearch:
         self.cluster_metrics_api_client = GlobalClusterMetricsClient()
         self.block_metrics_api_client = GlobalBlocksMetricsClient()
 
-        settings = {
+        self.settings = {
             "block_metrics_api": self.block_metrics_api_client,
             "cluster_metrics_api": self.cluster_metrics_api_client
         }
 
-        self.policy_rule = LocalPolicyEvaluator(
-            self.ranking_policy_rule['policyRuleURI'], settings=settings, parameters=self.ranking_policy_rule['parameters']
-        )
+        # evaluators are loaded once per policy and parameters and shared across requests
+        self.evaluator_cache = get_evaluator_cache()
+        self.evaluator_cache.get(
+            self.ranking_policy_rule['policyRuleURI'], self.ranking_policy_rule['parameters'], self.settings)
 
         self.filter = self.ranking_policy_rule['parameters'].get(
             'filterRule', None)
@@ -542,7 +569,9 @@ class SimilaritySearch:
             if not inputs or len(inputs) == 0:
                 return []
 
-            result = self.policy_rule.execute_policy_rule(inputs)
+            result = self.evaluator_cache.execute(
+                self.ranking_policy_rule['policyRuleURI'], self.ranking_policy_rule['parameters'],
+                self.settings, inputs)
             return result
 
         except Exception as e:
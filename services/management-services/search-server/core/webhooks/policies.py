@@ -1,3 +1,4 @@
+import json
 import requests
 import os
 
@@ -18,6 +19,19 @@ class PoliciesQueryClient:
 
         return self._post_request("/policy/query", query_filter)
 
+    def get_policy_version(self, policy_rule_uri: str):
+
+        policies = self.query_policies({"policy_rule_uri": policy_rule_uri})
+        if not policies:
+            return None
+
+        # anything that changes what the evaluator would load counts as a new version
+        policy = policies[0]
+        return json.dumps([
+            policy.get("version"), policy.get("release_tag"), policy.get("code"),
+            policy.get("policy_settings"), policy.get("policy_parameters")
+        ], sort_keys=True, default=str)
+
     def _post_request(self, endpoint: str, query_filter: dict):
 
         url = f"{self.base_url}{endpoint}"
@@ -1,14 +1,30 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+import json
 import logging
 
 from core.action import filter_data, similarity_search
 from core.similarity_search import SimilaritySearch, FilterSearch
+from core.evaluator_cache import get_evaluator_cache
 
 app = Flask(__name__)
 
 logging.basicConfig(level=logging.INFO)
 
 
+def stream_results(first, results):
+    # same body as jsonify({"success": True, "data": [...]}), written as the
+    # candidates come off the cursor
+    yield '{"success": true, "data": [' + json.dumps(first, default=str)
+    count = 1
+    try:
+        for doc in results:
+            yield "," + json.dumps(doc, default=str)
+            count += 1
+    finally:
+        logging.info(f"filter search output: {count} streamed results")
+    yield ']}'
+
+
 @app.route('/api/filter-data', methods=['POST'])
 def api_filter_data():
     try:
@@ -75,7 +91,15 @@ def api_filter_search_no_ir():
             raise ValueError("Missing or invalid JSON body")
 
         search = FilterSearch(input_data)
-        result = search.execute()
+        result = search.execute(stream=True)
+
+        if result is not None and not isinstance(result, list):
+            # the first candidate is read here, so query errors still answer 400
+            first = next(result, None)
+            if first is not None:
+                return Response(stream_with_context(stream_results(first, result)),
+                                mimetype="application/json"), 200
+            result = []
 
         logging.info(f"filter search output: {result}")
 
@@ -87,5 +111,39 @@ def api_filter_search_no_ir():
         return jsonify({"success": False, "message": str(e)}), 400
 
 
+@app.route('/api/no-ir/filter/explain', methods=['POST'])
+def api_filter_explain_no_ir():
+    try:
+        input_data = request.get_json()
+        if not input_data:
+            raise ValueError("Missing or invalid JSON body")
+
+        verbose = request.args.get("verbose", "false").lower() == "true"
+        result = FilterSearch(input_data).explain(verbose=verbose)
+
+        return jsonify({"success": True, "data": result}), 200
+
+    except Exception as e:
+        logging.error(f"Error in /api/no-ir/filter/explain: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 400
+
+
+@app.route('/api/evaluators/stats', methods=['GET'])
+def api_evaluator_cache_stats():
+    return jsonify({"success": True, "data": get_evaluator_cache().get_stats()}), 200
+
+
+@app.route('/api/evaluators/invalidate', methods=['POST'])
+def api_evaluator_cache_invalidate():
+    try:
+        input_data = request.get_json(silent=True) or {}
+        removed = get_evaluator_cache().invalidate(input_data.get("policyRuleURI"))
+        return jsonify({"success": True, "data": {"removed": removed}}), 200
+
+    except Exception as e:
+        logging.error(f"Error in /api/evaluators/invalidate: {str(e)}")
+        return jsonify({"success": False, "message": str(e)}), 400
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=12000, debug=True)
@@ -0,0 +1,85 @@
+# python -m tests.bench_query_exec
+# block filter over a synthetic 10k block fleet in mongomock: HTTP path (four queries,
+# ID lists shipped as $in) against the compiled join, plus the join's explain output
+import json
+import time
+import logging
+
+from core.query_exec import MongoFilterExecutor, compile_filter
+from tests.test_query_exec import BLOCK_QUERY, http_filter, make_fleet, normalize
+
+
+class CountingClient:
+    # counts the queries the search server sends and the documents the stores
+    # hand back, calls mongomock makes internally (e.g. for $lookup) are not counted
+    def __init__(self, client):
+        self.client = client
+        self.calls = 0
+        self.docs = 0
+        self.bytes = 0
+
+    def __getitem__(self, db):
+        return CountingDatabase(self, self.client[db])
+
+    def __getattr__(self, db):
+        return self[db]
+
+
+class CountingDatabase:
+    def __init__(self, counter, db):
+        self.counter = counter
+        self.db = db
+
+    def __getitem__(self, name):
+        return CountingCollection(self.counter, self.db[name])
+
+    def __getattr__(self, name):
+        return self[name]
+
+    def command(self, *args, **kwargs):
+        return self.db.command(*args, **kwargs)
+
+
+class CountingCollection:
+    def __init__(self, counter, collection):
+        self.counter = counter
+        self.collection = collection
+
+    def _count(self, docs):
+        docs = list(docs)
+        self.counter.calls += 1
+        self.counter.docs += len(docs)
+        self.counter.bytes += sum(len(json.dumps(doc, default=str)) for doc in docs)
+        return iter(docs)
+
+    def find(self, *args, **kwargs):
+        return self._count(self.collection.find(*args, **kwargs))
+
+    def aggregate(self, *args, **kwargs):
+        return self._count(self.collection.aggregate(*args, **kwargs))
+
+
+def run(client, fn):
+    counter = CountingClient(client)
+    start = time.perf_counter()
+    result = fn(counter)
+    return result, time.perf_counter() - start, counter
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    client = make_fleet(10000, num_clusters=200)
+    for collection, field in ((client.blocks.blocks, "id"), (client.blocks.clusters, "id"),
+                              (client.block_metrics.block_metrics, "blockId")):
+        collection.create_index(field)
+
+    old, t_old, c_old = run(client, lambda counted: http_filter(counted, "block", BLOCK_QUERY))
+    new, t_new, c_new = run(client, lambda counted: list(
+        MongoFilterExecutor(client=counted).execute_filter("block", BLOCK_QUERY)))
+    executor = MongoFilterExecutor(client=client)
+
+    for name, result, elapsed, counter in (("http path", old, t_old, c_old), ("join", new, t_new, c_new)):
+        print(f"{name:<10} {len(result)} blocks {elapsed:6.2f}s  {counter.calls:2d} store calls  "
+              f"{counter.docs:6d} docs / {counter.bytes / 1024:7.1f} KiB returned")
+    print(f"identical results: {normalize(old) == normalize(new)}")
+    print(json.dumps(executor.explain(compile_filter("block", BLOCK_QUERY)), indent=1))
@@ -0,0 +1,136 @@
+import time
+import zipfile
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from core import evaluator_cache, similarity_search
+from core.evaluator_cache import PolicyEvaluatorCache
+from core.policy_sandbox import artifact_store
+from core.policy_sandbox.client import PolicyDBClient
+
+RULE = '''
+import time
+import tinydep
+
+class AIOSv1PolicyRule:
+    def __init__(self, rule_id, settings, parameters):
+        self.parameters = parameters
+
+    def eval(self, parameters, input_data, context):
+        time.sleep(self.parameters.get("delay", 0))
+        return sorted(input_data, key=lambda item: -item["score"] * tinydep.VALUE)
+'''
+
+INPUTS = [{"id": "a", "score": 1}, {"id": "b", "score": 3}, {"id": "c", "score": 2}]
+
+
+def make_wheel(wheel_dir, name="tinydep", version="1.0"):
+    wheel_dir.mkdir(parents=True, exist_ok=True)
+    dist_info = f"{name}-{version}.dist-info"
+    with zipfile.ZipFile(wheel_dir / f"{name}-{version}-py3-none-any.whl", "w") as whl:
+        whl.writestr(f"{name}/__init__.py", "VALUE = 1\n")
+        whl.writestr(f"{dist_info}/METADATA", f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+        whl.writestr(f"{dist_info}/WHEEL", "Wheel-Version: 1.0\nGenerator: test\nRoot-Is-Purelib: true\nTag: py3-none-any\n")
+        whl.writestr(f"{dist_info}/RECORD", "")
+
+
+class FakePolicies:
+    def get_policy_version(self, policy_rule_uri):
+        return "1"
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    code = tmp_path / "policy" / "code"
+    code.mkdir(parents=True)
+    (code / "function.py").write_text(RULE)
+    (code / "requirements.txt").write_text("tinydep==1.0\n")
+    make_wheel(tmp_path / "wheels")
+
+    monkeypatch.setenv("PIP_NO_INDEX", "1")
+    monkeypatch.setenv("PIP_FIND_LINKS", str(tmp_path / "wheels"))
+    monkeypatch.setattr(artifact_store, "_store", artifact_store.PolicyArtifactStore(root=str(tmp_path / "store")))
+
+    calls = {"pip": 0, "read_policy": 0}
+    check_call = artifact_store.subprocess.check_call
+
+    def counting_check_call(cmd, *args, **kwargs):
+        if "pip" in cmd:
+            calls["pip"] += 1
+        return check_call(cmd, *args, **kwargs)
+
+    def read_policy(self, policy_rule_uri):
+        calls["read_policy"] += 1
+        return SimpleNamespace(code=str(code), policy_parameters={}, policy_settings={})
+
+    monkeypatch.setattr(artifact_store.subprocess, "check_call", counting_check_call)
+    monkeypatch.setattr(PolicyDBClient, "read_policy", read_policy)
+    monkeypatch.setattr(similarity_search, "execute_filter", lambda filter_type, filter_query: list(INPUTS))
+
+    cache = PolicyEvaluatorCache(policies_client=FakePolicies(), pool_size=4)
+    monkeypatch.setattr(evaluator_cache, "_cache", cache)
+    yield cache, calls
+    cache.invalidate()
+
+
+def search(delay=0):
+    return similarity_search.SimilaritySearch({"rankingPolicyRule": {
+        "policyRuleURI": "ranking:1.0-stable",
+        "parameters": {"delay": delay, "filterRule": {"matchType": "block", "filter": {"block": {"x": 1}}}}
+    }}).execute()
+
+
+def test_repeated_searches_do_not_invoke_the_installer(env):
+    cache, calls = env
+
+    for _ in range(5):
+        assert [item["id"] for item in search()] == ["b", "c", "a"]
+
+    assert calls["pip"] == 1
+    assert calls["read_policy"] == 1
+    assert cache.get_stats()["loads"] == 1
+
+
+def test_concurrent_searches_of_one_policy_run_in_parallel(env):
+    cache, calls = env
+    delay = 0.3
+    search(delay)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(search(delay))) for _ in range(4)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # serialized on one evaluator this would take 4 * delay
+    assert time.time() - start < 2 * delay
+    assert len(results) == 4
+    assert cache.get_stats()["evaluators"] == 4
+    # the extra evaluators reuse the stored code and dependencies
+    assert calls["pip"] == 1
+
+
+def test_invalidated_entry_unloads_busy_evaluators_on_release(env):
+    cache, _ = env
+    search()
+    key = cache.make_key("ranking:1.0-stable", {"delay": 0.3, "filterRule": {
+        "matchType": "block", "filter": {"block": {"x": 1}}}})
+
+    thread = threading.Thread(target=search, args=(0.3,))
+    thread.start()
+    deadline = time.time() + 2
+    while time.time() < deadline and not (key in cache.entries and not cache.entries[key].idle):
+        time.sleep(0.01)
+    entry = cache.entries[key]
+
+    cache.invalidate()
+    assert entry.acquire() is None
+    thread.join()
+    assert entry.idle == []
+
+    # the next search loads the policy again
+    assert [item["id"] for item in search(0.3)] == ["b", "c", "a"]
@@ -0,0 +1,176 @@
+import contextlib
+import json
+import random
+import types
+from unittest import mock
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from core import query_exec, similarity_search
+from core.query_exec import MongoFilterExecutor, compile_filter
+
+BLOCK_QUERY = {
+    "clusterQuery": {"variable": "reputation", "operator": ">=", "value": 3},
+    "blockMetricsQuery": {"variable": "block.load", "operator": "<", "value": 0.5},
+    "blockQuery": {"variable": "component.type", "operator": "==", "value": "llm"},
+}
+
+
+def make_fleet(num_blocks, num_clusters=None, seed=1):
+    rng = random.Random(seed)
+    num_clusters = num_clusters or max(1, num_blocks // 50)
+    client = mongomock.MongoClient()
+    client.blocks.clusters.insert_many([
+        {"id": f"c{i}", "reputation": rng.randint(0, 5), "nodes": {"count": rng.randint(1, 8)}}
+        for i in range(num_clusters)])
+    client.blocks.blocks.insert_many([
+        {"id": f"b{i}", "cluster": {"id": f"c{rng.randrange(num_clusters)}"},
+         "component": {"type": rng.choice(["llm", "vision"])}}
+        for i in range(num_blocks)])
+    client.block_metrics.block_metrics.insert_many([
+        {"blockId": f"b{i}", "block": {"load": rng.random()}, "instances": [{"gpu": rng.random()}]}
+        for i in range(num_blocks)])
+    client.cluster_metrics.cluster_metrics.insert_many([
+        {"clusterId": f"c{i}", "cluster": {"usage": rng.random()}} for i in range(num_clusters)])
+    return client
+
+
+def _plain(docs):
+    return json.loads(json.dumps([{k: v for k, v in d.items() if k != "_id"} for d in docs], default=str))
+
+
+def http_clients(client):
+    # the HTTP path's clients, served from the same collections
+    return {
+        "BlocksClient": type("Blocks", (), {
+            "query_blocks": lambda self, q: _plain(client.blocks.blocks.find(q))}),
+        "ClusterClient": type("Clusters", (), {
+            "execute_query": lambda self, q: (True, _plain(client.blocks.clusters.find(q)))}),
+        "GlobalBlocksMetricsClient": type("BlockMetrics", (), {
+            "aggregate_blocks": lambda self, p: _plain(client.block_metrics.block_metrics.aggregate(p)),
+            "query_blocks": lambda self, q: _plain(client.block_metrics.block_metrics.find(q))}),
+    }
+
+
+def http_filter(client, filter_type, query):
+    with mock.patch.multiple(similarity_search, **http_clients(client)), \
+            mock.patch.object(query_exec, "get_filter_executor", lambda: None):
+        return similarity_search.execute_filter(filter_type, json.loads(json.dumps(query)))
+
+
+def normalize(docs):
+    docs = sorted(_plain(docs), key=lambda d: d["id"])
+    for doc in docs:
+        if "metrics" in doc:
+            doc["metrics"] = {k: v for k, v in doc["metrics"].items() if not k.startswith("_computed")}
+    return docs
+
+
+def split_clusters(client):
+    # clusters in their own database, the block join then has remote joins on two fields
+    client.clusters.clusters.insert_many(list(client.blocks.clusters.find({}, {"_id": 0})))
+    return mock.patch.dict(query_exec.STORES, {"clusters": "clusters.clusters"})
+
+
+def recording_aggregate(client, sizes):
+    collection_class = type(client.block_metrics.block_metrics)
+    aggregate = collection_class.aggregate
+
+    def recording(self, pipeline, **kwargs):
+        docs = list(aggregate(self, pipeline, **kwargs))
+        if self.name == "block_metrics":
+            sizes.append((pipeline, len(docs)))
+        return iter(docs)
+
+    return mock.patch.object(collection_class, "aggregate", recording)
+
+
+@pytest.mark.parametrize("query", [
+    BLOCK_QUERY,
+    {"blockQuery": BLOCK_QUERY["blockQuery"]},
+    {"clusterQuery": BLOCK_QUERY["clusterQuery"], "blockMetricsQuery": BLOCK_QUERY["blockMetricsQuery"]},
+])
+@pytest.mark.parametrize("pushdown_limit", [0, 10000])
+@pytest.mark.parametrize("split", [False, True])
+def test_block_filter_matches_the_http_path(query, pushdown_limit, split):
+    client = make_fleet(600)
+    executor = MongoFilterExecutor(client=client, batch_size=64, pushdown_limit=pushdown_limit)
+
+    with split_clusters(client) if split else contextlib.nullcontext():
+        joined = list(executor.execute_filter("block", query))
+    assert joined
+    assert normalize(joined) == normalize(http_filter(client, "block", query))
+
+
+def test_remote_side_is_merged_in_one_sorted_pass():
+    client = make_fleet(600)
+    executor = MongoFilterExecutor(client=client, batch_size=64)
+    plan = compile_filter("block", BLOCK_QUERY)
+
+    steps = {step["store"]: step for step in executor.explain(plan)["steps"]}
+    # clusters share the blocks database and are joined inside the primary pipeline
+    assert steps["clusters"]["strategy"] == "lookup"
+    assert steps["blockMetrics"]["strategy"] == "merge_join"
+    assert {"$sort": {"blockId": 1}} in steps["blockMetrics"]["pipeline"]
+    assert {"$sort": {"id": 1}} in steps["blocks"]["pipeline"]
+
+    calls = []
+    with recording_aggregate(client, calls):
+        results = list(executor.execute(plan))
+    assert results
+    assert len(calls) == 1
+
+
+def test_remote_side_is_read_as_keys_only_without_a_common_field():
+    client = make_fleet(600)
+    executor = MongoFilterExecutor(client=client, batch_size=64, pushdown_limit=0)
+    plan = compile_filter("block", BLOCK_QUERY)
+
+    with split_clusters(client):
+        steps = {step["store"]: step for step in executor.explain(plan)["steps"]}
+        assert steps["clusters"]["strategy"] == "key_join"
+        assert steps["blockMetrics"]["strategy"] == "key_join"
+        assert steps["blockMetrics"]["pipeline"][-1] == {"$project": {"_id": 0, "blockId": 1}}
+        assert steps["blockMetrics"]["attach"] == "metrics"
+
+        calls = []
+        with recording_aggregate(client, calls):
+            results = list(executor.execute(plan))
+
+    # every remote document that reaches the client belongs to a batch of candidates
+    sizes = [size for pipeline, size in calls if "$in" in json.dumps(pipeline[0])]
+    assert sizes and max(sizes) <= 64
+    assert sum(sizes) == len(results)
+
+
+def test_execute_filter_is_lazy_and_keeps_the_none_contract():
+    client = make_fleet(600)
+    executor = MongoFilterExecutor(client=client, batch_size=64)
+
+    results = executor.execute_filter("block", BLOCK_QUERY)
+    assert isinstance(results, types.GeneratorType)
+    assert next(results)["id"]
+
+    empty = dict(BLOCK_QUERY, clusterQuery={"variable": "reputation", "operator": ">", "value": 99})
+    assert executor.execute_filter("block", empty) is None
+    assert http_filter(client, "block", empty) is None
+
+
+def test_filter_endpoint_streams_the_same_body():
+    import main
+
+    client = make_fleet(300)
+    executor = MongoFilterExecutor(client=client, batch_size=16)
+    ir = {"matchType": "block", "filter": BLOCK_QUERY}
+
+    with mock.patch.object(query_exec, "get_filter_executor", lambda: executor):
+        response = main.app.test_client().post("/api/no-ir/filter", json=ir)
+        expected = similarity_search.FilterSearch(json.loads(json.dumps(ir))).execute()
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    body = response.get_json()
+    assert body["success"] is True
+    assert normalize(body["data"]) == normalize(expected)